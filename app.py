@@ -1,7 +1,16 @@
+from .startup import start_import_timer, finish_startup
+# 统计其后所有模块的导入耗时，启动完成后输出到日志
+start_import_timer()
+
 from flask import Flask, jsonify
 from flask_cors import CORS
 from .routes import register_routes
-from .utils import setup_logging, start_cleanup_timer, stop_cleanup_timer, get_rate_limit_seconds
+from .http_cache import compress_response
+from .metrics import track_request_start, track_request_end
+from .services import warm_up_model_pool, warm_up_transcribers, shutdown_model_pool, FASTER_WHISPER_MODEL_PATH
+from .autotune_profile import apply_autotune_profile
+from .jobs import get_job_manager, resume_interrupted_jobs
+from .utils import setup_logging, get_rate_limit_seconds, get_rate_limit_storage_uri
 import atexit
 import signal
 import sys
@@ -14,18 +23,29 @@ logger = logging.getLogger(__name__)
 def create_app():
     app = Flask(__name__)
     CORS(app)
+    setup_logging(app)
+    # 调优结果设置推理精度、线程数与并发数（已显式配置的项除外），必须在模型池、任务管理器创建之前应用
+    apply_autotune_profile(FASTER_WHISPER_MODEL_PATH)
 
     limiter = Limiter(
         key_func=get_remote_address,
-        default_limits=[f"{get_rate_limit_seconds()} per second"]
+        default_limits=[f"{get_rate_limit_seconds()} per second"],
+        storage_uri=get_rate_limit_storage_uri()
     )
     limiter.init_app(app)
 
-    setup_logging(app)
     register_routes(app)
+    app.before_request(track_request_start)
+    app.after_request(compress_response)
+    app.after_request(track_request_end)
+
+    warm_up_transcribers()
+    warm_up_model_pool()
+    atexit.register(shutdown_model_pool)
 
-    start_cleanup_timer()
-    atexit.register(stop_cleanup_timer)
+    get_job_manager().start()
+    atexit.register(get_job_manager().shutdown)
+    resume_interrupted_jobs()
 
     @app.errorhandler(429)
     def ratelimit_handler(e):
@@ -39,13 +59,12 @@ def create_app():
 
 def signal_handler(sig, frame):
     logger.info('Interrupt received. Starting cleanup...')
-    stop_cleanup_timer()
+    shutdown_model_pool()
     logger.info('Cleanup complete. Exiting...')
     sys.exit(0)
 
 def cleanup_on_exit():
     logger.info("Performing final cleanup before exit...")
-    stop_cleanup_timer()
     # 在这里添加任何其他需要的清理代码
     logger.info("Final cleanup complete.")
 
@@ -54,6 +73,7 @@ signal.signal(signal.SIGINT, signal_handler)
 atexit.register(cleanup_on_exit)
 
 app = create_app()
+finish_startup()
 
 if __name__ == "__main__":
     logger.info("Starting Flask application...")
@@ -0,0 +1,348 @@
+import os
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+from threading import Lock
+from .pcm_audio import PCM_SUFFIX
+from .utils import (
+    get_audio_store_path,
+    get_audio_store_max_bytes,
+    get_audio_store_mode,
+    is_audio_store_enabled,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，占用只在单进程内有效
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+AUDIO_ORIGINAL = 'original'
+AUDIO_PCM = 'pcm'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 启动时清理超过该时长（秒）的残留临时文件，较新的可能是其他进程正在写入的
+STALE_TEMP_SECONDS = 24 * 3600
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _digest_of(path):
+    """存储中的文件以内容摘要开头命名：<digest>.<ext> 或旁路文件 <digest>.pcm.wav。"""
+    return os.path.basename(path).split('.')[0]
+
+
+class AudioStore:
+    """按内容寻址的音频存储。
+
+    音频文件以 sha256 命名存放在 objects/ 下，(BV 号, 分P, 存储形式) 通过索引指向文件，
+    内容相同的音频（例如重新上传的视频）只保存一份。写入先落在 tmp/ 再 rename，
+    其他 worker 只会看到完整的文件。总大小超过 max_bytes 时按最近访问时间淘汰，
+    正在被任务使用（已 acquire 未 release）的文件不会被淘汰：本进程内按引用计数，
+    跨进程（多个 gunicorn worker 共享存储）通过 leases/ 下每个对象一个租约文件，
+    使用者持有共享 flock，淘汰前先尝试加排他锁，加不上说明其他进程正在使用。
+    原始音频解码出的 PCM 旁路文件（见 get_sidecar）与对象放在一起，大小计入对象，随对象一起淘汰。
+    """
+
+    def __init__(self, root, max_bytes=2 * 1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.objects_dir = os.path.join(root, 'objects')
+        self.leases_dir = os.path.join(root, 'leases')
+        self.hits = 0
+        self.misses = 0
+        self.dedupes = 0
+        self.evictions = 0
+        self.sidecar_hits = 0
+        self.sidecar_builds = 0
+        self._pins = {}  # digest -> 引用计数
+        self._leases = {}  # digest -> 持有共享锁的租约文件
+        self._lock = Lock()
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.leases_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, 'index.sqlite3'), check_same_thread=False, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS refs (
+                bv_id TEXT NOT NULL,
+                part INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                title TEXT,
+                duration REAL,
+                PRIMARY KEY (bv_id, part, kind)
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access)')
+        self._conn.commit()
+
+    def temp_path(self, suffix=''):
+        """返回 tmp/ 下的唯一路径，下载或转码时先写到这里，完成后交给 put_file。"""
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex + suffix)
+
+    def acquire(self, bv_id, part=1, kind=AUDIO_ORIGINAL):
+        """查找已存储的音频，返回 {'path', 'title', 'duration'} 或 None。
+
+        返回的文件在调用 release 之前不会被淘汰。
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('''
+                SELECT blobs.digest, blobs.path, refs.title, refs.duration
+                FROM refs JOIN blobs ON refs.digest = blobs.digest
+                WHERE refs.bv_id = ? AND refs.part = ? AND refs.kind = ?
+            ''', (bv_id, part, kind)).fetchone()
+            if row is not None:
+                # 先占用再检查文件：其他进程可能刚刚淘汰了它
+                self._pin(row[0])
+                if not os.path.exists(row[1]):
+                    self._unpin(row[0])
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE blobs SET last_access = ? WHERE digest = ?', (now, row[0]))
+            self._conn.commit()
+            self.hits += 1
+        return {'path': row[1], 'title': row[2], 'duration': row[3]}
+
+    def put_file(self, bv_id, part, kind, src_path, title=None, duration=None):
+        """把 src_path（应位于 tmp/ 下）移入存储并登记，返回存储后的路径。
+
+        与 acquire 一样，返回的文件在 release 之前不会被淘汰。
+        """
+        digest = hash_file(src_path)
+        ext = os.path.splitext(src_path)[1]
+        path = os.path.join(self.objects_dir, digest[:2], digest + ext)
+        now = time.time()
+        with self._lock:
+            self._pin(digest)
+            try:
+                existing = self._conn.execute('SELECT path FROM blobs WHERE digest = ?', (digest,)).fetchone()
+                if existing is not None and not os.path.exists(existing[0]):
+                    # 对象文件已丢失，它的旁路文件也不再可信
+                    self._remove_sidecar(existing[0])
+                if existing is not None and os.path.exists(existing[0]):
+                    # 内容已存在，丢弃新文件
+                    os.remove(src_path)
+                    path = existing[0]
+                    self.dedupes += 1
+                    self._conn.execute('UPDATE blobs SET last_access = ? WHERE digest = ?', (now, digest))
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(src_path, path)
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO blobs (digest, path, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                        (digest, path, os.path.getsize(path), now, now)
+                    )
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO refs (bv_id, part, kind, digest, title, duration) VALUES (?, ?, ?, ?, ?, ?)',
+                    (bv_id, part, kind, digest, title, duration)
+                )
+            except BaseException:
+                self._unpin(digest)
+                raise
+            self._evict()
+            self._conn.commit()
+        return path
+
+    def get_sidecar(self, path, build):
+        """返回存储中音频对象 path 的 PCM 旁路文件，不存在时先调用 build(tmp_path) 生成。
+
+        旁路文件以对象的内容摘要命名，同一音频的重试、续转和其他任务都直接复用，不再解码。
+        调用方应持有 path 的占用（acquire 或 put_file 之后、release 之前）。
+        """
+        digest = _digest_of(path)
+        sidecar_path = os.path.join(os.path.dirname(path), digest + PCM_SUFFIX)
+        if os.path.exists(sidecar_path):
+            with self._lock:
+                self.sidecar_hits += 1
+            return sidecar_path
+        tmp_path = self.temp_path(PCM_SUFFIX)
+        try:
+            build(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            if os.path.exists(sidecar_path):
+                # 其他任务同时解码了同一音频
+                os.remove(tmp_path)
+                return sidecar_path
+            os.replace(tmp_path, sidecar_path)
+            self._conn.execute(
+                'UPDATE blobs SET size = size + ? WHERE digest = ?', (os.path.getsize(sidecar_path), digest))
+            self.sidecar_builds += 1
+            self._evict()
+            self._conn.commit()
+        return sidecar_path
+
+    def release(self, path):
+        """任务不再使用该文件；返回 False 表示文件不归存储管理。"""
+        digest = _digest_of(path)
+        with self._lock:
+            if digest not in self._pins:
+                return False
+            self._unpin(digest)
+            self._evict()
+            self._conn.commit()
+        return True
+
+    def _lease_path(self, digest):
+        return os.path.join(self.leases_dir, digest + '.lock')
+
+    def _pin(self, digest):
+        """本进程第一次占用时打开租约文件并加共享锁（等待正在淘汰它的进程完成），最后一次释放时关闭。"""
+        count = self._pins.get(digest, 0)
+        if not count and fcntl is not None:
+            self._leases[digest] = self._open_lease(digest)
+        self._pins[digest] = count + 1
+
+    def _open_lease(self, digest):
+        path = self._lease_path(digest)
+        while True:
+            lease = open(path, 'a')
+            try:
+                fcntl.flock(lease, fcntl.LOCK_SH)
+                # 等锁期间租约文件可能已随对象一起被淘汰删除，锁在已删除的文件上对其他进程无效，需要重新打开
+                if os.path.samestat(os.fstat(lease.fileno()), os.stat(path)):
+                    return lease
+            except FileNotFoundError:
+                pass
+            except BaseException:
+                lease.close()
+                raise
+            lease.close()
+
+    def _unpin(self, digest):
+        self._pins[digest] -= 1
+        if not self._pins[digest]:
+            del self._pins[digest]
+            lease = self._leases.pop(digest, None)
+            if lease is not None:
+                lease.close()
+
+    def _lock_for_eviction(self, digest):
+        """以排他锁打开租约文件；其他进程正在使用该对象时返回 None。"""
+        lease = open(self._lease_path(digest), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lease.close()
+                return None
+        return lease
+
+    def owns(self, path):
+        return os.path.abspath(path).startswith(os.path.abspath(self.objects_dir) + os.sep)
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for digest, path, size in self._conn.execute(
+                'SELECT digest, path, size FROM blobs ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            if digest in self._pins:
+                continue
+            lease = self._lock_for_eviction(digest)
+            if lease is None:
+                continue
+            try:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._remove_sidecar(path)
+                # 持有排他锁时删除租约文件；之后再占用的进程会发现对象已不存在
+                os.remove(self._lease_path(digest))
+            finally:
+                lease.close()
+            self._conn.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+            self._conn.execute('DELETE FROM refs WHERE digest = ?', (digest,))
+            total -= size
+            evicted += 1
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"音频存储清理: 淘汰 {evicted} 个文件")
+
+    @staticmethod
+    def _remove_sidecar(path):
+        try:
+            os.remove(os.path.join(os.path.dirname(path), _digest_of(path) + PCM_SUFFIX))
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs'
+            ).fetchone()
+            refs = self._conn.execute('SELECT COUNT(*) FROM refs').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'refs': refs,
+                'bytes': total,
+                'maxBytes': self.max_bytes,
+                'pinned': len(self._pins),
+                'hits': self.hits,
+                'misses': self.misses,
+                'dedupes': self.dedupes,
+                'evictions': self.evictions,
+                'sidecarHits': self.sidecar_hits,
+                'sidecarBuilds': self.sidecar_builds,
+                'hitRatio': self.hits / lookups if lookups else 0.0
+            }
+
+
+_audio_store = None
+_audio_store_lock = Lock()
+
+
+def get_audio_store():
+    """返回进程内共享的音频存储，未启用时返回 None。"""
+    global _audio_store
+    if not is_audio_store_enabled():
+        return None
+    with _audio_store_lock:
+        if _audio_store is None:
+            _audio_store = AudioStore(get_audio_store_path(), max_bytes=get_audio_store_max_bytes())
+            # 之前异常退出时残留的未完成写入
+            stale_before = time.time() - STALE_TEMP_SECONDS
+            for name in os.listdir(_audio_store.tmp_dir):
+                path = os.path.join(_audio_store.tmp_dir, name)
+                try:
+                    if os.path.getmtime(path) < stale_before:
+                        os.remove(path)
+                except OSError:
+                    pass
+        return _audio_store
+
+
+def get_audio_store_kind():
+    return AUDIO_PCM if get_audio_store_mode() == 'pcm' else AUDIO_ORIGINAL
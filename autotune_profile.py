@@ -0,0 +1,89 @@
+import os
+import json
+import logging
+from .utils import get_autotune_profile_path, is_autotune_profile_enabled
+
+logger = logging.getLogger(__name__)
+
+# 调优结果中可以写入的设置项，其余键忽略
+PROFILE_SETTINGS = (
+    'FASTER_WHISPER_COMPUTE_TYPE',
+    'FASTER_WHISPER_CPU_THREADS',
+    'MODEL_POOL_SIZE',
+    'TRANSCRIBE_WORKERS',
+)
+
+_applied = None
+
+
+def read_autotune_profile(path=None):
+    """读取调优结果文件，不存在或格式不对时返回 None。"""
+    path = path or get_autotune_profile_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"读取调优结果失败 {path}: {str(e)}")
+        return None
+    if not isinstance(profile, dict) or not isinstance(profile.get('settings'), dict):
+        logger.error(f"调优结果格式不正确: {path}")
+        return None
+    return profile
+
+
+def write_autotune_profile(profile, path=None):
+    path = path or get_autotune_profile_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def apply_autotune_profile(model_path=None):
+    """启动时调用：读取调优结果，把其中的设置写入环境变量。
+
+    已经设置的环境变量（包括 .env 中的设置，load_dotenv 在导入 services 时已执行）优先，不被覆盖，
+    只写入尚未设置的项。结果只对生成它的机器配置有效：CPU 核数或模型与当前不同时忽略，需要在新机器上重新调优。
+    必须在模型池、任务管理器创建之前调用。
+    """
+    global _applied
+    if not is_autotune_profile_enabled():
+        return None
+    profile = read_autotune_profile()
+    if profile is None:
+        return None
+    cpu_count = profile.get('host', {}).get('cpuCount')
+    if cpu_count != os.cpu_count():
+        logger.warning(f"调优结果来自 {cpu_count} 核的机器，当前为 {os.cpu_count()} 核，忽略；请重新运行 autotune")
+        return None
+    model = profile.get('model')
+    if model_path and model and os.path.basename(os.path.normpath(model)) != os.path.basename(os.path.normpath(model_path)):
+        logger.warning(f"调优结果对应的模型 {model} 与当前模型 {model_path} 不同，忽略")
+        return None
+    settings = {key: str(value) for key, value in profile['settings'].items() if key in PROFILE_SETTINGS}
+    applied = {key: value for key, value in settings.items() if key not in os.environ}
+    skipped = [key for key in settings if key in os.environ]
+    for key, value in applied.items():
+        os.environ.setdefault(key, value)
+    _applied = {
+        'path': get_autotune_profile_path(),
+        'createdAt': profile.get('createdAt'),
+        'settings': applied,
+        'skipped': skipped,
+    }
+    if applied:
+        logger.info(f"已应用调优结果: {', '.join(f'{key}={value}' for key, value in applied.items())}")
+    if skipped:
+        logger.info(f"以下设置已显式配置，未使用调优结果: {', '.join(f'{key}={os.environ[key]}' for key in skipped)}")
+    return profile
+
+
+def get_applied_autotune_profile():
+    """启动时应用的调优设置，未应用时返回 None。"""
+    return _applied
@@ -0,0 +1,201 @@
+import time
+import queue
+import logging
+from collections import deque
+from .jobs import JobQueueFull, ClientQuotaExceeded
+from .services import get_video_parts
+from .utils import (
+    validate_bv_id,
+    validate_part,
+    parse_part_ranges,
+    get_batch_max_items,
+    get_batch_concurrency,
+)
+
+logger = logging.getLogger(__name__)
+
+# 等待条目结束的最长时间（秒），超时后推送一次心跳并重试被拒绝的提交
+HEARTBEAT_SECONDS = 2
+
+ALL_PARTS = 'all'
+
+
+class BatchItem:
+    def __init__(self, index, bv_id, part, title=None, duration=None):
+        self.index = index
+        self.bv_id = bv_id
+        self.part = part
+        self.title = title
+        self.duration = duration
+        self.job = None
+        # 无法提交时（分P不存在、视频信息解析失败）的错误响应体
+        self.error = None
+
+    def to_dict(self):
+        data = {
+            'index': self.index,
+            'bvId': self.bv_id,
+            'part': self.part,
+            'title': self.title,
+            'duration': self.duration,
+        }
+        if self.job is not None:
+            data['jobId'] = self.job.id
+        return data
+
+    def result(self):
+        data = self.to_dict()
+        if self.job is None:
+            data.update(status='failed', error=self.error)
+            return data
+        data.update(status=self.job.status, cached=self.job.cached, timings=dict(self.job.timings))
+        if self.job.error:
+            data['error'] = self.job.error[1]
+        else:
+            data['result'] = self.job.result
+        return data
+
+
+def parse_batch_request(data):
+    """把请求体解析为 [(BV号, 分P列表或 ALL_PARTS)]，格式错误时抛出 ValueError。
+
+    支持 {"items": ["BV...", "BV...:1-3,5", "BV...?p=2", {"bvId": "BV...", "parts": "all"}]}，
+    以及只含一个视频的简写 {"bvId": "BV...", "parts": "1-3"}。未指定分P时处理第 1P。
+    """
+    specs = data.get('items') if 'items' in data else [data]
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("items 必须是非空列表")
+    limit = get_batch_max_items()
+    entries = []
+    for spec in specs:
+        if isinstance(spec, str):
+            bv_id, _, parts = spec.strip().replace('?p=', ':', 1).partition(':')
+            parts = parts or None
+        elif isinstance(spec, dict):
+            bv_id = spec.get('bvId')
+            parts = spec.get('parts', spec.get('part'))
+        else:
+            raise ValueError(f"无效的条目: {spec}")
+        bv_id = validate_bv_id(str(bv_id))
+        if parts is None:
+            parts = [1]
+        elif parts == ALL_PARTS:
+            parts = ALL_PARTS
+        elif isinstance(parts, list):
+            parts = sorted({validate_part(part) for part in parts})
+        else:
+            parts = parse_part_ranges(parts, limit)
+        entries.append((bv_id, parts))
+    if sum(len(parts) for _, parts in entries if parts != ALL_PARTS) > limit:
+        raise ValueError(f"一次最多提交 {limit} 个条目")
+    return entries
+
+
+def resolve_batch(entries):
+    """展开分P，返回 BatchItem 列表。
+
+    指定了分P的视频用一次请求解析出全部分P的标题与时长（结果缓存，调度时据此估算耗时），
+    不再逐P请求；只处理第 1P 的条目不需要提前解析。展开后超过上限时抛出 ValueError。
+    """
+    items = []
+    seen = set()
+    for bv_id, parts in entries:
+        available = None
+        if parts != [1]:
+            try:
+                available = {item['part']: item for item in get_video_parts(bv_id)}
+            except Exception as e:
+                logger.error(f"解析分P列表失败 {bv_id}: {str(e)}")
+                item = BatchItem(len(items), bv_id, None)
+                item.error = {'error': '获取视频信息失败', 'details': str(e), 'code': 'METADATA_FAILED'}
+                items.append(item)
+                continue
+        if parts == ALL_PARTS:
+            parts = sorted(available)
+        for part in parts:
+            if (bv_id, part) in seen:
+                continue
+            seen.add((bv_id, part))
+            info = available.get(part, {}) if available is not None else {}
+            item = BatchItem(len(items), bv_id, part, info.get('title'), info.get('duration'))
+            if available is not None and not info:
+                item.error = {'error': '分P不存在', 'details': f"{bv_id} 共 {len(available)}P", 'code': 'PART_NOT_FOUND'}
+            items.append(item)
+    limit = get_batch_max_items()
+    if len(items) > limit:
+        raise ValueError(f"展开分P后共 {len(items)} 个条目，超过上限 ({limit})")
+    return items
+
+
+class BatchRunner:
+    """在 JobManager 上执行一批条目，同时在途的条目不超过 concurrency 个，按完成顺序产出结果。
+
+    每个条目作为普通任务提交，与单个任务共用下载/转写 worker、模型池、音频存储和转写缓存，
+    已缓存的条目立即返回；整批只计一次接口限流。队列已满或超出客户端配额时等待在途条目结束后重试。
+    调用方停止迭代（客户端断开）后不再提交新条目，已提交的任务照常完成并写入缓存。
+    """
+
+    def __init__(self, manager, transcriber_type, client=None, concurrency=None):
+        self.manager = manager
+        self.transcriber_type = transcriber_type
+        self.client = client
+        concurrency = concurrency or get_batch_concurrency()
+        if client is not None and manager.max_per_client:
+            concurrency = min(concurrency, manager.max_per_client)
+        self.concurrency = concurrency
+        self._finished = queue.Queue()
+
+    def run(self, entries):
+        """产出 (事件名, 数据)：resolved、submitted、item、heartbeat，最后是 done 或 failed。"""
+        started = time.monotonic()
+        try:
+            items = resolve_batch(entries)
+        except ValueError as e:
+            yield 'failed', {'error': str(e), 'code': 'BATCH_TOO_LARGE'}
+            return
+        yield 'resolved', {'items': [item.to_dict() for item in items]}
+
+        counts = {'completed': 0, 'failed': 0}
+        pending = deque()
+        for item in items:
+            if item.error:
+                counts['failed'] += 1
+                yield 'item', item.result()
+            else:
+                pending.append(item)
+
+        active = {}  # 任务 ID -> BatchItem
+        while pending or active:
+            waiting = None
+            while pending and len(active) < self.concurrency:
+                item = pending[0]
+                try:
+                    item.job = self.manager.submit(item.bv_id, self.transcriber_type, client=self.client, part=item.part)
+                except JobQueueFull:
+                    waiting = 'QUEUE_FULL'
+                    break
+                except ClientQuotaExceeded:
+                    waiting = 'TOO_MANY_JOBS'
+                    break
+                pending.popleft()
+                active[item.job.id] = item
+                yield 'submitted', item.to_dict()
+                item.job.add_done_callback(self._finished.put)
+
+            try:
+                job = self._finished.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield 'heartbeat', {
+                    'pending': len(pending),
+                    'running': len(active),
+                    'finished': counts['completed'] + counts['failed'],
+                    'waiting': waiting,
+                }
+                continue
+            item = active.pop(job.id)
+            item.title = job.title or (job.result or {}).get('title') or item.title
+            item.duration = job.duration or item.duration
+            counts['failed' if job.error else 'completed'] += 1
+            yield 'item', item.result()
+
+        yield 'done', dict(counts, total=len(items), seconds=round(time.monotonic() - started, 3))
@@ -0,0 +1,25 @@
+"""基准入口：python -m <包名>.bench <基准名> [参数]
+
+    export    字幕导出微基准
+    pipeline  端到端离线基准（下载、解码、转写与 HTTP 接口）
+    search    全文搜索索引的建索引耗时与查询延迟
+    autotune  本地模型 CPU 推理参数调优，结果写入调优结果文件供服务启动时读取
+"""
+import sys
+import importlib
+
+BENCHMARKS = ('export', 'pipeline', 'search', 'autotune')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in BENCHMARKS:
+        print(__doc__, file=sys.stderr)
+        return 2
+    # 按需导入，导出基准不需要加载转写相关模块
+    module = importlib.import_module(f'.{argv[0]}', __package__)
+    return module.main(argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""本地 Faster Whisper 的 CPU 推理参数自动调优。
+
+用配置的模型在一段短音频上依次测量 compute_type × 每个模型的推理线程数 × 同时运行的模型数，
+按吞吐量（每秒处理的音频秒数）选出最优组合，写入调优结果文件；服务启动时读取该文件，
+设置 FASTER_WHISPER_COMPUTE_TYPE、FASTER_WHISPER_CPU_THREADS、MODEL_POOL_SIZE 与 TRANSCRIBE_WORKERS
+中尚未显式配置（环境变量或 .env）的项。
+
+默认使用合成的类语音音频，也可以用 --audio 指定一段真实录音（只取前 --seconds 秒）。
+调优结果只对当前机器有效，CPU 核数不同的机器需要各自运行。
+
+    python -m <包名>.bench autotune --seconds 30 --rounds 2
+"""
+import gc
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import threading
+from .pipeline import make_speech_like_audio
+
+DEFAULT_COMPUTE_TYPES = ('int8', 'int8_float32', 'float32')
+
+# 吞吐量相差不超过该比例时视为相同，取占用内存更少（模型数更少）的组合
+THROUGHPUT_TOLERANCE = 0.03
+
+
+def thread_candidates(cpu_count):
+    candidates = {cpu_count}
+    threads = 1
+    while threads < cpu_count:
+        candidates.add(threads)
+        threads *= 2
+    return sorted(candidates)
+
+
+def make_configurations(compute_types, threads, cpu_count, max_models):
+    """每个线程数下测量单模型，以及用满全部核心的模型数（模型数 × 线程数 ≤ 核数）。"""
+    configurations = []
+    for compute_type in compute_types:
+        for cpu_threads in threads:
+            for models in sorted({1, min(max_models, max(1, cpu_count // cpu_threads))}):
+                configurations.append((compute_type, cpu_threads, models))
+    return configurations
+
+
+def load_clip(path, seconds):
+    from ..pcm_audio import SAMPLING_RATE, as_float32, load_audio
+    if path:
+        return as_float32(load_audio(path)[:int(seconds * SAMPLING_RATE)])
+    return make_speech_like_audio(seconds)
+
+
+def get_benchmark_options():
+    """与服务相同的解码参数，但关闭 VAD 与温度回退，使每次测量处理的音频量一致。"""
+    from ..transcription_service import get_faster_whisper_options
+    return dict(get_faster_whisper_options(), vad_filter=False, temperature=0.0, condition_on_previous_text=False)
+
+
+def transcribe(model, audio, options):
+    segments, _ = model.transcribe(audio, **options)
+    for _ in segments:
+        pass
+
+
+def measure(model_path, compute_type, cpu_threads, models, audio, options, rounds):
+    """加载 models 个模型，每轮让它们同时转写同一段音频，返回测量结果。"""
+    from ..model_pool import load_whisper_model, make_model_key
+    from ..pcm_audio import SAMPLING_RATE
+    key = make_model_key(model_path, device='cpu', compute_type=compute_type, cpu_threads=cpu_threads)
+    started = time.perf_counter()
+    instances = [load_whisper_model(key) for _ in range(models)]
+    load_seconds = (time.perf_counter() - started) / models
+    seconds = len(audio) / SAMPLING_RATE
+    try:
+        # 第一次推理包含内存分配等一次性开销，不计入结果
+        transcribe(instances[0], audio[:int(5 * SAMPLING_RATE)], options)
+        walls = []
+        latencies = []
+        for _ in range(rounds):
+            elapsed = [None] * models
+
+            def run(index):
+                begin = time.perf_counter()
+                transcribe(instances[index], audio, options)
+                elapsed[index] = time.perf_counter() - begin
+
+            threads = [threading.Thread(target=run, args=(index,)) for index in range(models)]
+            begin = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            walls.append(time.perf_counter() - begin)
+            latencies.extend(elapsed)
+    finally:
+        del instances
+        gc.collect()
+    wall = min(walls)
+    return {
+        'computeType': compute_type,
+        'cpuThreads': cpu_threads,
+        'models': models,
+        'throughput': round(models * seconds / wall, 3),
+        'rtf': round(sum(latencies) / len(latencies) / seconds, 4),
+        'loadSeconds': round(load_seconds, 2),
+    }
+
+
+def choose(results):
+    best = max(result['throughput'] for result in results)
+    candidates = [result for result in results if result['throughput'] >= best * (1 - THROUGHPUT_TOLERANCE)]
+    return min(candidates, key=lambda result: (result['models'], result['rtf']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', help='用于测量的音频文件，默认使用合成音频')
+    parser.add_argument('--seconds', type=float, default=30, help='测量用的音频时长（秒）')
+    parser.add_argument('--rounds', type=int, default=2, help='每个组合测量的轮数，取最快一轮')
+    parser.add_argument('--compute-types', default=','.join(DEFAULT_COMPUTE_TYPES), help='compute_type，逗号分隔')
+    parser.add_argument('--threads', help='每个模型的线程数，逗号分隔；默认为 1、2、4…… 直到 CPU 核数')
+    parser.add_argument('--max-models', type=int, default=8, help='同时运行的模型数上限')
+    parser.add_argument('--output', help='调优结果文件，默认为 AUTOTUNE_PROFILE_PATH')
+    parser.add_argument('--dry-run', action='store_true', help='只输出结果，不写文件')
+    args = parser.parse_args(argv)
+
+    import ctranslate2
+    from ..services import FASTER_WHISPER_MODEL_PATH
+    from ..utils import get_faster_whisper_device
+    from ..autotune_profile import write_autotune_profile
+
+    if get_faster_whisper_device() != 'cpu':
+        print('autotune 只用于 CPU 推理（FASTER_WHISPER_DEVICE=cpu）', file=sys.stderr)
+        return 2
+    supported = ctranslate2.get_supported_compute_types('cpu')
+    compute_types = [name for name in args.compute_types.split(',') if name in supported]
+    skipped = [name for name in args.compute_types.split(',') if name not in supported]
+    if skipped:
+        print(f"当前 CPU 不支持，跳过: {', '.join(skipped)}", file=sys.stderr)
+    cpu_count = os.cpu_count() or 1
+    threads = [int(value) for value in args.threads.split(',')] if args.threads else thread_candidates(cpu_count)
+    configurations = make_configurations(compute_types, threads, cpu_count, args.max_models)
+    if not configurations:
+        print('没有可测量的组合', file=sys.stderr)
+        return 2
+
+    audio = load_clip(args.audio, args.seconds)
+    options = get_benchmark_options()
+    print(f"模型 {FASTER_WHISPER_MODEL_PATH}，{cpu_count} 核，音频 {args.seconds:g}s，共 {len(configurations)} 个组合")
+    print(f"{'compute_type':<14}{'线程':>6}{'模型数':>8}{'吞吐(音频s/s)':>16}{'RTF':>10}{'加载(s)':>10}")
+    results = []
+    for compute_type, cpu_threads, models in configurations:
+        try:
+            result = measure(FASTER_WHISPER_MODEL_PATH, compute_type, cpu_threads, models, audio, options, args.rounds)
+        except Exception as e:
+            print(f"{compute_type:<14}{cpu_threads:>6}{models:>8}  失败: {e}", file=sys.stderr)
+            continue
+        results.append(result)
+        print(f"{compute_type:<14}{cpu_threads:>6}{models:>8}{result['throughput']:>16.2f}"
+              f"{result['rtf']:>10.3f}{result['loadSeconds']:>10.2f}")
+    if not results:
+        return 1
+
+    best = choose(results)
+    profile = {
+        'createdAt': time.time(),
+        'host': {'cpuCount': cpu_count, 'machine': platform.machine(), 'processor': platform.processor()},
+        'model': FASTER_WHISPER_MODEL_PATH,
+        'audio': args.audio or 'synthetic',
+        'audioSeconds': args.seconds,
+        'settings': {
+            'FASTER_WHISPER_COMPUTE_TYPE': best['computeType'],
+            'FASTER_WHISPER_CPU_THREADS': best['cpuThreads'],
+            'MODEL_POOL_SIZE': best['models'],
+            'TRANSCRIBE_WORKERS': best['models'],
+        },
+        'results': results,
+    }
+    print(json.dumps(profile['settings'], ensure_ascii=False))
+    if not args.dry_run:
+        print(f"已写入 {write_autotune_profile(profile, args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
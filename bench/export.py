@@ -0,0 +1,78 @@
+"""字幕导出微基准。
+
+生成 N 个片段的转写结果，测量各格式完整导出所需时间。每个片段的平均耗时
+在不同规模下保持基本不变，即说明导出耗时随片段数线性增长。
+
+    python -m <包名>.bench export --sizes 1000,10000,100000 --repeat 3
+"""
+import time
+import random
+import argparse
+import datetime
+from ..subtitle_utils import SUBTITLE_FORMATS, iter_subtitles
+
+
+def make_transcript(count, seed=0):
+    rng = random.Random(seed)
+    transcript = []
+    position = 0.0
+    for index in range(count):
+        start = position + rng.uniform(0, 0.5)
+        end = start + rng.uniform(0.5, 6.0)
+        transcript.append({'start': start, 'end': end, 'text': f" 第{index}句，用于测试字幕导出的文本内容。"})
+        position = end
+    return transcript
+
+
+def legacy_generate_srt(transcript):
+    """旧实现（字符串 += 拼接与 timedelta 格式化），作为对照。"""
+    def format_time(seconds):
+        return str(datetime.timedelta(seconds=seconds)).replace('.', ',')[:-3]
+
+    srt_content = ""
+    for index, segment in enumerate(transcript, start=1):
+        srt_content += f"{index}\n{format_time(segment['start'])} --> {format_time(segment['end'])}\n{segment['text'].strip()}\n\n"
+    return srt_content.strip()
+
+
+def measure(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def drain(chunks):
+    # 模拟响应逐块写出：只统计大小，不保留内容
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='片段数，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数，取最快一次')
+    parser.add_argument('--no-legacy', action='store_true', help='不测量旧实现')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    formats = list(SUBTITLE_FORMATS)
+    if not args.no_legacy:
+        formats.append('legacy-srt')
+
+    print(f"{'格式':<12}{'片段数':>10}{'总耗时(ms)':>14}{'每片段(µs)':>14}{'输出(KB)':>12}")
+    for fmt in formats:
+        for size in sizes:
+            transcript = make_transcript(size)
+            if fmt == 'legacy-srt':
+                output_size = len(legacy_generate_srt(transcript))
+                elapsed = measure(lambda: legacy_generate_srt(transcript), args.repeat)
+            else:
+                output_size = drain(iter_subtitles(transcript, fmt))
+                elapsed = measure(lambda: drain(iter_subtitles(transcript, fmt)), args.repeat)
+            print(f"{fmt:<12}{size:>10}{elapsed * 1000:>14.1f}{elapsed / size * 1e6:>14.2f}{output_size / 1024:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
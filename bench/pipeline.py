@@ -0,0 +1,446 @@
+"""端到端离线基准。
+
+用合成音频（或 --audio 指定的本地录音）代替 B 站视频，yt-dlp 与远程转写服务
+（OpenAI 接口、Hugging Face 空间）替换为本地模拟实现，按不同并发数驱动：
+
+    direct  直接调用 services 中的下载、解码与 transcribe_audio
+    http    通过测试客户端提交 POST /api/jobs 并读取事件流直到完成，经过任务队列与 worker
+
+输出 JSON：实时率（RTF）、延迟 p50/p95、吞吐量、峰值内存（RSS）与模型加载时间，
+以及本次运行的配置，便于在不同提交或参数之间对比。
+
+    python -m <包名>.bench pipeline --durations 30,300 --concurrency 1,2,4 \\
+        --backends faster_whisper,openai --env FASTER_WHISPER_COMPUTE_TYPE=int8 --output before.json
+
+模拟的远程服务耗时为 --remote-latency + 音频时长 × --remote-rtf 秒。
+本地 Faster Whisper 使用 FASTER_WHISPER_MODEL_PATH 指向的真实模型。
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import wave
+import shutil
+import random
+import string
+import argparse
+import platform
+import resource
+import tempfile
+import itertools
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+
+SAMPLING_RATE = 16000
+
+# 影响性能、需要随结果一起记录的配置项
+RECORDED_ENV = (
+    'FASTER_WHISPER_DEVICE',
+    'FASTER_WHISPER_COMPUTE_TYPE',
+    'FASTER_WHISPER_CPU_THREADS',
+    'FASTER_WHISPER_BATCH_SIZE',
+    'MODEL_POOL_SIZE',
+    'ENABLE_CHUNKED_TRANSCRIPTION',
+    'CHUNK_SECONDS',
+    'CHUNK_WORKERS',
+    'VAD_FILTER',
+    'VAD_MIN_SILENCE_DURATION_MS',
+    'TRANSCRIBE_WORKERS',
+    'DOWNLOAD_WORKERS',
+    'ENABLE_PCM_SIDECAR',
+    'PCM_SAMPLE_FORMAT',
+    'AUDIO_STORE_MODE',
+)
+
+
+def make_speech_like_audio(seconds, seed=0):
+    """生成类似语音节奏的合成音频：0.4~3 秒的带谐波、调幅的音段，间隔 0.2~1 秒静音。"""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLING_RATE)
+    audio = rng.normal(0, 0.002, total).astype(np.float32)
+    position = 0
+    while position < total:
+        length = int(rng.uniform(0.4, 3.0) * SAMPLING_RATE)
+        end = min(total, position + length)
+        t = np.arange(end - position) / SAMPLING_RATE
+        pitch = rng.uniform(100, 250)
+        voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 6) * t))  # 模拟音节起伏
+        audio[position:end] += (0.2 * voiced * envelope).astype(np.float32)
+        position = end + int(rng.uniform(0.2, 1.0) * SAMPLING_RATE)
+    return audio
+
+
+def write_wav(path, samples):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLING_RATE)
+        wav.writeframes((np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+
+
+def wav_duration(data):
+    """上传内容为 WAV 时返回时长，否则返回 None。"""
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def fake_segments(duration, text='基准测试的模拟转写文本。'):
+    step = 5.0
+    return [
+        {'start': start, 'end': min(duration, start + step), 'text': text}
+        for start in np.arange(0.0, duration, step).tolist()
+    ]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # 最近秩法
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'mean': sum(values) / len(values),
+        'max': max(values),
+    }
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位为 KB，macOS 上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def random_bv_id(rng):
+    return 'BV1' + ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(9))
+
+
+class StubYoutubeDL:
+    """yt_dlp.YoutubeDL 的本地替代：视频信息与“下载”都来自 audio_files 中登记的文件。"""
+
+    audio_files = {}  # BV 号 -> (音频路径, 时长)
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def extract_info(self, url, download=False):
+        bv_id = url.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+        path, duration = self.audio_files[bv_id]
+        ext = os.path.splitext(path)[1].lstrip('.')
+        return {
+            'id': bv_id,
+            'title': f'bench {bv_id}',
+            'duration': duration,
+            'ext': ext,
+            'url': f'file://{path}',
+            'formats': [{'format_id': 'bench', 'ext': ext, 'url': f'file://{path}'}],
+        }
+
+    def sanitize_info(self, info):
+        return info
+
+    def prepare_filename(self, info):
+        outtmpl = self.params.get('outtmpl', '%(id)s_%(title)s.%(ext)s')
+        return outtmpl % {'id': info['id'], 'title': info['title'], 'ext': info['ext']}
+
+    def process_ie_result(self, info, download=True):
+        path, _ = self.audio_files[info['id']]
+        target = self.prepare_filename(info)
+        shutil.copyfile(path, target)
+        return dict(info, requested_downloads=[{'filepath': target}])
+
+
+class StubTranscriptions:
+    def __init__(self, latency, rtf):
+        self.latency = latency
+        self.rtf = rtf
+
+    def create(self, model, file, response_format='json', language=None, prompt=None):
+        _, data = file
+        duration = wav_duration(data) or len(data) / (SAMPLING_RATE * 2)
+        time.sleep(self.latency + duration * self.rtf)
+        return {'text': '', 'duration': duration, 'segments': fake_segments(duration)}
+
+
+class StubOpenAIClient:
+    """OpenAI 客户端的本地替代，只实现 audio.transcriptions.create。"""
+
+    def __init__(self, latency, rtf):
+        self.audio = type('StubAudio', (), {})()
+        self.audio.transcriptions = StubTranscriptions(latency, rtf)
+
+
+def make_stub_gradio_client(latency, rtf):
+    class StubGradioClient:
+        """gradio_client.Client 的本地替代，predict 按音频时长模拟耗时。"""
+
+        def __init__(self, src, httpx_kwargs=None, verbose=False):
+            self.src = src
+
+        def predict(self, audio, language, initial_prompt, vad_filter, min_silence_duration_ms, api_name=None):
+            path = audio['path'] if isinstance(audio, dict) else audio
+            with open(path, 'rb') as f:
+                data = f.read()
+            duration = wav_duration(data) or len(data) / (SAMPLING_RATE * 2)
+            time.sleep(latency + duration * rtf)
+            return json.dumps({'transcription': fake_segments(duration)}, ensure_ascii=False)
+
+        def close(self):
+            pass
+
+    return StubGradioClient
+
+
+def configure_environment(workdir, overrides, workers):
+    """在导入服务模块之前设置环境变量：关闭转写缓存、全文索引与流水线，使用临时目录存放数据。
+
+    通过 overrides 重新开启的功能同样写入临时目录，不会改动服务自身的缓存、索引与断点日志。
+    """
+    defaults = {
+        'ENABLE_TRANSCRIPT_CACHE': 'false',
+        'ENABLE_SEARCH_INDEX': 'false',
+        'ENABLE_STREAMING_PIPELINE': 'false',
+        'STATE_BACKEND_URL': 'memory://',
+        'TRANSCRIPT_CACHE_PATH': os.path.join(workdir, 'transcripts.sqlite3'),
+        'SEARCH_INDEX_PATH': os.path.join(workdir, 'search.sqlite3'),
+        'CHECKPOINT_PATH': os.path.join(workdir, 'checkpoints'),
+        'AUDIO_STORE_PATH': os.path.join(workdir, 'audio'),
+        'JOB_MAX_PER_CLIENT': '0',
+        'JOB_QUEUE_SIZE': '100000',
+        'TRANSCRIBE_WORKERS': str(workers),
+        'DOWNLOAD_WORKERS': str(workers),
+        'OPENAI_API_BASE_URL': 'http://127.0.0.1:9/v1',
+        'OPENAI_API_KEY': 'bench',
+        'MAX_VIDEO_DURATION': str(10 ** 7),
+    }
+    for key, value in defaults.items():
+        if key not in overrides:
+            os.environ[key] = value
+    os.environ.update(overrides)
+    os.environ.setdefault('FASTER_WHISPER_MODEL_PATH', 'faster-whisper-base')
+
+
+@contextmanager
+def stubbed_services(remote_latency, remote_rtf):
+    from .. import openai_transcriber, cloud_faster_whisper
+    openai_client = StubOpenAIClient(remote_latency, remote_rtf)
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch('yt_dlp.YoutubeDL', StubYoutubeDL))
+        stack.enter_context(mock.patch.object(openai_transcriber, 'get_openai_client', lambda *args: openai_client))
+        stack.enter_context(mock.patch.object(
+            cloud_faster_whisper, 'Client', make_stub_gradio_client(remote_latency, remote_rtf)))
+        stack.enter_context(mock.patch.object(cloud_faster_whisper, 'handle_file', lambda path: path))
+        yield
+
+
+def measure_model_load():
+    """冷启动加载一次本地模型，返回耗时（秒）；模型放回池中供后续请求复用。"""
+    from ..services import FASTER_WHISPER_MODEL_PATH
+    from ..model_pool import get_model_pool, make_model_key
+    from ..utils import get_faster_whisper_device, get_faster_whisper_compute_type, get_faster_whisper_cpu_threads
+    key = make_model_key(
+        FASTER_WHISPER_MODEL_PATH,
+        device=get_faster_whisper_device(),
+        compute_type=get_faster_whisper_compute_type(),
+        cpu_threads=get_faster_whisper_cpu_threads()
+    )
+    started = time.perf_counter()
+    get_model_pool().warm_up(key, count=1)
+    return time.perf_counter() - started
+
+
+def run_direct(bv_id, backend):
+    """下载（模拟）→ 解码 → transcribe_audio → 释放，返回 (转写耗时, 时长)。"""
+    from ..services import download_bilibili_audio, prepare_audio, transcribe_audio, release_audio_file
+    _, _, audio_filename, duration = download_bilibili_audio(bv_id)
+    pcm_filename = prepare_audio(audio_filename, backend)
+    try:
+        started = time.perf_counter()
+        transcript = transcribe_audio(audio_filename, backend, duration=duration, pcm_filename=pcm_filename)
+        elapsed = time.perf_counter() - started
+    finally:
+        release_audio_file(audio_filename, pcm_filename)
+    if transcript is None:
+        raise RuntimeError('转写失败')
+    return elapsed, duration
+
+
+def make_http_runner():
+    from flask import Flask
+    from ..routes import register_routes
+    from ..jobs import get_job_manager
+
+    # 不注册限流器，基准请求不受速率限制
+    app = Flask(__name__)
+    register_routes(app)
+    get_job_manager().start()
+
+    def run_http(bv_id, backend):
+        """提交任务 → 读取 NDJSON 事件流直到结束 → 查询任务，返回 (转写耗时, 时长)。"""
+        client = app.test_client()
+        response = client.post('/api/jobs', json={'bvId': bv_id, 'transcriber_type': backend})
+        if response.status_code != 202:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_json()}")
+        job_id = response.get_json()['jobId']
+        events = client.get(f'/api/jobs/{job_id}/events?format=ndjson').get_data(as_text=True)
+        last = json.loads(events.strip().splitlines()[-1])
+        if last['event'] != 'done':
+            raise RuntimeError(f"任务失败: {last['data']}")
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        duration = last['data']['duration']
+        return (job['rtf'] * duration if job.get('rtf') else None), duration
+
+    return run_http
+
+
+def run_scenario(runner, backend, audio_file, duration, concurrency, rounds, rng):
+    requests = concurrency * rounds
+    bv_ids = [random_bv_id(rng) for _ in range(requests)]
+    for bv_id in bv_ids:
+        StubYoutubeDL.audio_files[bv_id] = (audio_file, duration)
+
+    latencies, rtfs, errors = [], [], []
+
+    def one(bv_id):
+        started = time.perf_counter()
+        try:
+            transcribe_seconds, audio_seconds = runner(bv_id, backend)
+        except Exception as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - started)
+        if transcribe_seconds is not None and audio_seconds:
+            rtfs.append(transcribe_seconds / audio_seconds)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, bv_ids))
+    wall = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'errors': len(errors),
+        'errorSamples': errors[:3],
+        'wallSeconds': wall,
+        'throughput': {
+            'requestsPerSecond': len(latencies) / wall,
+            'audioSecondsPerSecond': len(latencies) * duration / wall,
+        },
+        'latency': summarize(latencies),
+        'rtf': summarize(rtfs),
+        'peakRssMB': peak_rss_mb(),
+    }
+
+
+def parse_env(items):
+    overrides = {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise SystemExit(f"--env 参数格式应为 KEY=VALUE: {item}")
+        overrides[key] = value
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='bench pipeline', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', default='30,300', help='合成音频时长（秒），逗号分隔')
+    parser.add_argument('--audio', help='使用本地音频文件代替合成音频（忽略 --durations）')
+    parser.add_argument('--backends', default='faster_whisper', help='转写服务，逗号分隔')
+    parser.add_argument('--modes', default='direct,http', help='direct、http，逗号分隔')
+    parser.add_argument('--concurrency', default='1,2,4', help='并发数，逗号分隔')
+    parser.add_argument('--rounds', type=int, default=2, help='每个并发数下每个并发请求的轮数')
+    parser.add_argument('--remote-latency', type=float, default=0.2, help='模拟远程服务的固定延迟（秒）')
+    parser.add_argument('--remote-rtf', type=float, default=0.05, help='模拟远程服务的实时率')
+    parser.add_argument('--env', action='append', default=[], help='覆盖配置项 KEY=VALUE，可重复')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='结果写入文件，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    concurrency_levels = [int(value) for value in args.concurrency.split(',')]
+    backends = args.backends.split(',')
+    modes = args.modes.split(',')
+    workdir = tempfile.mkdtemp(prefix='bench-pipeline-')
+    configure_environment(workdir, parse_env(args.env), max(concurrency_levels))
+
+    try:
+        if args.audio:
+            from ..pcm_audio import load_audio
+            audio_files = [(os.path.abspath(args.audio), len(load_audio(args.audio)) / SAMPLING_RATE)]
+        else:
+            audio_files = []
+            for index, seconds in enumerate(float(value) for value in args.durations.split(',')):
+                path = os.path.join(workdir, f'synthetic_{int(seconds)}s.wav')
+                write_wav(path, make_speech_like_audio(seconds, seed=args.seed + index))
+                audio_files.append((path, seconds))
+
+        rng = random.Random(args.seed)
+        report = {
+            'config': {
+                'backends': backends,
+                'modes': modes,
+                'durations': [seconds for _, seconds in audio_files],
+                'concurrency': concurrency_levels,
+                'rounds': args.rounds,
+                'remoteLatency': args.remote_latency,
+                'remoteRtf': args.remote_rtf,
+                'env': {key: os.environ.get(key) for key in RECORDED_ENV},
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpuCount': os.cpu_count(),
+            },
+            'modelLoadSeconds': None,
+            'results': [],
+        }
+
+        with stubbed_services(args.remote_latency, args.remote_rtf):
+            if 'faster_whisper' in backends:
+                report['modelLoadSeconds'] = measure_model_load()
+            runners = {'direct': run_direct}
+            if 'http' in modes:
+                runners['http'] = make_http_runner()
+            for mode, backend, (audio_file, seconds), concurrency in itertools.product(
+                    modes, backends, audio_files, concurrency_levels):
+                result = run_scenario(runners[mode], backend, audio_file, seconds, concurrency, args.rounds, rng)
+                report['results'].append(dict(
+                    {'mode': mode, 'backend': backend, 'audioSeconds': seconds, 'concurrency': concurrency},
+                    **result
+                ))
+                print(f"{mode:<7}{backend:<22}{seconds:>8.0f}s  x{concurrency:<3}"
+                      f" p50 {result['latency']['p50'] if result['latency'] else float('nan'):>8.2f}s"
+                      f"  {result['throughput']['audioSecondsPerSecond']:>8.1f} 音频秒/秒"
+                      f"  错误 {result['errors']}", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""全文搜索基准。
+
+在临时目录中建立 N 个视频、每个 M 个片段的合成转写索引（用字频近似 Zipf 分布的常用字生成），
+再对高频词、低频短语、单字、多关键词与英文词分别查询，输出建索引耗时与查询延迟 p50/p95。
+
+    python -m <包名>.bench search --videos 10000 --segments 200
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+from ..search_index import SearchIndex
+
+COMMON_CHARS = (
+    '的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所'
+    '民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那'
+    '社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通'
+    '并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区'
+    '强放决西被干做必战先回则任取据处理模型转写视频字幕音频识别语音搜索'
+)
+
+ENGLISH_WORDS = ('gpt', 'whisper', 'python', 'bilibili', 'model', 'api', 'cpu', 'gpu')
+
+
+def make_text(rng, weights):
+    length = rng.randint(8, 30)
+    chars = rng.choices(COMMON_CHARS, weights=weights, k=length)
+    if rng.random() < 0.05:
+        chars.insert(rng.randrange(length), f' {rng.choice(ENGLISH_WORDS)} ')
+    return ''.join(chars)
+
+
+def build_index(path, videos, segments, seed=0):
+    rng = random.Random(seed)
+    # 字频近似 Zipf 分布：排在前面的字出现得多
+    weights = [1 / (rank + 1) for rank in range(len(COMMON_CHARS))]
+    index = SearchIndex(path)
+    started = time.perf_counter()
+    for video in range(videos):
+        transcript = []
+        position = 0.0
+        for _ in range(segments):
+            end = position + rng.uniform(1, 6)
+            transcript.append({'start': position, 'end': end, 'text': make_text(rng, weights)})
+            position = end
+        index.add(f'BV{video:010d}', 1, {'title': f'视频 {video}', 'duration': position, 'transcript': transcript})
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    index.optimize()
+    return index, build_seconds, time.perf_counter() - started
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, default=10000, help='视频数')
+    parser.add_argument('--segments', type=int, default=200, help='每个视频的片段数')
+    parser.add_argument('--queries', default='的,模型,转写视频,字幕 音频,识别语音搜索,gpt,一是', help='查询，逗号分隔')
+    parser.add_argument('--limit', type=int, default=20, help='每次查询返回的结果数')
+    parser.add_argument('--repeat', type=int, default=20, help='每个查询重复次数')
+    parser.add_argument('--index', help='使用已有的索引文件，不重新生成')
+    args = parser.parse_args(argv)
+
+    if args.index:
+        index = SearchIndex(args.index)
+        print(f"索引: {args.index}")
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix='search-bench-'), 'search.sqlite3')
+        index, build_seconds, optimize_seconds = build_index(path, args.videos, args.segments)
+        print(f"建索引: {args.videos} 个视频 x {args.segments} 个片段，耗时 {build_seconds:.1f}s"
+              f"（每个视频 {build_seconds / args.videos * 1000:.2f}ms），optimize {optimize_seconds:.1f}s，"
+              f"文件 {os.path.getsize(path) / 1024 / 1024:.0f}MB")
+
+    print(f"{'查询':<16}{'结果数':>8}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for query in args.queries.split(','):
+        latencies = []
+        results = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            results, _ = index.search(query, limit=args.limit)
+            latencies.append((time.perf_counter() - started) * 1000)
+        print(f"{query:<16}{len(results):>8}{percentile(latencies, 0.5):>10.2f}{percentile(latencies, 0.95):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from threading import Lock
+from .utils import get_checkpoint_path, get_checkpoint_max_age, is_checkpoint_enabled
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只在单进程内保证同一日志不被同时写入
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = '.jsonl'
+
+# 同一时间只有一个进程在启动时续转中断的任务，见 CheckpointStore.claim_interrupted
+RESUME_LOCK_NAME = 'resume.lock'
+
+# 打开日志时顺带清理过期日志的最短间隔（秒）
+CLEANUP_INTERVAL = 3600
+
+
+class CheckpointJournal:
+    """一个转写任务的断点日志（JSONL）。
+
+    第一行记录任务标识、音频时长与重新提交任务所需的信息（metadata），之后每行一个已确定的片段。每写一行都 flush 并 fsync，
+    进程被杀掉时最多丢失正在写的那一行；读取时忽略末尾不完整的行。
+    续转时从最后一个片段的结束时间开始，只转写剩余部分。
+    """
+
+    def __init__(self, path, cache_key, duration=None, metadata=None):
+        self.path = path
+        self.cache_key = cache_key
+        self.duration = duration
+        self.metadata = metadata or {}
+        self.segments = []
+        self._file = None
+
+    @property
+    def offset(self):
+        return self.segments[-1]['end'] if self.segments else 0.0
+
+    def open(self):
+        """读取已有记录并以追加方式打开；其他进程正在写入同一日志时返回 False。"""
+        self._file = open(self.path, 'a+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._file.close()
+                self._file = None
+                return False
+        self._file.seek(0)
+        header, segments, valid_bytes = self._read(self._file)
+        if header is None or header.get('cacheKey') != self.cache_key or not self._same_duration(header):
+            # 新任务，或日志对应的音频已经变化：从头开始
+            segments = []
+            self._file.truncate(0)
+            self._write(dict(self.metadata, cacheKey=self.cache_key, duration=self.duration, createdAt=time.time()))
+        else:
+            # 去掉末尾写了一半的行，后续记录从完整的行之后追加
+            self._file.truncate(valid_bytes)
+        self.segments = segments
+        return True
+
+    def _same_duration(self, header):
+        return not (header.get('duration') and self.duration) or abs(header['duration'] - self.duration) < 1
+
+    @staticmethod
+    def _read(f):
+        """返回 (首行记录, 片段列表, 完整记录的总字节数)。"""
+        header = None
+        segments = []
+        valid_bytes = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # 写到一半的行
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if header is None:
+                header = record
+            else:
+                segments.append(record)
+            valid_bytes += len(line)
+        return header, segments, valid_bytes
+
+    def _write(self, record):
+        self._file.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, segment):
+        if self._file is None:
+            return
+        record = {'start': segment['start'], 'end': segment['end'], 'text': segment['text']}
+        try:
+            self._write(record)
+        except OSError as e:
+            # 写不了断点不影响转写本身，只是之后无法续转
+            logger.error(f"写入断点日志失败，停止记录: {str(e)}")
+            self.close()
+            return
+        self.segments.append(record)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """任务完成后删除日志，结果已经保存在任务与转写缓存中。"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class CheckpointStore:
+    """断点日志目录，日志文件按转写缓存键命名。
+
+    进程退出时未完成的任务由下次启动时的 claim_interrupted 找出并重新提交；客户端重新提交同一任务时也会续转。
+    超过 max_age 秒未更新的日志视为放弃的任务，创建时以及之后每隔 CLEANUP_INTERVAL 秒清理一次。
+    """
+
+    def __init__(self, root, max_age=24 * 3600):
+        self.root = root
+        self.max_age = max_age
+        self.resumed = 0
+        self.resumed_seconds = 0.0
+        self._lock = Lock()
+        self._last_cleanup = 0.0
+        self._resume_lock_file = None
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, cache_key):
+        return os.path.join(self.root, hashlib.sha256(cache_key.encode('utf-8')).hexdigest() + JOURNAL_SUFFIX)
+
+    def open(self, cache_key, duration=None, metadata=None):
+        """打开任务的断点日志，无法使用时（其他进程正在写入、磁盘错误）返回 None。
+
+        metadata 写入日志首行，供重启后重新提交任务（见 claim_interrupted）。
+        """
+        self._maybe_cleanup()
+        journal = CheckpointJournal(self.path_for(cache_key), cache_key, duration, metadata)
+        try:
+            if not journal.open():
+                logger.info(f"断点日志正被其他进程使用，本次不记录断点: {cache_key}")
+                return None
+        except OSError as e:
+            logger.error(f"打开断点日志失败: {str(e)}")
+            journal.close()
+            return None
+        if journal.segments:
+            with self._lock:
+                self.resumed += 1
+                self.resumed_seconds += journal.offset
+            logger.info(f"从断点继续转写: {cache_key}，已完成 {len(journal.segments)} 个片段，{journal.offset:.1f}s")
+        return journal
+
+    def claim_interrupted(self):
+        """返回上次进程退出时未完成的任务的日志首行 [{cacheKey, duration, bvId, part, transcriber, ...}]。
+
+        多个 worker 进程共享日志目录时，只有第一个拿到 resume.lock 的进程返回结果，并一直持有该锁，
+        其他进程启动时返回空列表；正被其他进程写入（持有 flock）的日志属于仍在进行的任务，跳过。
+        """
+        self.cleanup()
+        if fcntl is not None and self._resume_lock_file is None:
+            lock_file = open(os.path.join(self.root, RESUME_LOCK_NAME), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return []
+            self._resume_lock_file = lock_file
+        interrupted = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith(JOURNAL_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.root, name), 'rb') as f:
+                    if fcntl is not None:
+                        try:
+                            fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                        except OSError:
+                            continue
+                    header, _, _ = CheckpointJournal._read(f)
+            except OSError:
+                continue
+            if header is not None and header.get('bvId') and header.get('transcriber'):
+                interrupted.append(header)
+        return interrupted
+
+    def _maybe_cleanup(self):
+        with self._lock:
+            if time.time() - self._last_cleanup < CLEANUP_INTERVAL:
+                return
+            self._last_cleanup = time.time()
+        removed = self.cleanup()
+        if removed:
+            logger.info(f"清理过期断点日志 {removed} 个")
+
+    def cleanup(self):
+        self._last_cleanup = time.time()
+        expire_before = time.time() - self.max_age
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if name.endswith(JOURNAL_SUFFIX) and os.path.getmtime(path) < expire_before:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self):
+        journals = [name for name in os.listdir(self.root) if name.endswith(JOURNAL_SUFFIX)]
+        with self._lock:
+            return {
+                'journals': len(journals),
+                'resumed': self.resumed,
+                'resumedSeconds': round(self.resumed_seconds, 1),
+            }
+
+
+_checkpoint_store = None
+_checkpoint_store_lock = Lock()
+
+
+def get_checkpoint_store():
+    """返回进程内共享的断点日志目录，未启用时返回 None。"""
+    global _checkpoint_store
+    if not is_checkpoint_enabled():
+        return None
+    with _checkpoint_store_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = CheckpointStore(get_checkpoint_path(), max_age=get_checkpoint_max_age())
+            _checkpoint_store._maybe_cleanup()
+        return _checkpoint_store
@@ -0,0 +1,162 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .model_pool import get_model_pool
+from .pcm_audio import SAMPLING_RATE, as_float32, load_audio
+from .utils import get_model_checkout_timeout
+
+logger = logging.getLogger(__name__)
+
+# 相邻分块边界附近，时间重叠且文本相同的片段视为重复（秒）
+DUPLICATE_TOLERANCE = 0.5
+
+
+def find_chunk_boundaries(audio, chunk_seconds, min_silence_duration_ms=500, sampling_rate=SAMPLING_RATE):
+    """按 VAD 检测到的静音把音频切成不超过 chunk_seconds 的分块。
+
+    返回 [(start_sample, end_sample), ...]。每次只对一个分块长度的窗口做 VAD，
+    在窗口内最后一段静音的中点切分，audio 可以是内存映射，不会整段读入内存。
+    与流水线模式一样不在窗口前半段切分，除最后一块外每块至少为 chunk_seconds 的一半：
+    过短的分块同样要一次完整的模型调用，还会丢掉解码上下文。后半段没有静音时只能在语音内部硬切。
+    """
+    total = len(audio)
+    chunk_samples = int(chunk_seconds * sampling_rate)
+    boundaries = []
+    chunk_start = 0
+    while total - chunk_start > chunk_samples:
+        window = as_float32(audio[chunk_start:chunk_start + chunk_samples])
+        cut = find_last_silence(window, min_silence_duration_ms, min_keep=len(window) // 2, sampling_rate=sampling_rate)
+        boundaries.append((chunk_start, chunk_start + cut))
+        chunk_start += cut
+    boundaries.append((chunk_start, total))
+    return boundaries
+
+
+def merge_chunk_segments(chunk_results):
+    """合并各分块的转写结果。
+
+    chunk_results 为按时间排序的 [(offset, end_time, segments)]，片段时间相对于分块起点。
+    结果换算为全局时间，截断到分块范围内，并去掉边界处的重复片段。
+    """
+    merged = []
+    for offset, end_time, segments in chunk_results:
+        merge_chunk_into(merged, offset, end_time, segments)
+    return merged
+
+
+def merge_chunk_into(merged, offset, end_time, segments):
+    """把一个分块的结果接到已合并的片段之后，只与 merged 的最后一个片段比较，可以逐块增量合并。"""
+    for segment in segments:
+        start = min(segment['start'] + offset, end_time)
+        end = min(segment['end'] + offset, end_time)
+        if merged:
+            previous = merged[-1]
+            if (segment['text'].strip() == previous['text'].strip()
+                    and start < previous['end'] + DUPLICATE_TOLERANCE):
+                previous['end'] = max(previous['end'], end)
+                continue
+            start = max(start, previous['end'])
+        if end <= start:
+            continue
+        merged.append({'start': start, 'end': end, 'text': segment['text']})
+
+
+def find_last_silence(audio, min_silence_duration_ms=500, min_keep=0, sampling_rate=SAMPLING_RATE):
+    """返回音频中最后一段静音的中点（样本下标），用于流式处理时确定当前窗口的切分位置。
+
+    切分点不早于 min_keep；找不到合适的静音时返回 len(audio)。
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    speech = get_speech_timestamps(
+        audio,
+        VadOptions(min_silence_duration_ms=min_silence_duration_ms),
+        sampling_rate=sampling_rate
+    )
+    if not speech:
+        return len(audio)
+    cut_points = [
+        (speech[i]['end'] + speech[i + 1]['start']) // 2
+        for i in range(len(speech) - 1)
+    ]
+    if len(audio) - speech[-1]['end'] > min_silence_duration_ms * sampling_rate // 1000:
+        cut_points.append((speech[-1]['end'] + len(audio)) // 2)
+    cut_points = [cut for cut in cut_points if cut >= min_keep]
+    return cut_points[-1] if cut_points else len(audio)
+
+
+class SegmentMerger:
+    """按时间顺序逐块合并转写结果，并把已确定的片段推送给 on_segment。
+
+    每块中最后一个片段可能在合并下一块时被延长，因此要等下一块到达（或结束）后才推送。
+    新的分块只与已合并的最后一个片段比较，合并总耗时与分块数成线性关系。
+    """
+
+    def __init__(self, duration=None, on_segment=None):
+        self.duration = duration
+        self.on_segment = on_segment
+        self.segments = []
+        self._emitted = 0
+
+    def add_chunk(self, offset, end_time, segments, final=False):
+        merge_chunk_into(self.segments, offset, end_time, segments)
+        if self.on_segment:
+            ready = len(self.segments) if final else len(self.segments) - 1
+            for segment in self.segments[self._emitted:ready]:
+                self.on_segment(segment, self.duration)
+            self._emitted = max(self._emitted, ready)
+
+    def flush(self):
+        """所有分块都已加入后调用，推送尚未推送的最后几个片段。"""
+        if self.on_segment:
+            for segment in self.segments[self._emitted:]:
+                self.on_segment(segment, self.duration)
+        self._emitted = len(self.segments)
+
+
+def transcribe_in_chunks(model_key, audio_path, options, chunk_seconds, workers, on_segment=None, offset=0.0):
+    """把长音频按静音切块后并发转写，返回与整段转写相同格式的片段列表。
+
+    每个 worker 从模型池中独占一个模型实例，实际并发度同时受 MODEL_POOL_SIZE 限制。
+    on_segment 按时间顺序回调：后面的分块即使先完成，也会等前面的分块输出后再推送。
+    offset（秒）大于 0 时只转写其后的部分，片段时间仍相对于音频开头。
+    """
+    # PCM 文件以内存映射读取，各分块只在转写时读入自己的部分
+    audio = load_audio(audio_path)
+    duration = len(audio) / SAMPLING_RATE
+    skip = int(offset * SAMPLING_RATE)
+    audio = audio[skip:]
+    vad_parameters = options.get('vad_parameters') or {}
+    boundaries = find_chunk_boundaries(
+        audio,
+        chunk_seconds,
+        min_silence_duration_ms=vad_parameters.get('min_silence_duration_ms', 500)
+    )
+    logger.info(f"音频时长 {duration:.1f}s，切分为 {len(boundaries)} 个分块，并发数 {workers}")
+
+    pool = get_model_pool()
+
+    def transcribe_chunk(bounds):
+        start, end = bounds
+        with pool.checkout(model_key, timeout=get_model_checkout_timeout()) as model:
+            segments, _ = model.transcribe(as_float32(audio[start:end]), **options)
+            return [
+                {'start': segment.start, 'end': segment.end, 'text': segment.text}
+                for segment in segments
+            ]
+
+    merger = SegmentMerger(duration, on_segment)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='chunk') as executor:
+        futures = [executor.submit(transcribe_chunk, bounds) for bounds in boundaries]
+        try:
+            for (start, end), future in zip(boundaries, futures):
+                merger.add_chunk(
+                    (skip + start) / SAMPLING_RATE,
+                    (skip + end) / SAMPLING_RATE,
+                    future.result(),
+                    final=end == len(audio)
+                )
+        except BaseException:
+            # 出错或被取消（on_segment 抛出异常）时不再转写尚未开始的分块
+            for future in futures:
+                future.cancel()
+            raise
+    return merger.segments
@@ -0,0 +1,73 @@
+import time
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被直接拒绝。"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} 暂不可用，{retry_after:.0f} 秒后重试")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """连续失败 failure_threshold 次后打开，在 reset_timeout 秒内直接拒绝调用；
+    之后进入半开状态，只放行一次试探调用，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = Lock()
+
+    def before_call(self):
+        """调用前检查，熔断时抛出 CircuitOpenError。"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self._state == self.OPEN and remaining > 0:
+                raise CircuitOpenError(self.name, remaining)
+            if self._probing:
+                raise CircuitOpenError(self.name, max(remaining, 1))
+            self._state = self.HALF_OPEN
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"{self.name} 已恢复，熔断器关闭")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"{self.name} 连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def stats(self):
+        with self._lock:
+            return {'state': self._state, 'failures': self._failures}
@@ -1,37 +1,166 @@
 import os
+import re
 import time
 import json
 import logging
-from typing import List, Dict, Union, Any
+from contextlib import contextmanager
+from threading import Condition, Lock
+from typing import List, Dict, Optional, Union, Any
+from urllib.parse import urljoin
+import httpx
 from dotenv import load_dotenv
 from gradio_client import Client, handle_file
+from gradio_client.exceptions import AppError
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .utils import (
+    get_cloud_client_pool_size,
+    get_cloud_circuit_failure_threshold,
+    get_cloud_circuit_reset_seconds,
+)
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def space_to_url(space: str) -> str:
+    """把 Hugging Face 空间名（owner/name）转换为直连地址，避免依赖 huggingface_hub 解析。"""
+    if space.startswith(('http://', 'https://')):
+        return space
+    host = re.sub(r'[^a-z0-9]+', '-', space.lower()).strip('-')
+    return f"https://{host}.hf.space"
+
+
+class GradioClientPool:
+    """同一个空间共享的一组长期 gradio 客户端。
+
+    代理通过 httpx_kwargs 按客户端配置，不修改进程环境变量；空闲超过
+    health_check_interval 秒的客户端在取出前做一次健康检查；
+    连接或调用连续失败时由熔断器直接拒绝后续请求。
+    """
+
+    def __init__(self, space: str, proxy_url: Optional[str] = None, size: int = 2,
+                 health_check_interval: int = 60, checkout_timeout: int = 600,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.space = space
+        self.url = space_to_url(space)
+        self.httpx_kwargs = {'proxy': proxy_url} if proxy_url else {}
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self.breaker = breaker or CircuitBreaker(f"Hugging Face 空间 {space}")
+        self._idle = []  # [(client, last_used)]
+        self._total = 0
+        self._cond = Condition()
+
+    def _create_client(self) -> Client:
+        logger.info(f"连接 Hugging Face 空间: {self.url}")
+        return Client(self.url, httpx_kwargs=dict(self.httpx_kwargs), verbose=False)
+
+    def _is_healthy(self, client: Client) -> bool:
+        try:
+            response = httpx.get(urljoin(client.src, 'config'), timeout=5, **self.httpx_kwargs)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def _discard(self, client: Client):
+        try:
+            client.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def _acquire(self) -> Client:
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while not self._idle and self._total >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"等待 {self.space} 的空闲客户端超时")
+                self._cond.wait(remaining)
+            # 拿到空位后再检查熔断器，半开状态下的试探调用不会因排队而卡住
+            self.breaker.before_call()
+            if self._idle:
+                client, last_used = self._idle.pop()
+            else:
+                client, last_used = None, None
+                self._total += 1
+
+        if client is not None:
+            if time.monotonic() - last_used < self.health_check_interval or self._is_healthy(client):
+                return client
+            logger.warning(f"{self.space} 客户端健康检查失败，重新连接")
+            client.close()
+
+        try:
+            return self._create_client()
+        except Exception:
+            self.breaker.record_failure()
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+    @contextmanager
+    def checkout(self):
+        client = self._acquire()
+        try:
+            yield client
+        except AppError:
+            # 空间可以访问，只是处理本次输入出错，客户端仍可复用
+            self.breaker.record_success()
+            self._release(client)
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            self._discard(client)
+            raise
+        self.breaker.record_success()
+        self._release(client)
+
+    def _release(self, client: Client):
+        with self._cond:
+            self._idle.append((client, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = {'space': self.space, 'clients': self._total, 'idle': len(self._idle)}
+        stats.update(circuit=self.breaker.stats())
+        return stats
+
+
+_client_pools = {}
+_client_pools_lock = Lock()
+
+
+def get_gradio_client_pool(space: str, proxy_url: Optional[str] = None) -> GradioClientPool:
+    """按（空间, 代理）返回进程内共享的客户端池。"""
+    with _client_pools_lock:
+        key = (space, proxy_url)
+        if key not in _client_pools:
+            _client_pools[key] = GradioClientPool(
+                space,
+                proxy_url=proxy_url,
+                size=get_cloud_client_pool_size(),
+                breaker=CircuitBreaker(
+                    f"Hugging Face 空间 {space}",
+                    failure_threshold=get_cloud_circuit_failure_threshold(),
+                    reset_timeout=get_cloud_circuit_reset_seconds()
+                )
+            )
+        return _client_pools[key]
+
+
 class CloudFasterWhisperTranscriber:
     def __init__(self):
         self.use_proxy = os.getenv('USE_PROXY', 'False').lower() == 'true'
         self.proxy_url = os.getenv('PROXY_URL', 'http://127.0.0.1:7890')
         self.huggingface_space = os.getenv('HUGGINGFACE_SPACE', 'magicsif/fasterwhisper')
-        
-        if self.use_proxy:
-            self.original_http_proxy = os.environ.get('HTTP_PROXY')
-            self.original_https_proxy = os.environ.get('HTTPS_PROXY')
-            os.environ['HTTP_PROXY'] = self.proxy_url
-            os.environ['HTTPS_PROXY'] = self.proxy_url
-
-        for attempt in range(3):
-            try:
-                self.client = Client(self.huggingface_space)
-                break
-            except Exception as e:
-                if attempt == 2:
-                    self._restore_proxy_settings()
-                    raise Exception(f"无法连接到 Hugging Face 空间 {self.huggingface_space}: {str(e)}")
-                time.sleep(5)
+        self.pool = get_gradio_client_pool(self.huggingface_space, self.proxy_url if self.use_proxy else None)
 
     def transcribe(self, audio_filename: str, language: str = "zh", initial_prompt: str = "以下是普通话的句子。", vad_filter: bool = True, min_silence_duration_ms: int = 500) -> List[Dict[str, Union[float, str]]]:
         if not os.path.exists(audio_filename):
@@ -39,26 +168,28 @@ class CloudFasterWhisperTranscriber:
 
         try:
             logger.info(f"开始转写文件: {audio_filename}")
-            
-            result = self.client.predict(
-                handle_file(audio_filename),
-                language,
-                initial_prompt,
-                vad_filter,
-                min_silence_duration_ms,
-                api_name="/predict"
-            )
+
+            with self.pool.checkout() as client:
+                result = client.predict(
+                    handle_file(audio_filename),
+                    language,
+                    initial_prompt,
+                    vad_filter,
+                    min_silence_duration_ms,
+                    api_name="/predict"
+                )
             
             logger.info("转写完成，开始处理结果")
             return self._process_transcription(result)
+        except CircuitOpenError as e:
+            logger.error(f"Cloud Faster Whisper 转写失败: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"Cloud Faster Whisper 转写失败: {str(e)}")
             logger.error(f"音频文件路径: {audio_filename}")
             logger.error(f"文件是否存在: {os.path.exists(audio_filename)}")
             logger.error(f"文件大小: {os.path.getsize(audio_filename) if os.path.exists(audio_filename) else 'N/A'}")
             raise
-        finally:
-            self._restore_proxy_settings()
 
     def _process_transcription(self, result: Any) -> List[Dict[str, Union[float, str]]]:
         try:
@@ -93,18 +224,3 @@ class CloudFasterWhisperTranscriber:
             logger.error(f"处理转写结果时发生错误: {str(e)}")
             logger.error(f"原始结果: {str(result)[:1000]}...")  # 记录前1000个字符
             raise
-
-    def _restore_proxy_settings(self):
-        if self.use_proxy:
-            if self.original_http_proxy:
-                os.environ['HTTP_PROXY'] = self.original_http_proxy
-            else:
-                os.environ.pop('HTTP_PROXY', None)
-            
-            if self.original_https_proxy:
-                os.environ['HTTPS_PROXY'] = self.original_https_proxy
-            else:
-                os.environ.pop('HTTPS_PROXY', None)
-
-    def __del__(self):
-        self._restore_proxy_settings()
\ No newline at end of file
@@ -127,6 +127,7 @@ function App() {
   const [bvId, setBvId] = useState('');
   const [transcript, setTranscript] = useState('');
   const [videoTitle, setVideoTitle] = useState('');
+  const [cacheKey, setCacheKey] = useState('');
   const [loading, setLoading] = useState(false);
   const [showSnackbar, setShowSnackbar] = useState(false);
   const [copied, setCopied] = useState(false);
@@ -149,6 +150,7 @@ function App() {
     setBvId(item.bvId);
     setVideoTitle(item.title);
     setTranscript(item.transcript);
+    setCacheKey(item.cacheKey || '');
     setTranscriberType(item.transcriberType);
     setOpenHistory(false);
   };
@@ -165,13 +167,17 @@ function App() {
   const handleExportSrt = async () => {
     setExportingSrt(true);
     try {
-      const response = await fetch('/api/export_srt', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ transcript, videoTitle }),
-      });
+      // 服务端缓存中有结果时直接按缓存 ID 导出，无需上传转写内容
+      let response = cacheKey ? await fetch(`/api/cache/${cacheKey}/export?format=srt`) : null;
+      if (!response || !response.ok) {
+        response = await fetch('/api/export_srt', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({ transcript, videoTitle }),
+        });
+      }
 
       if (!response.ok) {
         throw new Error('导出 SRT 失败');
@@ -263,11 +269,6 @@ function App() {
     }, 100);
   };
 
-  const updateProgressEstimation = (newEstimate) => {
-    clearInterval(progressIntervalRef.current);
-    startProgressEstimation(newEstimate);
-  };
-
   const stopProgressEstimation = () => {
     if (progressIntervalRef.current) {
       clearInterval(progressIntervalRef.current);
@@ -289,6 +290,46 @@ function App() {
     }, 1000);
   };
   
+  // 订阅任务事件流：逐段显示转写结果，直到收到 done 或 failed 事件
+  const streamJobEvents = (jobId) => new Promise((resolve, reject) => {
+    const source = new EventSource(`/api/jobs/${jobId}/events`);
+    const segments = [];
+
+    source.addEventListener('status', (e) => {
+      const data = JSON.parse(e.data);
+      if (data.stage) {
+        setStatus(data.stage);
+      }
+    });
+    source.addEventListener('segment', (e) => {
+      const segment = JSON.parse(e.data);
+      segments.push({ start: segment.start, end: segment.end, text: segment.text });
+      setTranscript([...segments]);
+      stopProgressEstimation();
+      setStatus('正在转写音频');
+      setProgress(Math.min(segment.percent * 100, 99));
+    });
+    // 改用其他转写服务的结果：丢弃已显示的片段，之后的片段从头推送
+    source.addEventListener('reset', () => {
+      segments.length = 0;
+      setTranscript([]);
+    });
+    source.addEventListener('done', (e) => {
+      source.close();
+      resolve(JSON.parse(e.data));
+    });
+    source.addEventListener('failed', (e) => {
+      source.close();
+      reject(JSON.parse(e.data));
+    });
+    source.onerror = () => {
+      // 连接断开时浏览器会自动重连并从最后收到的片段继续，只有彻底关闭时才放弃
+      if (source.readyState === EventSource.CLOSED) {
+        reject({ error: '与服务器的连接已断开' });
+      }
+    };
+  });
+
   const handleSubmit = async (e) => {
     e.preventDefault();
   
@@ -303,11 +344,12 @@ function App() {
     setErrorDetails('');
     setTranscript('');
     setVideoTitle('');
+    setCacheKey('');
     setStatus('开始处理');
     startProgressEstimation(estimatedTime);
   
     try {
-      const response = await fetch('/api/transcribe', {
+      const response = await fetch('/api/jobs', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -318,11 +360,20 @@ function App() {
       const data = await response.json();
   
       if (!response.ok) {
-        if (response.status === 429) {
+        if (response.status === 429 && data.code === 'TOO_MANY_JOBS') {
+          // 同一客户端提交的任务过多
+          setError('任务过多');
+          setErrorDetails(data.error);
+        } else if (response.status === 429) {
           // 处理速率限制错误
           setError('速率限制');
           setErrorDetails(`请求过于频繁，请在 ${data.retryAfter} 秒后重试。`);
           startRetryCountdown(data.retryAfter);
+        } else if (response.status === 503) {
+          // 服务端任务队列已满
+          setError('服务繁忙');
+          setErrorDetails(`当前排队任务较多，请在 ${data.retryAfter} 秒后重试。`);
+          startRetryCountdown(data.retryAfter);
         } else {
           // 处理其他错误
           setError(data.error);
@@ -330,33 +381,40 @@ function App() {
         }
         throw new Error(data.error);
       }
+
+      const result = await streamJobEvents(data.jobId);
+      stopProgressEstimation();
+      setProgress(100);
+      setStatus('处理完成');
+      setEstimatedTime(calculateEstimatedTime(result.duration));
   
-      const newEstimatedTime = calculateEstimatedTime(data.duration);
-      setEstimatedTime(newEstimatedTime);
-      updateProgressEstimation(newEstimatedTime);
-  
-      const formattedTranscript = Array.isArray(data.transcript) ? data.transcript : [{
-        text: data.transcript,
+      const formattedTranscript = Array.isArray(result.transcript) ? result.transcript : [{
+        text: result.transcript,
         start: 0,
-        end: data.duration || 0
+        end: result.duration || 0
       }];
       setTranscript(formattedTranscript);
-      setVideoTitle(data.title);
+      setVideoTitle(result.title);
+      setCacheKey(data.cacheKey || '');
       setShowSnackbar(true);
   
       const newEntry = {
         id: Date.now(),
         bvId,
-        title: data.title,
+        title: result.title,
         transcriberType,
+        cacheKey: data.cacheKey,
         createdAt: new Date().toISOString(),
         tags: [],
         transcript: formattedTranscript
       };
       addToHistory(newEntry);
-  
-      pollProgress(bvId);
     } catch (err) {
+      if (!(err instanceof Error)) {
+        // 事件流中返回的错误
+        setError(err.error);
+        setErrorDetails(err.details || '');
+      }
       console.error('Error during transcription:', err);
       stopProgressEstimation();
     } finally {
@@ -366,27 +424,6 @@ function App() {
 
   const [selectedHistoryEntry, setSelectedHistoryEntry] = useState(null);
 
-  const pollProgress = async (bvId) => {
-    const pollInterval = setInterval(async () => {
-      try {
-        const response = await fetch(`/api/progress?bvId=${bvId}`);
-        const data = await response.json();
-        setStatus(data.status);
-        if (data.status === '处理完成' || data.status === '转写失败') {
-          clearInterval(pollInterval);
-          stopProgressEstimation();
-          if (data.status === '转写失败') {
-            setError(data.details || '转写过程中发生错误');
-          } else {
-            setProgress(100);
-          }
-        }
-      } catch (error) {
-        console.error('Error polling progress:', error);
-      }
-    }, 1000);
-  };
-
   const formatDuration = (seconds) => {
   const minutes = Math.floor(seconds / 60);
   const remainingSeconds = seconds % 60;
@@ -544,6 +581,9 @@ function App() {
                         {enabledTranscribers.cloud_faster_whisper && (
                           <MenuItem value="cloud_faster_whisper">云端 Faster Whisper</MenuItem>
                         )}
+                        {enabledTranscribers.auto && (
+                          <MenuItem value="auto">自动选择</MenuItem>
+                        )}
                       </Select>
                       {noEnabledTranscribers && (
                         <FormHelperText>没有可用的转写服务</FormHelperText>
@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from flask import request
+from .utils import get_export_cache_max_bytes, get_compress_level
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，未安装时只提供 gzip
+    brotli = None
+
+# 小于该大小（字节）的响应不压缩，压缩收益抵不上开销
+COMPRESS_MIN_BYTES = 1024
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-subrip',
+    'text/vtt',
+    'text/x-ssa',
+    'text/plain',
+}
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择响应编码，优先 br，其次 gzip，都不接受时返回 None。"""
+    weights = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+    for encoding in supported_encodings():
+        if weights.get(encoding, weights.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    level = get_compress_level()
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    if encoding == 'gzip':
+        # mtime 固定为 0，相同内容得到相同的字节，强 ETag 才成立
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return data
+
+
+def make_etag(*parts):
+    """由资源标识、版本、格式与编码生成强 ETag 的值（不含引号）。
+
+    同一资源的不同编码是不同的表示，字节不同，因此编码也参与计算。
+    """
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:32]
+
+
+class RenderedCache:
+    """按 ETag 缓存渲染并压缩好的响应体，总大小超过 max_bytes 时淘汰最久未用的条目。"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # etag -> (body, metadata)
+        self._size = 0
+        self._lock = Lock()
+
+    def get(self, etag):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def put(self, etag, body, metadata=None):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[etag] = (body, metadata)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRatio': self.hits / lookups if lookups else 0.0
+            }
+
+
+def compress_response(response):
+    """after_request 钩子：按 Accept-Encoding 压缩 JSON 与字幕响应。
+
+    流式响应（事件流、流式导出）与已经编码过的响应保持原样。
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    data = response.get_data()
+    if encoding is None or len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    if response.headers.get('ETag'):
+        # 压缩后的字节与原 ETag 对应的不同，改为弱 ETag
+        etag, weak = response.get_etag()
+        if not weak:
+            response.set_etag(etag, weak=True)
+    return response
+
+
+_rendered_cache = None
+_rendered_cache_lock = Lock()
+
+
+def get_rendered_cache():
+    global _rendered_cache
+    with _rendered_cache_lock:
+        if _rendered_cache is None:
+            _rendered_cache = RenderedCache(get_export_cache_max_bytes())
+        return _rendered_cache
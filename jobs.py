@@ -0,0 +1,706 @@
+import os
+import time
+import uuid
+import heapq
+import logging
+from collections import deque
+from threading import Condition, Event, Lock, Thread
+from .services import (
+    download_bilibili_audio,
+    transcribe_audio,
+    release_audio_file,
+    prepare_audio,
+    get_transcript_cache_key,
+    get_cached_video_duration,
+    open_bilibili_audio_stream,
+    transcribe_audio_stream,
+    RESUMABLE_TRANSCRIBERS,
+)
+from .checkpoint import get_checkpoint_store
+from .scheduler import JobScheduler
+from .metrics import record_timings, JOBS_FINISHED
+from .state_backend import get_state_backend
+from .transcriber_router import get_transcriber_router
+from .transcriber_registry import get_transcriber_registry
+from .transcript_cache import get_transcript_cache
+from .search_index import index_result
+from .utils import (
+    update_progress,
+    get_max_video_duration,
+    get_download_workers,
+    get_transcribe_workers,
+    get_job_queue_size,
+    get_job_result_ttl,
+    get_job_max_per_client,
+    get_scheduler_aging_rate,
+    is_streaming_pipeline_enabled,
+    is_interrupted_job_resume_enabled,
+)
+
+logger = logging.getLogger(__name__)
+
+# 没有历史数据时，单个任务转写耗时的估计值（秒）
+DEFAULT_JOB_SECONDS = 60
+
+# 转写过程中任务快照写入共享存储的最小间隔（秒）
+SNAPSHOT_INTERVAL = 1
+
+JOB_QUEUED = 'queued'
+JOB_DOWNLOADING = 'downloading'
+JOB_TRANSCRIBING = 'transcribing'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("任务队列已满")
+        self.retry_after = retry_after
+
+
+class ClientQuotaExceeded(Exception):
+    def __init__(self, limit):
+        super().__init__(f"同一客户端最多同时提交 {limit} 个任务")
+        self.limit = limit
+
+
+class TranscriberUnavailable(Exception):
+    """请求的转写服务未知或未启用，提交时即拒绝，不占用队列、不下载音频。"""
+
+
+class Job:
+    def __init__(self, bv_id, transcriber_type, part=1, client=None):
+        self.id = uuid.uuid4().hex
+        self.client = client
+        self.bv_id = bv_id
+        self.part = part
+        self.transcriber_type = transcriber_type
+        self.cache_key = get_transcript_cache_key(bv_id, part, transcriber_type)
+        self.cached = False
+        # 共享此任务结果的请求数（包括发起者）
+        self.subscribers = 1
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.title = None
+        self.duration = None
+        self.audio_filename = None
+        # 预解码的 PCM 文件，可能与 audio_filename 相同（音频存储为 PCM 时）
+        self.pcm_filename = None
+        # 流水线模式下的音频字节流，与 audio_filename 二选一
+        self.stream_source = None
+        self.result = None
+        # 失败时的 (HTTP 状态码, 错误响应体)，与同步接口的错误格式保持一致
+        self.error = None
+        # 已解码的片段与完成比例，供流式接口增量推送
+        self.segments = []
+        self.percent = 0.0
+        # 片段被整体替换（auto 模式改用其他服务的结果）的次数，流式接口据此通知客户端从头接收
+        self.generation = 0
+        # 从断点继续转写时，断点所在的音频位置（秒）
+        self.resumed_from = 0.0
+        self.rtf = None
+        # 调度用的估算转写耗时（秒），以及预计开始、结束转写的时间戳
+        self.cost = None
+        self.transcribe_started_at = None
+        self.estimated_start = None
+        self.estimated_finish = None
+        # 各处理阶段的耗时明细（阶段 -> 秒），见 metrics.span
+        self.timings = {}
+        self._callbacks = []
+        self._done = Event()
+        self._updated = Condition()
+        self._persisted_at = 0
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """任务结束（完成或失败）时以 callback(job) 通知；已结束的任务立即回调。"""
+        with self._updated:
+            if not self.finished:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _run_callbacks(self):
+        with self._updated:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logger.exception(f"任务 {self.id} 的结束回调执行失败")
+
+    def set_status(self, status):
+        self.status = status
+        self.persist()
+
+    def persist(self):
+        """把任务快照写入共享状态存储，使其他 worker 进程也能查询此任务。"""
+        self._persisted_at = time.monotonic()
+        try:
+            get_state_backend().set(f"job:{self.id}", self.snapshot(), get_job_result_ttl())
+        except Exception as e:
+            logger.error(f"写入任务状态失败: {str(e)}")
+
+    def add_segment(self, segment, duration=None):
+        with self._updated:
+            self.segments.append(segment)
+            if duration:
+                self.percent = min(1.0, segment['end'] / duration)
+            self._updated.notify_all()
+        if time.monotonic() - self._persisted_at > SNAPSHOT_INTERVAL:
+            self.persist()
+
+    def reset_segments(self):
+        """丢弃已推送的片段：auto 模式的最终结果来自另一个转写服务时调用，完成时再以最终结果补齐。"""
+        with self._updated:
+            self.segments = []
+            self.percent = 0.0
+            self.generation += 1
+            self._updated.notify_all()
+        self.persist()
+
+    def wait_for_segments(self, cursor, timeout=None, generation=0):
+        """等待 cursor 之后的新片段或任务结束，返回 (新片段, 是否已结束, 片段代数)。
+
+        片段在调用方所知的 generation 之后被重置过时，返回从头开始的全部片段。
+        """
+        with self._updated:
+            self._updated.wait_for(
+                lambda: len(self.segments) > cursor or self.finished or self.generation != generation, timeout)
+            if self.generation != generation:
+                cursor = 0
+            return self.segments[cursor:], self.finished, self.generation
+
+    def complete(self, result):
+        with self._updated:
+            transcript = result.get('transcript')
+            if not self.segments and isinstance(transcript, list):
+                # 不支持逐段输出的转写器，在结束时一次性补齐片段
+                self.segments = list(transcript)
+            self.result = result
+            self.percent = 1.0
+            self.status = JOB_COMPLETED
+            self.finished_at = time.time()
+            self._done.set()
+            self._updated.notify_all()
+        JOBS_FINISHED.inc(transcriber=self.transcriber_type, status='cached' if self.cached else JOB_COMPLETED)
+        self.persist()
+        self._run_callbacks()
+
+    def fail(self, status_code, payload):
+        with self._updated:
+            self.error = (status_code, payload)
+            self.status = JOB_FAILED
+            self.finished_at = time.time()
+            self._done.set()
+            self._updated.notify_all()
+        JOBS_FINISHED.inc(transcriber=self.transcriber_type, status=JOB_FAILED)
+        self.persist()
+        self._run_callbacks()
+
+    def to_dict(self):
+        data = {
+            'jobId': self.id,
+            'bvId': self.bv_id,
+            'part': self.part,
+            'transcriberType': self.transcriber_type,
+            'status': self.status,
+            'cached': self.cached,
+            'cacheKey': self.cache_key,
+            'subscribers': self.subscribers,
+            'percent': self.percent,
+            'rtf': self.rtf,
+            'resumedFrom': self.resumed_from,
+            'estimatedStart': self.estimated_start,
+            'estimatedFinish': self.estimated_finish,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+            'timings': dict(self.timings),
+        }
+        if self.status == JOB_COMPLETED:
+            data['result'] = self.result
+        elif self.status == JOB_FAILED:
+            data['error'] = self.error[1]
+        return data
+
+    def snapshot(self):
+        data = self.to_dict()
+        data['duration'] = self.duration
+        if self.error:
+            data['errorStatus'] = self.error[0]
+        return data
+
+
+class RemoteJob:
+    """由其他 worker 进程执行的任务的只读视图，数据来自共享状态存储。
+
+    提供与 Job 相同的查询接口；由于拿不到逐段结果，片段在任务结束后一次性给出。
+    """
+
+    POLL_INTERVAL = 1
+
+    def __init__(self, snapshot):
+        self._load(snapshot)
+
+    @classmethod
+    def load(cls, job_id):
+        snapshot = get_state_backend().get(f"job:{job_id}")
+        return cls(snapshot) if snapshot else None
+
+    def _load(self, snapshot):
+        self._snapshot = snapshot
+        self.id = snapshot['jobId']
+        self.bv_id = snapshot['bvId']
+        self.part = snapshot.get('part', 1)
+        self.status = snapshot['status']
+        self.percent = snapshot.get('percent', 0.0)
+        self.duration = snapshot.get('duration')
+        self.result = snapshot.get('result')
+        self.error = (snapshot['errorStatus'], snapshot['error']) if 'error' in snapshot else None
+        transcript = (self.result or {}).get('transcript')
+        self.segments = transcript if isinstance(transcript, list) else []
+
+    @property
+    def finished(self):
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def refresh(self):
+        snapshot = get_state_backend().get(f"job:{self.id}")
+        if snapshot:
+            self._load(snapshot)
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.finished:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(self.POLL_INTERVAL)
+            self.refresh()
+        return self.finished
+
+    def wait_for_segments(self, cursor, timeout=None, generation=0):
+        self.wait(timeout)
+        return self.segments[cursor:], self.finished, generation
+
+    def to_dict(self):
+        return {key: value for key, value in self._snapshot.items() if key not in ('duration', 'errorStatus')}
+
+
+class JobManager:
+    """下载与转写分开排队的后台任务管理器。
+
+    下载是 IO 密集型、转写是 CPU 密集型，两类 worker 的数量分别配置；
+    两个队列都按估算代价（视频时长 × 转写服务实时率）调度，短任务优先，
+    参见 JobScheduler。排队中的任务数超过 max_queue 时拒绝新任务，由调用方返回 503；
+    单个客户端未完成的任务数超过 max_per_client 时返回 429。
+    """
+
+    def __init__(self, download_workers=2, transcribe_workers=1, max_queue=20, result_ttl=3600,
+                 max_per_client=3, aging_rate=1.0):
+        self.download_workers = max(1, download_workers)
+        self.transcribe_workers = max(1, transcribe_workers)
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.max_per_client = max_per_client
+        self._jobs = {}
+        # cache_key -> 尚未结束的任务，相同请求合并到同一个任务上
+        self._inflight = {}
+        self._lock = Lock()
+        self._download_queue = JobScheduler(aging_rate)
+        self._transcribe_queue = JobScheduler(aging_rate)
+        self._job_seconds = deque(maxlen=20)
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.download_workers):
+            self._spawn(self._download_loop, f"download-worker-{i}")
+        for i in range(self.transcribe_workers):
+            self._spawn(self._transcribe_loop, f"transcribe-worker-{i}")
+        logger.info(f"任务队列已启动: 下载 worker {self.download_workers} 个, 转写 worker {self.transcribe_workers} 个")
+
+    def _spawn(self, target, name):
+        thread = Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def shutdown(self):
+        self._download_queue.close()
+        self._transcribe_queue.close()
+        self._threads = []
+
+    def submit(self, bv_id, transcriber_type, client=None, part=1):
+        try:
+            get_transcriber_registry().check_available(transcriber_type)
+        except ValueError as e:
+            raise TranscriberUnavailable(str(e))
+        job = Job(bv_id, transcriber_type, part=part, client=client)
+        cache = get_transcript_cache()
+        cached_result = cache.get(job.cache_key) if cache else None
+        if cached_result is not None:
+            # 命中缓存：不下载也不排队，直接返回已完成的任务
+            logger.info(f"转写缓存命中: {bv_id} ({transcriber_type})")
+            job.cached = True
+            job.complete(cached_result)
+            with self._lock:
+                self._prune_finished()
+                self._jobs[job.id] = job
+            update_progress(bv_id, '处理完成', part=part)
+            return job
+
+        duration = get_cached_video_duration(bv_id, part)
+        if duration and duration > get_max_video_duration():
+            # 视频信息已缓存，超长视频无需排队即可拒绝
+            job.duration = duration
+            self._fail_duration_exceeded(job, f"视频时长 ({duration}秒) 超过允许的最大时长 ({get_max_video_duration()}秒)")
+            with self._lock:
+                self._prune_finished()
+                self._jobs[job.id] = job
+            return job
+
+        with self._lock:
+            self._prune_finished()
+            inflight = self._inflight.get(job.cache_key)
+            if inflight is not None and not inflight.finished:
+                # 同一视频、同一参数的任务正在进行，直接复用它的进度与结果
+                inflight.subscribers += 1
+                logger.info(f"合并重复请求到任务 {inflight.id}: {bv_id} ({transcriber_type})")
+                return inflight
+            pending = self._pending_count()
+            if pending >= self.max_queue:
+                raise JobQueueFull(self._estimate_wait(pending))
+            if client is not None and self.max_per_client and sum(
+                    1 for other in self._jobs.values()
+                    if other.client == client and not other.finished) >= self.max_per_client:
+                raise ClientQuotaExceeded(self.max_per_client)
+            job.duration = duration
+            job.cost = self._estimate_cost(job)
+            self._jobs[job.id] = job
+            self._inflight[job.cache_key] = job
+            self._download_queue.put(job, job.cost, client)
+            self._update_estimates()
+        job.persist()
+        update_progress(bv_id, '排队中', part=part)
+        return job
+
+    def get(self, job_id):
+        """返回本进程的任务；不在本进程时，从共享状态存储读取其他进程的任务。"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._update_estimates()
+        return job if job is not None else RemoteJob.load(job_id)
+
+    def find_active(self, bv_id, part=1):
+        """返回本进程中该视频（分P）尚未结束的任务（取最早提交的一个）。"""
+        with self._lock:
+            active = [job for job in self._jobs.values()
+                      if job.bv_id == bv_id and job.part == part and not job.finished]
+            if not active:
+                return None
+            self._update_estimates()
+            return min(active, key=lambda job: job.created_at)
+
+    def queue_depth(self):
+        with self._lock:
+            return self._pending_count()
+
+    def queue_lengths(self):
+        """各队列中等待出队的任务数。"""
+        return {'download': len(self._download_queue), 'transcribe': len(self._transcribe_queue)}
+
+    def estimate_retry_after(self):
+        with self._lock:
+            return self._estimate_wait(self._pending_count())
+
+    def _pending_count(self):
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _average_job_seconds(self):
+        if self._job_seconds:
+            return sum(self._job_seconds) / len(self._job_seconds)
+        return DEFAULT_JOB_SECONDS
+
+    def _estimate_cost(self, job):
+        """估算任务的转写耗时：时长已知时为 时长 × 实时率，否则取近期任务的平均耗时。"""
+        if not job.duration:
+            return self._average_job_seconds()
+        return get_transcriber_router().service_seconds(job.transcriber_type, job.duration)
+
+    def _update_estimates(self):
+        """按调度顺序模拟各转写 worker 的占用情况，估算每个未完成任务的开始与结束时间。
+
+        下载耗时不计入，尚未下载的任务排在已下载的任务之后。
+        """
+        now = time.time()
+        free_at = []
+        for job in self._jobs.values():
+            if job.status == JOB_TRANSCRIBING and not job.finished and job.transcribe_started_at:
+                job.estimated_start = job.transcribe_started_at
+                job.estimated_finish = max(now, job.transcribe_started_at + (job.cost or 0))
+                free_at.append(job.estimated_finish)
+        free_at = sorted(free_at)[:self.transcribe_workers]
+        free_at += [now] * (self.transcribe_workers - len(free_at))
+        heapq.heapify(free_at)
+
+        waiting = [job for job, _ in self._transcribe_queue.ordered()]
+        downloading = [job for job in self._jobs.values()
+                       if job.status == JOB_DOWNLOADING and not job.finished and job not in waiting]
+        waiting += sorted(downloading, key=lambda job: job.cost or 0)
+        waiting += [job for job, _ in self._download_queue.ordered()]
+        for job in waiting:
+            start = heapq.heappop(free_at)
+            job.estimated_start = start
+            job.estimated_finish = start + (job.cost or self._average_job_seconds())
+            heapq.heappush(free_at, job.estimated_finish)
+
+    def _estimate_wait(self, pending):
+        average = self._average_job_seconds()
+        # 至少需要等一个正在运行的任务结束才会空出位置
+        slots_ahead = max(1, pending - self.max_queue + 1)
+        return max(1, int(average * slots_ahead / self.transcribe_workers))
+
+    def _prune_finished(self):
+        for key in [key for key, job in self._inflight.items() if job.finished]:
+            del self._inflight[key]
+        expire_before = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < expire_before]:
+            del self._jobs[job_id]
+
+    def _download_loop(self):
+        while True:
+            job = self._download_queue.get()
+            if job is None:
+                return
+            try:
+                with record_timings(job.timings):
+                    downloaded = self._download(job)
+                if downloaded:
+                    with self._lock:
+                        # 下载后时长已确定，重新估算代价
+                        job.cost = self._estimate_cost(job)
+                        self._transcribe_queue.put(job, job.cost, job.client)
+            except Exception as e:
+                logger.exception(f"任务 {job.id} 下载阶段发生未处理的错误")
+                self._fail_transcription(job, e)
+
+    def _transcribe_loop(self):
+        while True:
+            job = self._transcribe_queue.get()
+            if job is None:
+                return
+            try:
+                with record_timings(job.timings):
+                    self._transcribe(job)
+            except Exception as e:
+                logger.exception(f"任务 {job.id} 转写阶段发生未处理的错误")
+                self._fail_transcription(job, e)
+
+    def _download(self, job):
+        job.set_status(JOB_DOWNLOADING)
+        job.started_at = time.time()
+        job.timings['queued'] = round(job.started_at - job.created_at, 3)
+        update_progress(job.bv_id, '开始处理', part=job.part)
+        try:
+            if self._use_streaming(job):
+                # 流水线模式：这里只解析视频信息，下载与转写在转写 worker 中同时进行
+                bvid, title, duration, job.stream_source = open_bilibili_audio_stream(job.bv_id, job.part)
+                job.title = title
+                job.duration = duration
+                if duration is None:
+                    raise ValueError('无法获取视频时长')
+                return True
+
+            bvid, title, audio_filename, duration = download_bilibili_audio(job.bv_id, job.part)
+            job.audio_filename = audio_filename
+            job.title = title
+            job.duration = duration
+
+            if duration is None:
+                raise ValueError('无法获取视频时长')
+
+            max_duration = get_max_video_duration()
+            if duration > max_duration:
+                raise ValueError(f"视频时长 ({duration}秒) 超过允许的最大时长 ({max_duration}秒)")
+
+            if not audio_filename or not os.path.exists(audio_filename):
+                raise ValueError('音频下载失败或文件不存在')
+
+            # 在下载 worker 中完成解码，转写 worker 只读取 PCM
+            update_progress(job.bv_id, '正在解码音频', part=job.part)
+            job.pcm_filename = prepare_audio(audio_filename, job.transcriber_type)
+            return True
+
+        except ValueError as e:
+            if job.audio_filename:
+                release_audio_file(job.audio_filename)
+            error_message = str(e)
+            if "视频时长" in error_message:
+                self._fail_duration_exceeded(job, error_message)
+            else:
+                job.fail(400, {
+                    'error': '下载失败',
+                    'details': error_message,
+                    'code': 'DOWNLOAD_FAILED'
+                })
+            return False
+
+    def _transcribe(self, job):
+        job.transcribe_started_at = time.time()
+        job.set_status(JOB_TRANSCRIBING)
+        update_progress(job.bv_id, '开始音频转写', part=job.part)
+        started = time.monotonic()
+
+        # 之前中断的同一任务留下的片段直接复用，只转写断点之后的部分
+        journal = self._open_journal(job)
+        resumed = list(journal.segments) if journal is not None else []
+        if resumed:
+            job.resumed_from = journal.offset
+            for segment in resumed:
+                job.add_segment(segment, job.duration)
+            update_progress(job.bv_id, '从断点继续转写', percent=job.percent, part=job.part)
+
+        def on_segment(segment, duration):
+            if journal is not None:
+                journal.append(segment)
+            job.add_segment(segment, duration)
+            update_progress(job.bv_id, '正在转写音频', percent=job.percent, part=job.part)
+
+        try:
+            if job.stream_source is not None:
+                transcript = transcribe_audio_stream(job.stream_source, duration=job.duration, on_segment=on_segment)
+            else:
+                transcript = transcribe_audio(
+                    job.audio_filename,
+                    job.transcriber_type,
+                    on_segment=on_segment,
+                    duration=job.duration,
+                    pcm_filename=job.pcm_filename,
+                    offset=job.resumed_from,
+                    on_reset=job.reset_segments
+                )
+        finally:
+            if journal is not None:
+                journal.close()
+        if transcript is None:
+            raise Exception("转写失败")
+        transcript = resumed + transcript
+
+        if job.audio_filename:
+            release_audio_file(job.audio_filename, job.pcm_filename)
+        update_progress(job.bv_id, '处理完成', part=job.part)
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._job_seconds.append(elapsed)
+        if job.duration and job.duration > job.resumed_from:
+            # 实时率：转写耗时 / 本次转写的音频时长，越小越快
+            job.rtf = elapsed / (job.duration - job.resumed_from)
+            logger.info(f"任务 {job.id} ({job.transcriber_type}) 转写耗时 {elapsed:.1f}s, RTF {job.rtf:.3f}")
+        result = {
+            'transcript': transcript,
+            'title': job.title,
+            'bvId': job.bv_id,
+            'part': job.part,
+            'duration': job.duration
+        }
+        cache = get_transcript_cache()
+        if cache:
+            try:
+                cache.put(job.cache_key, result)
+            except Exception as e:
+                logger.error(f"写入转写缓存失败: {str(e)}")
+        index_result(job.bv_id, job.part, result, cache_key=job.cache_key)
+        if journal is not None:
+            journal.discard()
+        job.complete(result)
+
+    @staticmethod
+    def _open_journal(job):
+        """打开任务的断点日志；流水线模式与远程转写服务不记录断点。"""
+        if job.stream_source is not None or job.transcriber_type not in RESUMABLE_TRANSCRIBERS:
+            return None
+        store = get_checkpoint_store()
+        if store is None:
+            return None
+        return store.open(job.cache_key, job.duration,
+                          metadata={'bvId': job.bv_id, 'part': job.part, 'transcriber': job.transcriber_type})
+
+    @staticmethod
+    def _use_streaming(job):
+        return is_streaming_pipeline_enabled() and job.transcriber_type == 'faster_whisper'
+
+    def _fail_duration_exceeded(self, job, error_message):
+        job.fail(400, {
+            'error': '视频时长超出限制',
+            'details': error_message,
+            'code': 'DURATION_EXCEEDED',
+            'maxDuration': get_max_video_duration(),
+            'videoDuration': job.duration or get_cached_video_duration(job.bv_id, job.part) or 0
+        })
+
+    def _fail_transcription(self, job, exc):
+        if job.audio_filename and os.path.exists(job.audio_filename):
+            release_audio_file(job.audio_filename, job.pcm_filename)
+        error_message = f"转写失败: {str(exc)}"
+        update_progress(job.bv_id, '转写失败', error_message, part=job.part)
+        job.fail(500, {
+            'error': '转录过程中发生错误',
+            'details': error_message,
+            'code': 'TRANSCRIPTION_FAILED'
+        })
+
+
+_job_manager = None
+_job_manager_lock = Lock()
+
+
+def get_job_manager():
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager(
+                download_workers=get_download_workers(),
+                transcribe_workers=get_transcribe_workers(),
+                max_queue=get_job_queue_size(),
+                result_ttl=get_job_result_ttl(),
+                max_per_client=get_job_max_per_client(),
+                aging_rate=get_scheduler_aging_rate()
+            )
+        return _job_manager
+
+
+def resume_interrupted_jobs():
+    """启动时调用：把上次进程退出（崩溃、被杀掉、被回收）时未完成的本地转写任务重新提交，从断点继续。
+
+    只续转日志中的任务与当前配置一致（转写缓存键相同）的日志；不一致的日志到期后清理。返回重新提交的任务数。
+    """
+    store = get_checkpoint_store()
+    if store is None or not is_interrupted_job_resume_enabled():
+        return 0
+    manager = get_job_manager()
+    resumed = 0
+    for header in store.claim_interrupted():
+        bv_id, part, transcriber_type = header['bvId'], header.get('part') or 1, header['transcriber']
+        if get_transcript_cache_key(bv_id, part, transcriber_type) != header.get('cacheKey'):
+            logger.info(f"断点日志与当前配置不一致，不续转: {bv_id} P{part} ({transcriber_type})")
+            continue
+        try:
+            manager.submit(bv_id, transcriber_type, part=part)
+        except (JobQueueFull, TranscriberUnavailable) as e:
+            logger.warning(f"续转中断的任务失败 {bv_id} P{part}: {str(e)}")
+            continue
+        resumed += 1
+    if resumed:
+        logger.info(f"已重新提交上次中断的任务 {resumed} 个")
+    return resumed
@@ -0,0 +1,220 @@
+import time
+import logging
+from contextlib import contextmanager
+from threading import Lock, local
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'bilitrans_'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+RTF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 4)
+THROUGHPUT_BUCKETS = tuple(1024 * 2 ** i for i in range(0, 16, 2))  # 1KB/s ~ 1GB/s
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # 标签值元组 -> 数值（直方图为状态列表）
+        self._lock = Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        for key, value in items:
+            yield f"{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(value)}"
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶计数..., 总和, 总数]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def _render_samples(self, items):
+        for key, state in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = _format_value(bound if bound == float('inf') else float(bound))
+                yield f"{self.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(state[-2])}"
+            yield f"{self.name}_count{_format_labels(labels)} {state[-1]}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus 文本格式（0.0.4）。"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'stage_seconds', '各处理阶段耗时（秒）', ('stage',)))
+STAGE_FAILURES = REGISTRY.register(Counter(
+    'stage_failures_total', '各处理阶段失败次数', ('stage',)))
+DOWNLOAD_BYTES = REGISTRY.register(Counter(
+    'download_bytes_total', '下载的音频字节数'))
+DOWNLOAD_THROUGHPUT = REGISTRY.register(Histogram(
+    'download_throughput_bytes', '单次音频下载的平均速度（字节/秒）', buckets=THROUGHPUT_BUCKETS))
+TRANSCRIPTION_RTF = REGISTRY.register(Histogram(
+    'transcription_rtf', '转写实时率（转写耗时 / 音频时长）', ('transcriber',), buckets=RTF_BUCKETS))
+JOBS_FINISHED = REGISTRY.register(Counter(
+    'jobs_finished_total', '结束的任务数', ('transcriber', 'status')))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'HTTP 请求数', ('method', 'endpoint', 'status')))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_seconds', 'HTTP 请求处理耗时（秒，流式响应不含传输）', ('endpoint',)))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'queue_depth', '各队列中等待的任务数', ('queue',)))
+CACHE_ENTRIES = REGISTRY.register(Gauge(
+    'cache_entries', '各缓存的条目数', ('cache',)))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    'cache_hit_ratio', '各缓存的命中率', ('cache',)))
+MODELS = REGISTRY.register(Gauge(
+    'models', '本地模型实例数', ('state',)))
+
+
+_span_context = local()
+
+
+class Span:
+    def __init__(self, stage):
+        self.stage = stage
+        self.seconds = None
+
+
+@contextmanager
+def span(stage):
+    """记录一个处理阶段的耗时：写入 stage_seconds 直方图，失败时计数，
+    并累加到当前线程绑定的任务耗时明细（见 record_timings）。
+
+    退出后可从返回的 Span 读取 seconds。
+    """
+    current = Span(stage)
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield current
+        ok = True
+    finally:
+        current.seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(current.seconds, stage=stage)
+        if not ok:
+            STAGE_FAILURES.inc(stage=stage)
+        timings = getattr(_span_context, 'timings', None)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + current.seconds, 3)
+        logger.debug(f"span stage={stage} seconds={current.seconds:.3f} ok={ok}")
+
+
+@contextmanager
+def record_timings(timings):
+    """在当前线程中把 span 的耗时累加到 timings 字典（阶段 -> 秒）。"""
+    previous = getattr(_span_context, 'timings', None)
+    _span_context.timings = timings
+    try:
+        yield timings
+    finally:
+        _span_context.timings = previous
+
+
+def observe_download(num_bytes, seconds):
+    DOWNLOAD_BYTES.inc(num_bytes)
+    if seconds > 0:
+        DOWNLOAD_THROUGHPUT.observe(num_bytes / seconds)
+
+
+def track_request_start():
+    """before_request 钩子。"""
+    g.metrics_started = time.perf_counter()
+
+
+def track_request_end(response):
+    """after_request 钩子：按路由模板统计请求数与耗时，避免按具体路径产生大量标签。"""
+    started = g.pop('metrics_started', None)
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    HTTP_REQUESTS.inc(method=request.method, endpoint=endpoint, status=response.status_code)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+
+def render_metrics():
+    return REGISTRY.render()
@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from threading import Condition, Lock, Timer
+from .metrics import span
+from .utils import (
+    get_model_pool_size,
+    get_model_pool_idle_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+# 空闲模型回收检查间隔（秒）
+EVICTION_INTERVAL = 60
+
+
+def make_model_key(model_path, device="cpu", compute_type="int8", cpu_threads=0):
+    """模型池的键：同一 key 下的模型实例可以互相替代。"""
+    return (os.path.abspath(model_path), device, compute_type, int(cpu_threads or 0))
+
+
+def load_whisper_model(key):
+    model_path, device, compute_type, cpu_threads = key
+    if not os.path.isdir(model_path):
+        raise ValueError(f"Invalid model path: {model_path}")
+    from faster_whisper import WhisperModel
+    logger.info(f"Loading Faster Whisper model from path: {model_path}")
+    logger.info(f"Device: {device}, Compute type: {compute_type}, CPU threads: {cpu_threads}")
+    start = time.monotonic()
+    model = WhisperModel(
+        model_path,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        local_files_only=True
+    )
+    logger.info(f"Faster Whisper model loaded in {time.monotonic() - start:.2f}s")
+    return model
+
+
+class WhisperModelPool:
+    """进程内的 WhisperModel 池。
+
+    每个 key 最多创建 max_size 个实例。实例在 checkout 期间由调用方独占，
+    归还后供后续请求复用；空闲超过 idle_timeout 秒的实例会被释放。
+    """
+
+    def __init__(self, max_size=1, idle_timeout=600, loader=load_whisper_model):
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = idle_timeout
+        self._loader = loader
+        self._cond = Condition(Lock())
+        self._idle = {}     # key -> [(model, last_used)]
+        self._created = {}  # key -> 已创建的实例数（空闲 + 借出）
+        self._eviction_timer = None
+        self._eviction_stopped = False
+
+    def acquire(self, key, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    model, _ = idle.pop()
+                    return model
+                if self._created.get(key, 0) < self.max_size:
+                    # 先占位再在锁外加载，避免加载期间阻塞其他 key
+                    self._created[key] = self._created.get(key, 0) + 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"等待可用模型超时: {key[0]}")
+                self._cond.wait(remaining)
+
+        try:
+            with span('model_load'):
+                return self._loader(key)
+        except Exception:
+            with self._cond:
+                self._created[key] -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, key, model):
+        with self._cond:
+            self._idle.setdefault(key, []).append((model, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def checkout(self, key, timeout=None):
+        with span('model_checkout'):
+            model = self.acquire(key, timeout=timeout)
+        try:
+            yield model
+        finally:
+            self.release(key, model)
+
+    def warm_up(self, key, count=None):
+        count = min(count or self.max_size, self.max_size)
+        models = [self.acquire(key) for _ in range(count)]
+        for model in models:
+            self.release(key, model)
+        logger.info(f"模型池预热完成: {key[0]} x{count}")
+
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        evicted = []
+        with self._cond:
+            for key, idle in self._idle.items():
+                keep = []
+                for model, last_used in idle:
+                    if now - last_used > self.idle_timeout:
+                        evicted.append(model)
+                        self._created[key] -= 1
+                    else:
+                        keep.append((model, last_used))
+                idle[:] = keep
+            if evicted:
+                self._cond.notify_all()
+        if evicted:
+            logger.info(f"已回收 {len(evicted)} 个空闲模型")
+        # 在锁外释放引用，CTranslate2 的析构可能较慢
+        del evicted[:]
+
+    def clear(self):
+        with self._cond:
+            for key, idle in self._idle.items():
+                self._created[key] -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                '|'.join(str(part) for part in key): {
+                    'idle': len(self._idle.get(key, [])),
+                    'in_use': created - len(self._idle.get(key, []))
+                }
+                for key, created in self._created.items()
+            }
+
+    def _schedule_eviction(self):
+        self._eviction_timer = Timer(EVICTION_INTERVAL, self._run_eviction)
+        self._eviction_timer.daemon = True
+        self._eviction_timer.start()
+
+    def _run_eviction(self):
+        try:
+            self.evict_idle()
+        finally:
+            if not self._eviction_stopped:
+                self._schedule_eviction()
+
+    def start_eviction_timer(self):
+        self._eviction_stopped = False
+        if self._eviction_timer is None:
+            self._schedule_eviction()
+
+    def stop_eviction_timer(self):
+        self._eviction_stopped = True
+        if self._eviction_timer:
+            self._eviction_timer.cancel()
+            self._eviction_timer = None
+
+
+_model_pool = None
+_model_pool_lock = Lock()
+
+
+def get_model_pool():
+    global _model_pool
+    with _model_pool_lock:
+        if _model_pool is None:
+            _model_pool = WhisperModelPool(
+                max_size=get_model_pool_size(),
+                idle_timeout=get_model_pool_idle_seconds()
+            )
+        return _model_pool
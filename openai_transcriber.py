@@ -0,0 +1,189 @@
+import io
+import os
+import wave
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import av
+import httpx
+import numpy as np
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+from .chunked_transcription import SAMPLING_RATE, SegmentMerger, find_chunk_boundaries
+from .pcm_audio import as_float32, load_audio
+from .utils import (
+    get_decode_options,
+    get_openai_chunk_seconds,
+    get_openai_max_upload_bytes,
+    get_openai_upload_concurrency,
+    get_openai_max_retries,
+)
+
+logger = logging.getLogger(__name__)
+
+# 可以安全重试的错误：网络问题、超时、限流和服务端错误
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+# 16kHz 单声道 16 位 WAV 每秒的字节数
+WAV_BYTES_PER_SECOND = SAMPLING_RATE * 2
+
+_client = None
+_client_config = None
+_client_lock = Lock()
+
+
+def get_openai_client(base_url: str, api_key: str) -> OpenAI:
+    """进程内共享的 OpenAI 客户端，底层 httpx 连接池在多次请求之间复用。"""
+    global _client, _client_config
+    with _client_lock:
+        if _client is None or _client_config != (base_url, api_key):
+            concurrency = get_openai_upload_concurrency()
+            transport = httpx.HTTPTransport(
+                proxy=None,
+                limits=httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency)
+            )
+            _client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=httpx.Client(transport=transport, timeout=300.0),
+                timeout=300.0,
+                max_retries=0  # 由分块级别的重试负责
+            )
+            _client_config = (base_url, api_key)
+        return _client
+
+
+def probe_duration(audio_filename: str) -> Optional[float]:
+    try:
+        with av.open(audio_filename) as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+    except Exception as e:
+        logger.warning(f"无法读取音频时长: {str(e)}")
+    return None
+
+
+def encode_wav(samples: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLING_RATE)
+        wav.writeframes((np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+class OpenAITranscriber:
+    def __init__(self):
+        self.base_url = os.getenv("OPENAI_API_BASE_URL")
+        self.api_key = os.getenv("OPENAI_API_KEY")
+
+        if not self.base_url or not self.api_key:
+            raise ValueError("未设置 OPENAI_API_BASE_URL 或 OPENAI_API_KEY 环境变量")
+
+        self.client = get_openai_client(self.base_url, self.api_key)
+        # 重试次数在创建时读取，与其他设置一样以当前环境变量为准
+        self._create_transcription = retry(
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            stop=stop_after_attempt(get_openai_max_retries()),
+            wait=wait_exponential(multiplier=1, max=30),
+            reraise=True
+        )(self._request_transcription)
+
+    def transcribe(self, audio_filename: str, on_segment: Optional[Callable] = None,
+                   pcm_filename: Optional[str] = None) -> List[Dict[str, Union[float, str]]]:
+        """转写音频，返回带时间戳的片段列表。
+
+        超过大小或时长上限的音频会在静音处切块，以有限并发上传，每块单独重试，
+        最后按偏移量合并为整段的时间轴。提供 pcm_filename 时切块直接读取预解码的 PCM。
+        """
+        if not os.path.exists(audio_filename):
+            raise FileNotFoundError(f"音频文件未找到: {audio_filename}")
+
+        uploads, audio, duration = self._plan_uploads(audio_filename, pcm_filename)
+        logger.info(f"OpenAI 转写: 共 {len(uploads)} 个分块待上传")
+
+        merger = SegmentMerger(duration, on_segment)
+        with ThreadPoolExecutor(max_workers=get_openai_upload_concurrency(), thread_name_prefix='openai-upload') as executor:
+            futures = [
+                executor.submit(self._transcribe_chunk, audio_filename, audio, name, bounds, end - offset)
+                for offset, end, name, bounds in uploads
+            ]
+            try:
+                for index, ((offset, end, _, _), future) in enumerate(zip(uploads, futures)):
+                    merger.add_chunk(offset, end, future.result(), final=index == len(uploads) - 1)
+            except BaseException:
+                # 出错或被取消（on_segment 抛出异常）时不再上传尚未开始的分块
+                for future in futures:
+                    future.cancel()
+                raise
+        return merger.segments
+
+    def _plan_uploads(self, audio_filename: str, pcm_filename: Optional[str] = None) -> Tuple[List[Tuple[float, float, str, Optional[Tuple[int, int]]]], Optional[np.ndarray], Optional[float]]:
+        """返回 ([(起始秒, 结束秒, 文件名, 样本范围)], PCM 音频, 总时长)。
+
+        样本范围为 None 表示直接上传原始文件（此时 PCM 音频也为 None）。
+        这里只确定切分位置，各分块在上传时才编码，内存中同时只有并发数个分块的内容。
+        """
+        max_bytes = get_openai_max_upload_bytes()
+        chunk_seconds = get_openai_chunk_seconds()
+        duration = probe_duration(audio_filename)
+
+        if os.path.getsize(audio_filename) <= max_bytes and duration is not None and duration <= chunk_seconds:
+            # 小文件直接上传原始音频，避免重新编码
+            return [(0.0, duration, os.path.basename(audio_filename), None)], None, duration
+
+        audio = load_audio(pcm_filename or audio_filename)
+        duration = len(audio) / SAMPLING_RATE
+        # 分块以 WAV 上传，时长同时受大小上限约束
+        chunk_seconds = min(chunk_seconds, (max_bytes - 1024) / WAV_BYTES_PER_SECOND)
+        min_silence = get_decode_options()['min_silence_duration_ms']
+        uploads = [
+            (start / SAMPLING_RATE, end / SAMPLING_RATE, f"chunk_{index:04d}.wav", (start, end))
+            for index, (start, end) in enumerate(find_chunk_boundaries(audio, chunk_seconds, min_silence))
+        ]
+        return uploads, audio, duration
+
+    def _transcribe_chunk(self, audio_filename: str, audio: Optional[np.ndarray], name: str,
+                          bounds: Optional[Tuple[int, int]], seconds: float) -> List[Dict[str, Union[float, str]]]:
+        if bounds is None:
+            with open(audio_filename, 'rb') as f:
+                data = f.read()
+        else:
+            start, end = bounds
+            data = encode_wav(as_float32(audio[start:end]))
+        return self._create_transcription(name, data, seconds)
+
+    def _request_transcription(self, name: str, data: bytes, seconds: float) -> List[Dict[str, Union[float, str]]]:
+        options = get_decode_options()
+        response = self.client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(name, data),
+            response_format="verbose_json",
+            language=options['language'],
+            prompt=options['initial_prompt']
+        )
+        return self._process_response(response, seconds)
+
+    def _process_response(self, response: Any, seconds: float) -> List[Dict[str, Union[float, str]]]:
+        """把接口返回转为片段列表，时间相对于分块起点；seconds 为分块时长。"""
+        segments = getattr(response, 'segments', None)
+        if segments is None and isinstance(response, dict):
+            segments = response.get('segments')
+        if not segments:
+            # 部分兼容接口不返回分段信息，退化为覆盖整个分块的一个片段；
+            # 也不返回 duration 时用分块时长，否则 end 为 0 的片段会在合并时被丢掉
+            text = getattr(response, 'text', None) or (response.get('text') if isinstance(response, dict) else str(response))
+            duration = getattr(response, 'duration', None) or (response.get('duration') if isinstance(response, dict) else None)
+            duration = duration or seconds
+            return [{'start': 0.0, 'end': float(duration), 'text': text.strip()}] if text and text.strip() else []
+
+        processed = []
+        for segment in segments:
+            if isinstance(segment, dict):
+                start, end, text = segment.get('start'), segment.get('end'), segment.get('text')
+            else:
+                start, end, text = segment.start, segment.end, segment.text
+            processed.append({'start': float(start), 'end': float(end), 'text': text.strip()})
+        return processed
@@ -0,0 +1,143 @@
+import os
+import uuid
+import struct
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_RATE = 16000
+
+PCM_SUFFIX = '.pcm.wav'
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+
+# 存储格式 -> (WAV 格式标记, 位深, numpy 类型, PyAV 重采样格式)
+PCM_FORMATS = {
+    'int16': (WAVE_FORMAT_PCM, 16, np.int16, 's16'),
+    'float32': (WAVE_FORMAT_IEEE_FLOAT, 32, np.float32, 'flt'),
+}
+
+
+def _wav_header(format_tag, bits, num_samples):
+    block_align = bits // 8
+    data_size = num_samples * block_align
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, format_tag, 1, SAMPLING_RATE, SAMPLING_RATE * block_align, block_align, bits,
+        b'data', data_size
+    )
+
+
+def write_pcm(src_path, dst_path, sample_format='int16'):
+    """把任意音频解码为 16kHz 单声道 PCM WAV（int16 或 float32），逐帧写出。
+
+    先写到临时文件，完成后 rename，读取方不会看到写了一半的文件。
+    """
+    import av
+    format_tag, bits, _, av_format = PCM_FORMATS[sample_format]
+    tmp_path = f"{dst_path}.{uuid.uuid4().hex}.tmp"
+    resampler = av.AudioResampler(format=av_format, layout='mono', rate=SAMPLING_RATE)
+    num_samples = 0
+    try:
+        with av.open(src_path) as container, open(tmp_path, 'wb') as out:
+            out.write(_wav_header(format_tag, bits, 0))
+            for frame in container.decode(audio=0):
+                for resampled in resampler.resample(frame):
+                    out.write(resampled.to_ndarray().tobytes())
+                    num_samples += resampled.samples
+            for resampled in resampler.resample(None):
+                out.write(resampled.to_ndarray().tobytes())
+                num_samples += resampled.samples
+            out.seek(0)
+            out.write(_wav_header(format_tag, bits, num_samples))
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return num_samples
+
+
+def read_pcm_info(path):
+    """若文件是 16kHz 单声道 int16/float32 WAV，返回 (numpy 类型, 数据偏移, 样本数)，否则返回 None。"""
+    try:
+        with open(path, 'rb') as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+                return None
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ' and size >= 16:
+                    fmt = struct.unpack('<HHIIHH', f.read(16))
+                    f.seek(size - 16 + (size & 1), os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        return None
+                    format_tag, channels, rate, _, _, bits = fmt
+                    dtype = {(WAVE_FORMAT_PCM, 16): np.int16, (WAVE_FORMAT_IEEE_FLOAT, 32): np.float32}.get((format_tag, bits))
+                    if dtype is None or channels != 1 or rate != SAMPLING_RATE:
+                        return None
+                    offset = f.tell()
+                    # 流式写出的文件可能未回填长度，以实际文件大小为准
+                    size = min(size, os.path.getsize(path) - offset)
+                    return dtype, offset, size // np.dtype(dtype).itemsize
+                else:
+                    f.seek(size + (size & 1), os.SEEK_CUR)
+    except OSError:
+        return None
+
+
+def open_pcm(path):
+    """以 numpy.memmap 只读映射 PCM 文件，不是 PCM 文件时返回 None。
+
+    切片是零拷贝的视图，只有实际访问到的部分才会读入内存。
+    """
+    info = read_pcm_info(path)
+    if info is None:
+        return None
+    dtype, offset, num_samples = info
+    if num_samples == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(num_samples,))
+
+
+def as_float32(samples):
+    """转换为模型需要的 [-1, 1] float32；float32 映射直接返回，不复制。
+
+    int16 原地缩放，整段转换时只分配一份 float32 数组。
+    """
+    if samples.dtype == np.int16:
+        out = samples.astype(np.float32)
+        out *= 1 / 32768.0
+        return out
+    return np.asarray(samples, dtype=np.float32)
+
+
+def load_audio(path):
+    """PCM 文件返回内存映射（可能是 int16，使用前经过 as_float32），其他格式完整解码为 float32。"""
+    audio = open_pcm(path)
+    if audio is not None:
+        return audio
+    from faster_whisper import decode_audio
+    return decode_audio(path, sampling_rate=SAMPLING_RATE)
+
+
+def prepare_pcm(audio_path, sample_format='float32'):
+    """音频准备阶段：解码一次并写出 PCM 旁路文件，返回其路径。
+
+    输入本身已是 PCM 文件时直接返回原路径。旁路文件以唯一名称写在音频所在目录，由调用方在任务结束后删除。
+    """
+    if read_pcm_info(audio_path) is not None:
+        return audio_path
+    name = f"{os.path.basename(audio_path)}.{uuid.uuid4().hex[:8]}{PCM_SUFFIX}"
+    pcm_path = os.path.join(os.path.dirname(audio_path), name)
+    num_samples = write_pcm(audio_path, pcm_path, sample_format)
+    logger.info(f"音频已解码为 PCM: {num_samples / SAMPLING_RATE:.1f}s, {os.path.getsize(pcm_path) / 1024 / 1024:.1f}MB")
+    return pcm_path
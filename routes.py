@@ -1,44 +1,174 @@
-import os
-import tempfile
+import json
 import logging
-from threading import Timer
-from flask import request, jsonify, send_file, after_this_request, current_app
-from .services import download_bilibili_audio, transcribe_audio, cleanup_files
-from .utils import update_progress, get_progress_info, validate_bv_id, get_enabled_transcribers, get_max_video_duration
-from .subtitle_utils import generate_srt
+from urllib.parse import quote
+from flask import request, jsonify, current_app, Response
+from .jobs import get_job_manager, JobQueueFull, ClientQuotaExceeded, TranscriberUnavailable, JOB_COMPLETED
+from .batch import BatchRunner, parse_batch_request
+from .transcript_cache import get_transcript_cache
+from .http_cache import negotiate_encoding, compress, make_etag, get_rendered_cache
+from .model_pool import get_model_pool
+from .video_metadata import get_metadata_cache
+from .startup import get_startup_report
+from .metrics import span, render_metrics, QUEUE_DEPTH, CACHE_ENTRIES, CACHE_HIT_RATIO, MODELS
+from .audio_store import get_audio_store
+from .checkpoint import get_checkpoint_store
+from .search_index import get_search_index
+from .transcriber_router import get_transcriber_router
+from .transcriber_registry import get_transcriber_registry
+from .utils import get_progress_info, validate_bv_id, validate_part, get_enabled_transcribers
+from .subtitle_utils import SUBTITLE_FORMATS, iter_subtitles, render_subtitles
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from .utils import get_rate_limit_seconds
+from .utils import get_rate_limit_seconds, get_rate_limit_storage_uri, is_metrics_enabled, get_search_max_results
 
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=get_remote_address, storage_uri=get_rate_limit_storage_uri())
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 存储需要删除的临时文件
-temp_files_to_delete = set()
+# 流式接口在没有新片段时推送任务状态的间隔（秒），同时防止代理断开空闲连接
+EVENT_HEARTBEAT_SECONDS = 2
 
-def delayed_file_delete(filename, delay=5):
-    def delete_file():
-        try:
-            if os.path.exists(filename):
-                os.unlink(filename)
-                logger.info(f"Successfully removed temporary file: {filename}")
-            temp_files_to_delete.discard(filename)
-        except Exception as e:
-            logger.error(f"Failed to remove temporary file: {filename}. Error: {str(e)}")
+def content_disposition(video_title, extension):
+    filename = f"{video_title}{extension}"
+    return f"attachment; filename=\"subtitles{extension}\"; filename*=UTF-8''{quote(filename)}"
 
-    Timer(delay, delete_file).start()
+def timed_body(body, stage):
+    """流式响应体的耗时在生成结束时计入 stage。"""
+    with span(stage):
+        yield from body
 
-def cleanup_temp_files():
-    for filename in list(temp_files_to_delete):
-        try:
-            if os.path.exists(filename):
-                os.unlink(filename)
-                logger.info(f"Cleanup: removed temporary file: {filename}")
-        except Exception as e:
-            logger.error(f"Cleanup: failed to remove temporary file: {filename}. Error: {str(e)}")
-    temp_files_to_delete.clear()
+def subtitle_response(transcript, video_title, fmt):
+    """以流式响应返回字幕文件，不写临时文件。"""
+    mimetype, extension = SUBTITLE_FORMATS[fmt]
+    return Response(timed_body(iter_subtitles(transcript, fmt, bom=True), 'export'), content_type=f"{mimetype}; charset=utf-8", headers={
+        'Content-Disposition': content_disposition(video_title, extension)
+    })
+
+def stored_subtitle_response(source, version, load_result, fmt):
+    """由已保存的转写结果渲染字幕文件。
+
+    (source, version) 唯一确定一份不可变的结果，ETag 由它与格式、编码算出，
+    条件请求命中时直接返回 304，无需读取结果；渲染并压缩后的内容按 ETag 缓存在内存中。
+    """
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    etag = make_etag(source, version, fmt, encoding or 'identity')
+    headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    rendered_cache = get_rendered_cache()
+    entry = rendered_cache.get(etag)
+    if entry is None:
+        result = load_result()
+        if not result:
+            return jsonify({'error': '转写结果不存在或已过期', 'code': 'RESULT_NOT_FOUND'}), 404
+        with span('export'):
+            body = compress(render_subtitles(result['transcript'], fmt), encoding)
+        entry = (body, result.get('title') or result.get('bvId') or 'subtitles')
+        rendered_cache.put(etag, *entry)
+    body, video_title = entry
+
+    mimetype, extension = SUBTITLE_FORMATS[fmt]
+    headers['Content-Disposition'] = content_disposition(video_title, extension)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    response = Response(body, content_type=f"{mimetype}; charset=utf-8", headers=headers)
+    response.set_etag(etag)
+    return response
+
+def export_format():
+    fmt = (request.args.get('format') or 'srt').lower()
+    if fmt not in SUBTITLE_FORMATS:
+        return None, (jsonify({'error': f'不支持的字幕格式: {fmt}', 'formats': list(SUBTITLE_FORMATS)}), 400)
+    return fmt, None
+
+def queue_full_response(e):
+    response = jsonify({
+        'error': '服务繁忙：任务队列已满，请稍后再试',
+        'code': 'QUEUE_FULL',
+        'retryAfter': e.retry_after
+    })
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def transcriber_unavailable_response(e):
+    return jsonify({'error': str(e), 'code': 'INVALID_TRANSCRIBER'}), 400
+
+def client_quota_response(e):
+    return jsonify({
+        'error': f'请求过多：每个客户端最多同时处理 {e.limit} 个任务，请等待已提交的任务完成',
+        'code': 'TOO_MANY_JOBS',
+        'limit': e.limit
+    }), 429
+
+def iter_job_events(job, cursor=0):
+    """按顺序产出任务事件：(事件名, 编号, 数据)，等待超时时产出心跳。
+
+    已推送的片段被丢弃（auto 模式改用另一个转写服务的结果）时产出 reset，之后的片段从编号 0 重新开始。
+    """
+    generation = 0
+    while True:
+        segments, finished, current = job.wait_for_segments(cursor, EVENT_HEARTBEAT_SECONDS, generation)
+        if current != generation:
+            generation, cursor = current, 0
+            yield 'reset', None, {'generation': generation}
+        for segment in segments:
+            percent = min(1.0, segment['end'] / job.duration) if job.duration else job.percent
+            yield 'segment', cursor, dict(segment, index=cursor, percent=percent)
+            cursor += 1
+        if finished:
+            if job.error:
+                yield 'failed', None, job.error[1]
+            else:
+                yield 'done', None, job.result
+            return
+        if not segments:
+            yield 'heartbeat', None, {
+                'status': job.status,
+                'stage': get_progress_info(job.bv_id, job.part).get('status'),
+                'percent': job.percent
+            }
+
+def sse_events(job, cursor=0):
+    for event, event_id, data in iter_job_events(job, cursor):
+        if event == 'heartbeat':
+            yield f"event: status\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            continue
+        message = f"event: {event}\n"
+        if event_id is not None:
+            message += f"id: {event_id}\n"
+        yield message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def ndjson_events(job):
+    for event, _, data in iter_job_events(job):
+        yield json.dumps({'event': event, 'data': data}, ensure_ascii=False) + "\n"
+
+def batch_ndjson(events):
+    for event, data in events:
+        yield json.dumps({'event': event, 'data': data}, ensure_ascii=False) + "\n"
+
+def update_gauges():
+    """抓取指标前刷新队列深度、缓存命中率等即时值。"""
+    for queue, depth in get_job_manager().queue_lengths().items():
+        QUEUE_DEPTH.set(depth, queue=queue)
+    caches = {
+        'transcript': get_transcript_cache(),
+        'audio': get_audio_store(),
+        'metadata': get_metadata_cache(),
+        'export': get_rendered_cache(),
+    }
+    for name, cache in caches.items():
+        if cache is None:
+            continue
+        stats = cache.stats()
+        CACHE_ENTRIES.set(stats['entries'], cache=name)
+        CACHE_HIT_RATIO.set(stats['hitRatio'], cache=name)
+    models = get_model_pool().stats().values()
+    MODELS.set(sum(item['idle'] for item in models), state='idle')
+    MODELS.set(sum(item['in_use'] for item in models), state='in_use')
 
 def register_routes(app):
     @app.route('/api/transcribe', methods=['POST'])
@@ -50,66 +180,118 @@ def register_routes(app):
             transcriber_type = data.get('transcriber_type', 'faster_whisper')
         except ValueError as e:
             return jsonify({'error': str(e), 'code': 'INVALID_BV_ID'}), 400
-        
-        update_progress(bv_number, '开始处理')
-        duration = None
         try:
-            bvid, title, audio_filename, duration = download_bilibili_audio(bv_number)
-            
-            if duration is None:
-                raise ValueError('无法获取视频时长')
-
-            max_duration = get_max_video_duration()
-            if duration > max_duration:
-                raise ValueError(f"视频时长 ({duration}秒) 超过允许的最大时长 ({max_duration}秒)")
-
-            if not audio_filename or not os.path.exists(audio_filename):
-                raise ValueError('音频下载失败或文件不存在')
-
-            update_progress(bv_number, '开始音频转写')
-            transcript = transcribe_audio(audio_filename, transcriber_type)
-            if transcript is None:
-                raise Exception("转写失败")
-            
-            cleanup_files(audio_filename)
-            update_progress(bv_number, '处理完成')
-            
-            formatted_transcript = transcript
-            
-            return jsonify({
-                'transcript': formatted_transcript,
-                'title': title,
-                'bvId': bv_number,
-                'duration': duration
-            })
+            part = validate_part(data.get('part', 1))
+        except ValueError as e:
+            return jsonify({'error': str(e), 'code': 'INVALID_PART'}), 400
+
+        try:
+            job = get_job_manager().submit(bv_number, transcriber_type, client=get_remote_address(), part=part)
+        except JobQueueFull as e:
+            return queue_full_response(e)
+        except ClientQuotaExceeded as e:
+            return client_quota_response(e)
+        except TranscriberUnavailable as e:
+            return transcriber_unavailable_response(e)
+
+        # 同步接口：在后台 worker 中执行，当前请求只等待结果
+        job.wait()
+        if job.error:
+            status_code, payload = job.error
+            return jsonify(payload), status_code
+        return jsonify(job.result)
 
+    @app.route('/api/jobs', methods=['POST'])
+    @limiter.limit(f"{get_rate_limit_seconds()} seconds")
+    def submit_job():
+        data = request.json
+        try:
+            bv_number = validate_bv_id(data['bvId'])
+            transcriber_type = data.get('transcriber_type', 'faster_whisper')
         except ValueError as e:
-            error_message = str(e)
-            if "视频时长" in error_message:
-                return jsonify({
-                    'error': '视频时长超出限制',
-                    'details': error_message,
-                    'code': 'DURATION_EXCEEDED',
-                    'maxDuration': get_max_video_duration(),
-                    'videoDuration': duration if duration is not None else 0
-                }), 400
-            else:
-                return jsonify({
-                    'error': '下载失败',
-                    'details': error_message,
-                    'code': 'DOWNLOAD_FAILED'
-                }), 400
-
-        except Exception as e:
-            if 'audio_filename' in locals() and audio_filename:
-                cleanup_files(audio_filename)
-            error_message = f"转写失败: {str(e)}"
-            update_progress(bv_number, '转写失败', error_message)
-            return jsonify({
-                'error': '转录过程中发生错误',
-                'details': error_message,
-                'code': 'TRANSCRIPTION_FAILED'
-            }), 500
+            return jsonify({'error': str(e), 'code': 'INVALID_BV_ID'}), 400
+        try:
+            part = validate_part(data.get('part', 1))
+        except ValueError as e:
+            return jsonify({'error': str(e), 'code': 'INVALID_PART'}), 400
+
+        try:
+            job = get_job_manager().submit(bv_number, transcriber_type, client=get_remote_address(), part=part)
+        except JobQueueFull as e:
+            return queue_full_response(e)
+        except ClientQuotaExceeded as e:
+            return client_quota_response(e)
+        except TranscriberUnavailable as e:
+            return transcriber_unavailable_response(e)
+
+        return jsonify(job.to_dict()), 202, {'Location': f"/api/jobs/{job.id}"}
+
+    @app.route('/api/batch', methods=['POST'])
+    @limiter.limit(f"{get_rate_limit_seconds()} seconds")
+    def submit_batch():
+        # 整批只计一次限流，条目的并发由 BATCH_CONCURRENCY 控制
+        data = request.json or {}
+        try:
+            entries = parse_batch_request(data)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'code': 'INVALID_BATCH'}), 400
+
+        transcriber_type = data.get('transcriber_type', 'faster_whisper')
+        try:
+            get_transcriber_registry().check_available(transcriber_type)
+        except ValueError as e:
+            return transcriber_unavailable_response(e)
+
+        runner = BatchRunner(get_job_manager(), transcriber_type, client=get_remote_address())
+        return Response(
+            timed_body(batch_ndjson(runner.run(entries)), 'batch'),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return jsonify({'error': '任务不存在或已过期', 'code': 'JOB_NOT_FOUND'}), 404
+        response = jsonify(job.to_dict())
+        if job.status == JOB_COMPLETED:
+            # 已完成的任务不再变化，支持条件请求
+            response.add_etag()
+            response.make_conditional(request)
+        return response
+
+    @app.route('/api/jobs/<job_id>/export', methods=['GET'])
+    def export_job(job_id):
+        fmt, error = export_format()
+        if error:
+            return error
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return jsonify({'error': '任务不存在或已过期', 'code': 'JOB_NOT_FOUND'}), 404
+        if job.status != JOB_COMPLETED:
+            return jsonify({'error': '任务尚未完成', 'code': 'JOB_NOT_COMPLETED', 'status': job.status}), 409
+        return stored_subtitle_response(f"job:{job.id}", job.to_dict().get('finishedAt'), lambda: job.result, fmt)
+
+    @app.route('/api/jobs/<job_id>/events', methods=['GET'])
+    def stream_job_events(job_id):
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return jsonify({'error': '任务不存在或已过期', 'code': 'JOB_NOT_FOUND'}), 404
+
+        if request.args.get('format') == 'ndjson':
+            return Response(ndjson_events(job), mimetype='application/x-ndjson')
+
+        # EventSource 断线重连时会带上最后收到的片段编号
+        try:
+            cursor = int(request.headers.get('Last-Event-ID', -1)) + 1
+        except ValueError:
+            cursor = 0
+        return Response(
+            sse_events(job, cursor),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
 
     @app.route('/api/progress', methods=['GET'])
     def get_transcription_progress():
@@ -117,45 +299,116 @@ def register_routes(app):
             bv_id = validate_bv_id(request.args.get('bvId'))
         except ValueError as e:
             return jsonify({'error': str(e)}), 400
+        try:
+            part = validate_part(request.args.get('part', 1))
+        except ValueError as e:
+            return jsonify({'error': str(e), 'code': 'INVALID_PART'}), 400
 
-        progress_info = get_progress_info(bv_id)
+        progress_info = get_progress_info(bv_id, part)
+        job = get_job_manager().find_active(bv_id, part)
+        if job is not None:
+            progress_info = dict(
+                progress_info,
+                jobId=job.id,
+                estimatedStart=job.estimated_start,
+                estimatedFinish=job.estimated_finish,
+                timings=dict(job.timings)
+            )
         if progress_info:
             return jsonify(progress_info)
         else:
             return jsonify({'error': '没有可用的进度信息'}), 404
 
+    @app.route('/api/export', methods=['POST'])
+    def export_subtitles():
+        data = request.json or {}
+        transcript = data.get('transcript')
+        video_title = data.get('videoTitle')
+        fmt = (request.args.get('format') or data.get('format') or 'srt').lower()
+
+        if not transcript or not video_title:
+            logger.error("Missing required data for subtitle export")
+            return jsonify({'error': '缺少必要的数据'}), 400
+        if fmt not in SUBTITLE_FORMATS:
+            return jsonify({'error': f'不支持的字幕格式: {fmt}', 'formats': list(SUBTITLE_FORMATS)}), 400
+        return subtitle_response(transcript, video_title, fmt)
+
     @app.route('/api/export_srt', methods=['POST'])
     def export_srt():
-        logger.info("Received request to export SRT")
-        data = request.json
+        data = request.json or {}
         transcript = data.get('transcript')
         video_title = data.get('videoTitle')
-        
+
         if not transcript or not video_title:
             logger.error("Missing required data for SRT export")
             return jsonify({'error': '缺少必要的数据'}), 400
-        
-        try:
-            srt_content = generate_srt(transcript)
-            
-            with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.srt', encoding='utf-8-sig') as temp_file:
-                temp_filename = temp_file.name
-                temp_file.write(srt_content)
-            
-            @after_this_request
-            def remove_file(response):
-                delayed_file_delete(temp_filename)
-                return response
-
-            return send_file(
-                temp_filename, 
-                as_attachment=True, 
-                download_name=f"{video_title}.srt",
-                mimetype='text/plain'
+        return subtitle_response(transcript, video_title, 'srt')
+
+    @app.route('/api/cache/<cache_key>/export', methods=['GET'])
+    def export_cached(cache_key):
+        fmt, error = export_format()
+        if error:
+            return error
+        cache = get_transcript_cache()
+        version = cache.version(cache_key) if cache else None
+        if version is None:
+            return jsonify({'error': '转写结果不存在或已过期', 'code': 'RESULT_NOT_FOUND'}), 404
+        return stored_subtitle_response(f"cache:{cache_key}", version, lambda: cache.get(cache_key), fmt)
+
+    @app.route('/api/search', methods=['GET'])
+    def search_transcripts():
+        index = get_search_index()
+        if index is None:
+            return jsonify({'error': '全文搜索未启用', 'code': 'SEARCH_DISABLED'}), 404
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'error': '缺少搜索关键词 q', 'code': 'INVALID_QUERY'}), 400
+        limit = request.args.get('limit', 20, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        bv_id = request.args.get('bvId')
+        with span('search') as search_span:
+            results, truncated = index.search(
+                query,
+                limit=max(1, min(limit, get_search_max_results())),
+                offset=max(0, offset),
+                bv_id=bv_id
             )
-        except Exception as e:
-            logger.exception(f"Error occurred while generating SRT file: {str(e)}")
-            return jsonify({'error': f'生成 SRT 文件时发生错误: {str(e)}'}), 500
+        return jsonify({
+            'query': query,
+            'results': results,
+            'truncated': truncated,
+            'tookMs': round(search_span.seconds * 1000, 3)
+        })
+
+    @app.route('/api/cache/stats', methods=['GET'])
+    def get_cache_stats():
+        cache = get_transcript_cache()
+        store = get_audio_store()
+        stats = dict(cache.stats(), enabled=True) if cache else {'enabled': False}
+        stats['audio'] = dict(store.stats(), enabled=True) if store else {'enabled': False}
+        stats['exports'] = get_rendered_cache().stats()
+        checkpoints = get_checkpoint_store()
+        stats['checkpoints'] = dict(checkpoints.stats(), enabled=True) if checkpoints else {'enabled': False}
+        index = get_search_index()
+        stats['search'] = dict(index.stats(), enabled=True) if index else {'enabled': False}
+        return jsonify(stats)
+
+    @app.route('/api/transcribers/stats', methods=['GET'])
+    def get_transcriber_stats():
+        router = get_transcriber_router()
+        _, estimates = router.rank()
+        return jsonify({'backends': router.stats(), 'estimates': estimates})
+
+    @app.route('/api/startup', methods=['GET'])
+    def get_startup_info():
+        return jsonify(get_startup_report())
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        if not is_metrics_enabled():
+            return jsonify({'error': '指标接口未启用'}), 404
+        update_gauges()
+        return Response(render_metrics(), mimetype='text/plain', headers={'Cache-Control': 'no-cache'})
 
     @app.route('/api/enabled_transcribers', methods=['GET'])
     def get_enabled_transcribers_route():
@@ -0,0 +1,62 @@
+import time
+import itertools
+from threading import Condition
+
+
+class JobScheduler:
+    """按估算代价出队的任务队列（最短作业优先）。
+
+    每个条目的优先级为：
+        代价 - aging_rate × 已等待秒数 + 同一客户端排在它之前的条目代价之和
+    数值越小越先出队。老化项让长任务等待足够久之后不会被源源不断的短任务饿死，
+    最后一项让同一客户端的多个任务依次让位给其他客户端。
+    """
+
+    def __init__(self, aging_rate=1.0):
+        self.aging_rate = aging_rate
+        self._entries = []  # [(seq, item, cost, client, enqueued_at)]
+        self._seq = itertools.count()
+        self._closed = False
+        self._cond = Condition()
+
+    def put(self, item, cost, client=None):
+        with self._cond:
+            self._entries.append((next(self._seq), item, cost, client, time.monotonic()))
+            self._cond.notify()
+
+    def get(self):
+        """取出优先级最高的条目，队列为空时阻塞；close 之后返回 None。"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._entries or self._closed)
+            if self._closed:
+                return None
+            entry = self._order(time.monotonic())[0]
+            self._entries.remove(entry)
+            return entry[1]
+
+    def ordered(self):
+        """按当前出队顺序返回 [(item, cost)]。"""
+        with self._cond:
+            return [(entry[1], entry[2]) for entry in self._order(time.monotonic())]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._entries)
+
+    def _order(self, now):
+        base = {entry[0]: entry[2] - self.aging_rate * (now - entry[4]) for entry in self._entries}
+        backlog = {}
+        priorities = {}
+        # 同一客户端内部同样短任务优先，每个条目再加上该客户端排在它前面的条目代价之和
+        for entry in sorted(self._entries, key=lambda entry: (base[entry[0]], entry[0])):
+            seq, _, cost, client, _ = entry
+            ahead = backlog.get(client, 0.0) if client is not None else 0.0
+            priorities[seq] = base[seq] + ahead
+            if client is not None:
+                backlog[client] = ahead + cost
+        return sorted(self._entries, key=lambda entry: (priorities[entry[0]], entry[0]))
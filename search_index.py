@@ -0,0 +1,309 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+from threading import Lock, Thread
+from .utils import get_search_index_path, is_search_index_enabled
+
+logger = logging.getLogger(__name__)
+
+# 按相关度排序时只对最近写入的这么多条匹配计算 bm25。高频词可能匹配几十万个片段，
+# 全部排序要几百毫秒；限定候选数后查询耗时不随索引规模增长，匹配较少的查询结果不受影响。
+# 匹配超过该数量时结果标记为 truncated；翻页超出这个范围时改为在全部匹配中排序。
+RANK_CANDIDATES = 1000
+
+# 中日韩文字按字切分；其余连续的字母数字作为一个词
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN_PATTERN = re.compile(f'([{_CJK}]+)|([^\\W_{_CJK}]+)')
+
+
+def tokenize(text):
+    """把文本切成索引词：中日韩文字取相邻两字（bigram），连续一段的最后一个字再单独成词；其他文字按词切分并转为小写。
+
+    例如 "用GPT模型转写" -> ['用', 'gpt', '模型', '型转', '转写', '写']。
+    短语中相邻的 bigram 在索引中也相邻，因此任意长度的中文查询都能按短语匹配；
+    末尾的单字使单字查询可以用前缀匹配找到。
+    """
+    tokens = []
+    for cjk, word in _TOKEN_PATTERN.findall(text or ''):
+        if word:
+            tokens.append(word.lower())
+            continue
+        tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        tokens.append(cjk[-1])
+    return tokens
+
+
+def build_match_query(query):
+    """把用户输入转为 FTS5 查询：空白分隔的各部分都要出现，每部分按短语匹配。
+
+    短语以单个汉字结尾时，文本中该字后面可能还有字（索引里是 bigram），因此按前缀匹配（"... 字"*）。
+    无法切出索引词时返回 None。
+    """
+    phrases = []
+    for term in query.split():
+        tokens = []
+        prefix = False
+        for cjk, word in _TOKEN_PATTERN.findall(term):
+            if word:
+                tokens.append(word.lower())
+            elif len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+            prefix = len(cjk) == 1
+        if tokens:
+            phrases.append('"' + ' '.join(tokens) + '"' + ('*' if prefix else ''))
+    return ' AND '.join(phrases) or None
+
+
+class SearchIndex:
+    """转写结果的全文索引（SQLite FTS5）。
+
+    每个视频（BV 号 + 分P）只保留最近一次转写的结果；片段原文与时间保存在普通表中，
+    FTS5 表不保存内容（content=''），只存 tokenize 切出的索引词，删除时重新切词。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.queries = 0
+        self.query_seconds = 0.0
+        self._lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                bv_id TEXT NOT NULL,
+                part INTEGER NOT NULL,
+                cache_key TEXT,
+                title TEXT,
+                duration REAL,
+                indexed_at REAL NOT NULL,
+                UNIQUE (bv_id, part)
+            );
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                document_id INTEGER NOT NULL,
+                start REAL NOT NULL,
+                end REAL NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_segments_document ON segments (document_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS segment_index USING fts5(tokens, content='', prefix='1');
+        ''')
+        self._conn.commit()
+
+    def add(self, bv_id, part, result, cache_key=None):
+        """索引一个转写结果，替换该视频之前的结果。"""
+        transcript = result.get('transcript')
+        if not isinstance(transcript, list):
+            return
+        started = time.perf_counter()
+        with self._lock:
+            try:
+                self._remove(bv_id, part)
+                document_id = self._conn.execute(
+                    'INSERT INTO documents (bv_id, part, cache_key, title, duration, indexed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (bv_id, part, cache_key, result.get('title'), result.get('duration'), time.time())
+                ).lastrowid
+                for segment in transcript:
+                    text = segment.get('text') or ''
+                    segment_id = self._conn.execute(
+                        'INSERT INTO segments (document_id, start, end, text) VALUES (?, ?, ?, ?)',
+                        (document_id, segment['start'], segment['end'], text)
+                    ).lastrowid
+                    self._conn.execute(
+                        'INSERT INTO segment_index (rowid, tokens) VALUES (?, ?)',
+                        (segment_id, ' '.join(tokenize(text)))
+                    )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        logger.info(f"已索引 {bv_id} P{part}: {len(transcript)} 个片段，耗时 {time.perf_counter() - started:.3f}s")
+
+    def _remove(self, bv_id, part):
+        row = self._conn.execute('SELECT id FROM documents WHERE bv_id = ? AND part = ?', (bv_id, part)).fetchone()
+        if row is None:
+            return
+        for segment_id, text in self._conn.execute(
+                'SELECT id, text FROM segments WHERE document_id = ?', (row[0],)).fetchall():
+            # content='' 的 FTS5 表删除时需要提供当初写入的索引词
+            self._conn.execute(
+                "INSERT INTO segment_index (segment_index, rowid, tokens) VALUES ('delete', ?, ?)",
+                (segment_id, ' '.join(tokenize(text)))
+            )
+        self._conn.execute('DELETE FROM segments WHERE document_id = ?', (row[0],))
+        self._conn.execute('DELETE FROM documents WHERE id = ?', (row[0],))
+
+    def contains(self, bv_id, part):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM documents WHERE bv_id = ? AND part = ?', (bv_id, part)).fetchone() is not None
+
+    def search(self, query, limit=20, offset=0, bv_id=None):
+        """返回 (匹配的片段, truncated)，片段按相关度排序：[{bvId, part, title, start, end, text, cacheKey}]。
+
+        匹配超过 RANK_CANDIDATES 条时只在最近写入的 RANK_CANDIDATES 条中排序与分页，truncated 为 True，
+        更早写入的片段即使更相关也可能不出现；offset + limit 超出这个范围时在全部匹配中排序（较慢），
+        truncated 为 False。指定 bv_id 时只查该视频的片段，总是在其全部匹配中排序，见 _search_video。
+        """
+        match = build_match_query(query)
+        if match is None:
+            return [], False
+        started = time.perf_counter()
+        with self._lock:
+            if bv_id:
+                rows, truncated = self._search_video(match, bv_id, limit, offset), False
+            else:
+                rows, truncated = self._search_all(match, limit, offset)
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - started
+        results = [
+            {'bvId': bv, 'part': part, 'title': title, 'cacheKey': cache_key, 'start': start, 'end': end, 'text': text}
+            for bv, part, title, cache_key, start, end, text in rows
+        ]
+        return results, truncated
+
+    def _search_all(self, match, limit, offset):
+        # 按 rowid 倒序跳过 RANK_CANDIDATES 条匹配只需遍历这么多条，用来判断候选是否被截断
+        more = self._conn.execute(
+            'SELECT rowid FROM segment_index WHERE segment_index MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?',
+            (match, RANK_CANDIDATES)
+        ).fetchone() is not None
+        if more and offset + limit > RANK_CANDIDATES:
+            rows = self._conn.execute('''
+                SELECT d.bv_id, d.part, d.title, d.cache_key, s.start, s.end, s.text
+                FROM (
+                    SELECT rowid, rank FROM segment_index
+                    WHERE segment_index MATCH ?
+                    ORDER BY rank LIMIT ? OFFSET ?
+                ) AS matches
+                JOIN segments s ON s.id = matches.rowid
+                JOIN documents d ON d.id = s.document_id
+                ORDER BY matches.rank
+            ''', (match, limit, offset)).fetchall()
+            return rows, False
+        rows = self._conn.execute('''
+            SELECT d.bv_id, d.part, d.title, d.cache_key, s.start, s.end, s.text
+            FROM (
+                SELECT rowid, rank FROM segment_index
+                WHERE segment_index MATCH ?
+                ORDER BY rowid DESC LIMIT ?
+            ) AS candidates
+            JOIN segments s ON s.id = candidates.rowid
+            JOIN documents d ON d.id = s.document_id
+            ORDER BY candidates.rank LIMIT ? OFFSET ?
+        ''', (match, RANK_CANDIDATES, limit, offset)).fetchall()
+        return rows, more
+
+    def _search_video(self, match, bv_id, limit, offset):
+        """只在一个视频（全部分P）的片段中查询，在其全部匹配中排序，不受 RANK_CANDIDATES 限制。
+
+        先按 documents 的 bv_id 索引找出各分P，再分别在该分P的片段 rowid 范围内查询 FTS5：
+        一个分P的片段在同一事务中写入，rowid 连续，范围内不会有其他视频的片段；
+        按范围过滤可以直接定位 FTS5 索引，耗时只与该分P的片段数有关。
+        """
+        ranges = self._conn.execute('''
+            SELECT MIN(s.id), MAX(s.id) FROM documents d JOIN segments s ON s.document_id = d.id
+            WHERE d.bv_id = ? GROUP BY d.id
+        ''', (bv_id,)).fetchall()
+        matches = []
+        for first, last in ranges:
+            matches.extend(self._conn.execute(
+                'SELECT rank, rowid FROM segment_index WHERE segment_index MATCH ? AND rowid BETWEEN ? AND ?',
+                (match, first, last)
+            ).fetchall())
+        matches.sort()
+        ids = [segment_id for _, segment_id in matches[offset:offset + limit]]
+        if not ids:
+            return []
+        rows = self._conn.execute(f'''
+            SELECT s.id, d.bv_id, d.part, d.title, d.cache_key, s.start, s.end, s.text
+            FROM segments s JOIN documents d ON d.id = s.document_id
+            WHERE s.id IN ({', '.join('?' * len(ids))})
+        ''', ids).fetchall()
+        by_id = {row[0]: row[1:] for row in rows}
+        return [by_id[segment_id] for segment_id in ids if segment_id in by_id]
+
+    def backfill(self, cache):
+        """把转写缓存中尚未索引的结果加入索引（同一视频保留最近写入的一份），返回新增的视频数。"""
+        added = 0
+        for key, result in cache.iter_items():
+            bv_id = result.get('bvId')
+            part = result.get('part') or 1
+            if not bv_id or self.contains(bv_id, part):
+                continue
+            try:
+                self.add(bv_id, part, result, cache_key=key)
+                added += 1
+            except Exception as e:
+                logger.error(f"索引缓存结果失败 {bv_id}: {str(e)}")
+        return added
+
+    def optimize(self):
+        """合并 FTS5 的索引段，大量写入后可缩短查询时间。"""
+        with self._lock:
+            self._conn.execute("INSERT INTO segment_index (segment_index) VALUES ('optimize')")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            documents = self._conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+            segments = self._conn.execute('SELECT COUNT(*) FROM segments').fetchone()[0]
+            return {
+                'documents': documents,
+                'segments': segments,
+                'queries': self.queries,
+                'averageQueryMs': self.query_seconds / self.queries * 1000 if self.queries else 0.0,
+            }
+
+
+_search_index = None
+_search_index_lock = Lock()
+
+
+def get_search_index():
+    """返回进程内共享的全文索引，未启用时返回 None。
+
+    第一次创建时在后台线程中把转写缓存里已有、尚未索引的结果补进索引。
+    """
+    global _search_index
+    if not is_search_index_enabled():
+        return None
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex(get_search_index_path())
+            Thread(target=_backfill, args=(_search_index,), name='search-backfill', daemon=True).start()
+        return _search_index
+
+
+def _backfill(index):
+    from .transcript_cache import get_transcript_cache
+    cache = get_transcript_cache()
+    if cache is None:
+        return
+    try:
+        added = index.backfill(cache)
+        if added:
+            logger.info(f"已从转写缓存补建索引 {added} 个视频")
+    except Exception as e:
+        logger.error(f"从转写缓存补建索引失败: {str(e)}")
+
+
+def index_result(bv_id, part, result, cache_key=None):
+    """任务完成后调用，把结果加入索引；失败只记录日志。"""
+    index = get_search_index()
+    if index is None:
+        return
+    try:
+        index.add(bv_id, part, result, cache_key=cache_key)
+    except Exception as e:
+        logger.error(f"写入全文索引失败: {str(e)}")
+
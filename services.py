@@ -1,11 +1,30 @@
-import yt_dlp
+import copy
 import logging
-from .transcription_service import TranscriptionFactory
-from .utils import update_progress, validate_bv_id, get_max_video_duration
+from .transcription_service import TranscriptionFactory, get_transcriber_identity
+from .transcriber_registry import get_transcriber_registry
+from .transcript_cache import make_cache_key
+from .model_pool import get_model_pool, make_model_key
+from .video_metadata import get_metadata_cache
+from .audio_store import AUDIO_PCM, get_audio_store, get_audio_store_kind
+from .pcm_audio import PCM_SUFFIX, prepare_pcm, read_pcm_info, write_pcm
+from .transcriber_router import AUTO_TRANSCRIBER, get_transcriber_router
+from .metrics import span, observe_download, TRANSCRIPTION_RTF
+from .utils import (
+    update_progress,
+    validate_bv_id,
+    get_max_video_duration,
+    get_enabled_transcribers,
+    get_faster_whisper_device,
+    get_faster_whisper_compute_type,
+    get_faster_whisper_cpu_threads,
+    is_model_warmup_enabled,
+    get_decode_options,
+    get_pcm_sample_format,
+    is_pcm_sidecar_enabled,
+    is_transcriber_preload_enabled,
+)
 import os
 from dotenv import load_dotenv
-import retry
-from tenacity import retry, stop_after_attempt, wait_fixed
 
 load_dotenv()
 # 全局变量定义
@@ -14,32 +33,128 @@ FASTER_WHISPER_MODEL_PATH = os.path.join(os.path.dirname(__file__), os.getenv('F
 # 从环境变量获取 Bilibili cookies
 BILIBILI_COOKIES = os.getenv('BILIBILI_COOKIES')
 
+# 支持从断点继续转写的服务：本地模型可以跳过已完成的音频；远程服务按整段提交，断点记录无从利用
+RESUMABLE_TRANSCRIBERS = ('faster_whisper',)
 
-def download_bilibili_audio(bv_id):
+# 读取预解码 PCM 的服务；云端 Faster Whisper 上传原始音频，为它解码只是浪费
+PCM_TRANSCRIBERS = ('faster_whisper', 'openai', AUTO_TRANSCRIBER)
+
+
+YDL_OPTS = {
+    'outtmpl': '%(id)s_%(title)s.%(ext)s',
+    'format': 'bestaudio/best',
+    'postprocessors': [],  # 移除后处理器
+    'quiet': False,
+    'no_warnings': True,
+    'nocheckcertificate': True,
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36',
+    'cookies': BILIBILI_COOKIES,
+    # 多P视频只处理指定的一P，不展开成播放列表
+    'noplaylist': True
+}
+
+
+def get_video_url(bv_id, part=1):
+    url = f"https://www.bilibili.com/video/{bv_id}"
+    return f"{url}?p={part}" if part > 1 else url
+
+
+def get_metadata_key(bv_id, part=1):
+    return bv_id if part == 1 else f"{bv_id}?p={part}"
+
+
+def get_video_metadata(bv_id, ydl=None, part=1):
+    """解析视频（某一P）的信息，结果在 TTL 内缓存，重复查询不再访问 yt-dlp。"""
+    cache = get_metadata_cache()
+    key = get_metadata_key(bv_id, part)
+    meta = cache.get(key)
+    if meta is not None:
+        return meta
+
+    if ydl is None:
+        import yt_dlp
+        with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+            return get_video_metadata(bv_id, ydl, part)
+
+    with span('metadata'):
+        meta = ydl.sanitize_info(ydl.extract_info(get_video_url(bv_id, part), download=False))
+    cache.put(key, meta)
+    return meta
+
+
+def get_video_parts(bv_id):
+    """一次请求解析视频的全部分P，返回 [{'part', 'title', 'duration'}]，结果与视频信息一起缓存。
+
+    只读取播放列表的条目，不解析各P的下载地址；单P视频返回只有一项的列表。
+    """
+    cache = get_metadata_cache()
+    key = f"{bv_id}:parts"
+    parts = cache.get(key)
+    if parts is not None:
+        return parts
+
+    import yt_dlp
+    with yt_dlp.YoutubeDL(dict(YDL_OPTS, noplaylist=False, extract_flat='in_playlist')) as ydl:
+        with span('metadata'):
+            info = ydl.sanitize_info(ydl.extract_info(get_video_url(bv_id), download=False))
+    entries = info.get('entries') if info.get('_type') == 'playlist' else None
+    if entries:
+        parts = [
+            {'part': index, 'title': entry.get('title'), 'duration': entry.get('duration')}
+            for index, entry in enumerate(entries, 1)
+        ]
+    else:
+        parts = [{'part': 1, 'title': info.get('title'), 'duration': info.get('duration')}]
+        # 单P视频得到的就是完整的视频信息，下载时可直接使用
+        if info.get('formats'):
+            cache.put(bv_id, info)
+    cache.put(key, parts)
+    return parts
+
+
+def get_cached_video_duration(bv_id, part=1):
+    """只查缓存，不触发网络请求；未缓存时返回 None。"""
+    cache = get_metadata_cache()
+    meta = cache.get(get_metadata_key(bv_id, part))
+    if meta:
+        return meta.get('duration')
+    for item in cache.get(f"{bv_id}:parts") or ():
+        if item['part'] == part:
+            return item['duration']
+    return None
+
+
+def download_bilibili_audio(bv_id, part=1):
+    # yt-dlp 导入较慢，只在真正需要下载时加载
+    import yt_dlp
     duration = None
     try:
         bv_id = validate_bv_id(bv_id)
     except ValueError as e:
-        update_progress(bv_id, '下载失败', str(e))
+        update_progress(bv_id, '下载失败', str(e), part=part)
         return None, None, None, duration
 
-    update_progress(bv_id, '正在获取视频信息')
-    url = f"https://www.bilibili.com/video/{bv_id}"
-    ydl_opts = {
-        'outtmpl': '%(id)s_%(title)s.%(ext)s',
-        'format': 'bestaudio/best',
-        'postprocessors': [],  # 移除后处理器
-        'quiet': False,
-        'no_warnings': True,
-        'nocheckcertificate': True,
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36',
-        'cookies': BILIBILI_COOKIES
-    }
+    store = get_audio_store()
+    kind = get_audio_store_kind()
+    if store:
+        stored = store.acquire(bv_id, part, kind)
+        if stored is not None:
+            # 之前下载过：直接使用已保存的音频，不再访问 B 站
+            logging.info(f"音频存储命中: {bv_id} P{part}")
+            update_progress(bv_id, '音频下载完成', part=part)
+            return bv_id, stored['title'], stored['path'], stored['duration']
+
+    update_progress(bv_id, '正在获取视频信息', part=part)
+
+    ydl_opts = YDL_OPTS
+    if store:
+        # 先下载到存储的临时目录，完成后再移入存储，其他 worker 不会读到写了一半的文件
+        ydl_opts = dict(YDL_OPTS, outtmpl=store.temp_path('.%(ext)s'))
 
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         try:
-            update_progress(bv_id, '正在分析可用音频格式')
-            meta = ydl.extract_info(url, download=False)
+            update_progress(bv_id, '正在分析可用音频格式', part=part)
+            meta = get_video_metadata(bv_id, ydl, part)
             
             # 检查视频时长
             duration = meta.get('duration')
@@ -52,9 +167,17 @@ def download_bilibili_audio(bv_id):
             if not formats:
                 raise Exception("未找到可用的音频格式")
 
-            update_progress(bv_id, '正在下载音频')
-            info = ydl.extract_info(url, download=True)
-            update_progress(bv_id, '音频下载完成')
+            update_progress(bv_id, '正在下载音频', part=part)
+            with span('download') as download_span:
+                try:
+                    # 直接使用已解析的信息下载，不再重复请求视频页面；process_ie_result 会修改传入的字典
+                    info = ydl.process_ie_result(copy.deepcopy(meta), download=True)
+                except yt_dlp.utils.DownloadError:
+                    # 缓存中的下载地址可能已过期，重新解析一次
+                    logging.warning("使用缓存的视频信息下载失败，重新解析后重试")
+                    get_metadata_cache().invalidate(get_metadata_key(bv_id, part))
+                    info = ydl.process_ie_result(copy.deepcopy(get_video_metadata(bv_id, ydl, part)), download=True)
+            update_progress(bv_id, '音频下载完成', part=part)
             
             duration = info.get('duration')
             if duration is None:
@@ -62,33 +185,149 @@ def download_bilibili_audio(bv_id):
                 duration = 0
 
             # 获取下载的文件路径
-            if info['requested_downloads']:
+            if info.get('requested_downloads'):
                 file_path = info['requested_downloads'][0]['filepath']
             else:
                 file_path = ydl.prepare_filename(info)
+            if os.path.exists(file_path):
+                observe_download(os.path.getsize(file_path), download_span.seconds)
 
+            if store:
+                file_path = save_to_audio_store(store, bv_id, part, kind, file_path, info.get('title'), duration)
             return info['id'], info['title'], file_path, duration
         except yt_dlp.utils.DownloadError as e:
             logging.error(f"下载失败: {str(e)}")
             logging.exception("详细错误信息:")
-            update_progress(bv_id, '下载失败', str(e))
+            update_progress(bv_id, '下载失败', str(e), part=part)
             raise ValueError(str(e))
         except Exception as e:
             logging.error(f"未知错误: {str(e)}")
             logging.exception("详细错误信息:")
-            update_progress(bv_id, '下载失败', str(e))
+            update_progress(bv_id, '下载失败', str(e), part=part)
             raise
 
     return None, None, None, duration
 
-def transcribe_audio(audio_filename, transcriber_type="faster_whisper"):
+def save_to_audio_store(store, bv_id, part, kind, file_path, title, duration):
+    """把下载到临时目录的音频移入存储（需要时先转为 PCM），返回存储后的路径。"""
+    if kind == AUDIO_PCM:
+        update_progress(bv_id, '正在解码音频', part=part)
+        pcm_path = store.temp_path(PCM_SUFFIX)
+        try:
+            with span('decode'):
+                write_pcm(file_path, pcm_path, get_pcm_sample_format())
+        finally:
+            cleanup_files(file_path)
+        file_path = pcm_path
+    return store.put_file(bv_id, part, kind, file_path, title=title, duration=duration)
+
+def open_bilibili_audio_stream(bv_id, part=1):
+    """解析视频信息并返回音频字节流，音频不落盘，供流水线边下载边转写。
+
+    返回 (bvid, title, duration, byte_source)。
+    """
+    import yt_dlp
+    from .streaming_pipeline import iter_http_bytes
+    bv_id = validate_bv_id(bv_id)
+    update_progress(bv_id, '正在获取视频信息', part=part)
+    try:
+        meta = get_video_metadata(bv_id, part=part)
+    except yt_dlp.utils.DownloadError as e:
+        update_progress(bv_id, '下载失败', str(e), part=part)
+        raise ValueError(str(e))
+
+    duration = meta.get('duration')
+    max_duration = get_max_video_duration()
+    if duration and duration > max_duration:
+        raise ValueError(f"视频时长 ({duration}秒) 超过允许的最大时长 ({max_duration}秒)")
+
+    # 单一格式时下载地址在顶层，否则取第一个被选中的格式
+    audio_format = meta if meta.get('url') else (meta.get('requested_formats') or [{}])[0]
+    url = audio_format.get('url')
+    if not url:
+        raise ValueError("未找到可用的音频格式")
+    headers = audio_format.get('http_headers') or meta.get('http_headers')
+    update_progress(bv_id, '正在下载并转写音频', part=part)
+    return meta['id'], meta.get('title'), duration, iter_http_bytes(url, headers=headers)
+
+def transcribe_audio_stream(byte_source, duration=None, on_segment=None):
+    """流水线模式，仅支持本地 Faster Whisper。失败时返回 None，与 transcribe_audio 一致。"""
+    try:
+        transcriber = TranscriptionFactory.get_transcriber('faster_whisper', model_path=FASTER_WHISPER_MODEL_PATH)
+        return transcriber.transcribe_stream(byte_source, duration=duration, on_segment=on_segment)
+    except Exception as e:
+        logging.error(f"流式转写过程中发生错误: {str(e)}")
+        logging.exception("详细错误信息:")
+        return None
+
+def prepare_audio(audio_filename, transcriber_type='faster_whisper'):
+    """音频准备阶段：解码一次并写出 PCM 旁路文件，返回其路径。
+
+    只为读取 PCM 的服务（PCM_TRANSCRIBERS）解码；未启用、不需要或解码失败时返回 None。
+    音频存储中的音频按内容摘要保留一份旁路文件，随音频对象一起淘汰，重试、续转与其他任务直接复用；
+    不归存储管理的音频在所在目录写出任务自己的旁路文件，由 release_audio_file 删除。
+    """
+    if not is_pcm_sidecar_enabled() or transcriber_type not in PCM_TRANSCRIBERS:
+        return None
+    store = get_audio_store()
+    sample_format = get_pcm_sample_format()
+    try:
+        with span('decode'):
+            if store and store.owns(audio_filename) and read_pcm_info(audio_filename) is None:
+                return store.get_sidecar(audio_filename, lambda tmp_path: write_pcm(audio_filename, tmp_path, sample_format))
+            return prepare_pcm(audio_filename, sample_format)
+    except Exception as e:
+        logging.warning(f"预解码音频失败，转写时再解码: {str(e)}")
+        return None
+
+def run_transcriber(transcriber_type, audio_filename, on_segment=None, pcm_filename=None, offset=0.0):
+    """用指定的转写服务转写音频，失败时抛出异常。
+
+    pcm_filename 为预解码的 PCM 文件，本地模型与 OpenAI 分块上传直接读取它而不再解码；
+    云端服务需要上传压缩后的原始音频。offset 只对本地模型有效，见 RESUMABLE_TRANSCRIBERS。
+    """
+    transcriber = TranscriptionFactory.get_transcriber(transcriber_type, model_path=FASTER_WHISPER_MODEL_PATH)
+    if transcriber_type == 'faster_whisper':
+        # 本地模型与 OpenAI 分块上传可以逐段产出结果，云端转写器在结束后一次性返回
+        return transcriber.transcribe(pcm_filename or audio_filename, on_segment=on_segment, offset=offset)
+    elif transcriber_type == 'openai':
+        return transcriber.transcribe(audio_filename, on_segment=on_segment, pcm_filename=pcm_filename)
+    elif transcriber_type == 'cloud_faster_whisper':
+        return transcriber.transcribe(audio_filename, **get_decode_options())
+    return transcriber.transcribe(audio_filename)
+
+def transcribe_audio(audio_filename, transcriber_type="faster_whisper", on_segment=None, duration=None, pcm_filename=None, offset=0.0,
+                     on_reset=None):
     logging.info(f"开始转写音频文件: {audio_filename}")
     logging.info(f"使用转写器类型: {transcriber_type}")
     
+    router = get_transcriber_router()
+    # 续转时只有 offset 之后的部分计入实时率
+    remaining = duration - offset if duration and duration > offset else duration
     try:
-        transcriber = TranscriptionFactory.get_transcriber(transcriber_type, model_path=FASTER_WHISPER_MODEL_PATH)
         update_progress(audio_filename, '正在转写音频')
-        transcript = transcriber.transcribe(audio_filename)
+        with span('transcribe') as transcribe_span:
+            if transcriber_type == AUTO_TRANSCRIBER:
+                transcript, backend = router.transcribe(
+                    audio_filename,
+                    lambda name, path, callback: run_transcriber(name, path, callback, pcm_filename),
+                    duration=duration,
+                    on_segment=on_segment,
+                    on_reset=on_reset
+                )
+                logging.info(f"自动选择的转写服务: {backend}")
+            else:
+                # 指定服务的任务同样计入统计，供 auto 模式参考
+                backend = transcriber_type
+                started = router.begin(transcriber_type)
+                try:
+                    transcript = run_transcriber(transcriber_type, audio_filename, on_segment, pcm_filename, offset)
+                except Exception:
+                    router.end(transcriber_type, started, remaining, ok=False)
+                    raise
+                router.end(transcriber_type, started, remaining, ok=True)
+        if remaining:
+            TRANSCRIPTION_RTF.observe(transcribe_span.seconds / remaining, transcriber=backend)
         update_progress(audio_filename, '转写完成')
         return transcript
     except Exception as e:
@@ -97,6 +336,52 @@ def transcribe_audio(audio_filename, transcriber_type="faster_whisper"):
         update_progress(audio_filename, '转写失败', str(e))
         return None
 
+def get_transcript_cache_key(bv_id, part, transcriber_type):
+    return make_cache_key(
+        bv_id,
+        part,
+        transcriber_type,
+        get_transcriber_identity(transcriber_type, FASTER_WHISPER_MODEL_PATH),
+        get_decode_options()
+    )
+
+def warm_up_transcribers():
+    """启动阶段预先导入已启用的转写服务；未开启时各服务在第一次使用时才导入。"""
+    if is_transcriber_preload_enabled():
+        get_transcriber_registry().warm_up()
+
+def warm_up_model_pool():
+    """在应用启动时预先加载本地模型，避免首个请求承担模型加载开销。"""
+    pool = get_model_pool()
+    pool.start_eviction_timer()
+    if not get_enabled_transcribers().get('faster_whisper') or not is_model_warmup_enabled():
+        return
+    key = make_model_key(
+        FASTER_WHISPER_MODEL_PATH,
+        device=get_faster_whisper_device(),
+        compute_type=get_faster_whisper_compute_type(),
+        cpu_threads=get_faster_whisper_cpu_threads()
+    )
+    try:
+        pool.warm_up(key)
+    except Exception as e:
+        logging.error(f"模型预热失败: {str(e)}")
+
+def shutdown_model_pool():
+    pool = get_model_pool()
+    pool.stop_eviction_timer()
+    pool.clear()
+
+def release_audio_file(audio_filename, pcm_filename=None):
+    """任务用完音频后调用：由音频存储管理的文件（包括旁路文件）只解除占用，其余文件直接删除。"""
+    store = get_audio_store()
+    if pcm_filename and pcm_filename != audio_filename and not (store and store.owns(pcm_filename)):
+        cleanup_files(pcm_filename)
+    if store and store.owns(audio_filename):
+        store.release(audio_filename)
+    else:
+        cleanup_files(audio_filename)
+
 def cleanup_files(audio_filename):
     try:
         os.remove(audio_filename)
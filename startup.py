@@ -0,0 +1,141 @@
+import sys
+import time
+import logging
+from threading import Lock, local
+
+logger = logging.getLogger(__name__)
+
+# 启动报告中列出的模块数
+REPORT_TOP_MODULES = 15
+
+
+class _TimedLoader:
+    """包装原 loader，统计 exec_module 的耗时；执行结束后把模块的 loader 还原。"""
+
+    def __init__(self, loader, timer):
+        self._loader = loader
+        self._timer = timer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        spec = module.__spec__
+        self._timer._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._exit(module.__name__)
+            spec.loader = self._loader
+            module.__loader__ = self._loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _TimingFinder:
+    def __init__(self, timer):
+        self._timer = timer
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self._timer)
+        return spec
+
+
+class ImportTimer:
+    """统计期间导入的每个模块的耗时，作用类似 python -X importtime。
+
+    cumulative 含该模块导入的子模块，self 为去掉子模块后的部分。只应在启动阶段使用。
+    """
+
+    def __init__(self):
+        self.started = None
+        self.seconds = None
+        self.records = {}  # 模块名 -> (self 秒, cumulative 秒)
+        self._finder = _TimingFinder(self)
+        self._local = local()  # 每个线程各自的导入栈 [(开始时间, 子模块耗时)]
+        self._lock = Lock()
+
+    def start(self):
+        self.started = time.perf_counter()
+        sys.meta_path.insert(0, self._finder)
+        return self
+
+    def stop(self):
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self):
+        self._stack().append([time.perf_counter(), 0.0])
+
+    def _exit(self, name):
+        stack = self._stack()
+        started, children = stack.pop()
+        cumulative = time.perf_counter() - started
+        with self._lock:
+            self.records[name] = (cumulative - children, cumulative)
+        if stack:
+            stack[-1][1] += cumulative
+
+    def top(self, count=REPORT_TOP_MODULES, key='cumulative'):
+        index = 1 if key == 'cumulative' else 0
+        ordered = sorted(self.records.items(), key=lambda item: item[1][index], reverse=True)
+        return [
+            {'module': name, 'selfSeconds': round(own, 4), 'cumulativeSeconds': round(cumulative, 4)}
+            for name, (own, cumulative) in ordered[:count]
+        ]
+
+
+_import_timer = None
+_boot = {}
+
+
+def start_import_timer():
+    """在应用模块最开始调用，统计其后的所有导入。"""
+    global _import_timer
+    if _import_timer is None:
+        _import_timer = ImportTimer().start()
+    return _import_timer
+
+
+def finish_startup():
+    """应用初始化完成后调用：停止统计并在日志中输出启动报告。"""
+    if _import_timer is None or _import_timer.seconds is not None:
+        return
+    _import_timer.stop()
+    _boot['seconds'] = _import_timer.seconds
+    _boot['finishedAt'] = time.time()
+    report = get_startup_report()
+    logger.info(f"启动耗时 {report['bootSeconds']:.2f}s，其中导入 {len(_import_timer.records)} 个模块，最慢的模块（累计秒 / 自身秒）:")
+    for item in report['imports']:
+        logger.info(f"  {item['cumulativeSeconds']:8.3f} {item['selfSeconds']:8.3f}  {item['module']}")
+
+
+def get_startup_report():
+    from .transcriber_registry import get_transcriber_registry
+    from .autotune_profile import get_applied_autotune_profile
+    heavy = ('faster_whisper', 'ctranslate2', 'onnxruntime', 'openai', 'gradio_client', 'yt_dlp', 'httpx', 'av', 'numpy', 'requests')
+    return {
+        'bootSeconds': _boot.get('seconds'),
+        'imports': _import_timer.top() if _import_timer else [],
+        'heavyModulesLoaded': [name for name in heavy if name in sys.modules],
+        'transcribers': get_transcriber_registry().stats(),
+        'autotune': get_applied_autotune_profile(),
+    }
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from threading import Lock
+from .utils import get_state_backend_url
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStateBackend:
+    """进程内存储，仅适用于单进程部署。"""
+
+    PURGE_INTERVAL = 60
+
+    def __init__(self):
+        self._data = {}  # key -> (expires_at, value)
+        self._lock = Lock()
+        self._last_purge = 0
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._data[key] = (now + ttl, value)
+            # 写入时顺带清理过期条目，代替定时清理线程
+            if now - self._last_purge > self.PURGE_INTERVAL:
+                for expired in [k for k, (expires_at, _) in self._data.items() if expires_at < now]:
+                    del self._data[expired]
+                self._last_purge = now
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteStateBackend:
+    """基于 SQLite（WAL 模式）的存储，同一台机器上的多个 worker 进程共享。"""
+
+    PURGE_INTERVAL = 60
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self._lock = Lock()
+        self._last_purge = 0
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), now + ttl)
+            )
+            if now - self._last_purge > self.PURGE_INTERVAL:
+                self._conn.execute('DELETE FROM state WHERE expires_at < ?', (now,))
+                self._last_purge = now
+            self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM state WHERE key = ? AND expires_at >= ?', (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM state WHERE key = ?', (key,))
+            self._conn.commit()
+
+
+class RedisStateBackend:
+    """基于 Redis（或兼容协议的服务）的存储，可跨主机共享，过期由 Redis 负责。"""
+
+    def __init__(self, url, prefix='bilibili-transcribe:'):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("使用 Redis 状态存储需要安装 redis 包: pip install redis")
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, json.dumps(value, ensure_ascii=False), ex=max(1, int(ttl)))
+
+    def get(self, key):
+        value = self._client.get(self._prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+
+def create_state_backend(url):
+    """根据 URL 创建存储：memory://、sqlite:///path/to/state.db、redis://host:port/db。"""
+    if not url or url.startswith('memory://'):
+        return MemoryStateBackend()
+    if url.startswith('sqlite:///'):
+        # 与 SQLAlchemy 相同：sqlite:///relative.db 为相对路径，sqlite:////abs.db 为绝对路径
+        return SQLiteStateBackend(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStateBackend(url)
+    raise ValueError(f"不支持的状态存储: {url}")
+
+
+_state_backend = None
+_state_backend_lock = Lock()
+
+
+def get_state_backend():
+    global _state_backend
+    with _state_backend_lock:
+        if _state_backend is None:
+            _state_backend = create_state_backend(get_state_backend_url())
+            logger.info(f"状态存储: {type(_state_backend).__name__}")
+        return _state_backend
@@ -0,0 +1,245 @@
+import io
+import time
+import logging
+from queue import Full, Queue
+from threading import Condition, Thread
+import numpy as np
+from .chunked_transcription import SAMPLING_RATE, SegmentMerger, find_last_silence
+from .model_pool import get_model_pool
+from .metrics import DOWNLOAD_BYTES
+from .utils import get_model_checkout_timeout
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def iter_http_bytes(url, headers=None, chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=30):
+    """以流的方式下载音频，边下载边产出字节块。"""
+    import requests
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                DOWNLOAD_BYTES.inc(len(chunk))
+                yield chunk
+
+
+def iter_file_bytes(path, chunk_size=DOWNLOAD_CHUNK_SIZE, delay=0.0):
+    """把本地文件按块读出；delay 用于在本地模拟较慢的下载。"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            if delay:
+                time.sleep(delay)
+            yield chunk
+
+
+class ByteStreamReader(io.RawIOBase):
+    """把生产者线程写入的字节块包装成只读、不可 seek 的文件对象，供 PyAV 解码。
+
+    内部队列有容量上限，解码跟不上时下载线程会被阻塞。
+    """
+
+    def __init__(self, max_chunks=64):
+        self._queue = Queue(maxsize=max_chunks)
+        self._current = memoryview(b'')
+        self._eof = False
+        self._cancelled = False
+        self.error = None
+
+    def feed(self, data):
+        """写入一个字节块；读取方已取消时返回 False。"""
+        while not self._cancelled:
+            try:
+                self._queue.put(data, timeout=1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def finish(self, error=None):
+        self.error = error
+        self.feed(None)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, buffer):
+        while not self._current and not self._eof:
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                if self.error:
+                    raise IOError(f"音频下载失败: {self.error}")
+            else:
+                self._current = memoryview(item)
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+
+class PCMRingBuffer:
+    """定长的 float32 环形缓冲区，连接解码线程与转写线程。
+
+    缓冲区满时 write 阻塞，从而限制解码领先于转写的音频量。
+    """
+
+    def __init__(self, capacity):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        self.error = None
+        self._cond = Condition()
+
+    def write(self, samples):
+        capacity = len(self._data)
+        position = 0
+        while position < len(samples):
+            with self._cond:
+                self._cond.wait_for(lambda: self._size < capacity or self._closed)
+                if self._closed:
+                    return
+                count = min(capacity - self._size, len(samples) - position)
+                end = (self._start + self._size) % capacity
+                first = min(count, capacity - end)
+                self._data[end:end + first] = samples[position:position + first]
+                self._data[:count - first] = samples[position + first:position + count]
+                self._size += count
+                position += count
+                self._cond.notify_all()
+
+    def read(self, max_samples):
+        """读取至多 max_samples 个样本；缓冲区为空时阻塞，结束后返回空数组。"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._size > 0 or self._closed)
+            if self._size == 0 and self.error:
+                raise self.error
+            count = min(self._size, max_samples)
+            capacity = len(self._data)
+            first = min(count, capacity - self._start)
+            out = np.concatenate((
+                self._data[self._start:self._start + first],
+                self._data[:count - first]
+            ))
+            self._start = (self._start + count) % capacity
+            self._size -= count
+            self._cond.notify_all()
+            return out
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self, error=None):
+        with self._cond:
+            if error is not None:
+                self.error = error
+            self._closed = True
+            self._cond.notify_all()
+
+
+def _pump_bytes(byte_source, reader):
+    try:
+        for chunk in byte_source:
+            if not reader.feed(chunk):
+                return
+        reader.finish()
+    except Exception as e:
+        logger.error(f"读取音频流失败: {str(e)}")
+        reader.finish(error=e)
+
+
+def _decode_to_pcm(reader, pcm_buffer):
+    """把压缩音频流解码为 16kHz 单声道 float32 PCM 写入环形缓冲区。
+
+    输入需要是可流式解析的容器（如 B 站 DASH 使用的分片 MP4、MP3 等）。
+    """
+    try:
+        import av
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=SAMPLING_RATE)
+        with av.open(reader, mode='r') as container:
+            for frame in container.decode(audio=0):
+                if pcm_buffer.closed:
+                    # 转写端已退出，停止解码
+                    reader.cancel()
+                    return
+                for resampled in resampler.resample(frame):
+                    samples = resampled.to_ndarray().reshape(-1)
+                    pcm_buffer.write(samples.astype(np.float32) / 32768.0)
+        for resampled in resampler.resample(None):
+            pcm_buffer.write(resampled.to_ndarray().reshape(-1).astype(np.float32) / 32768.0)
+        pcm_buffer.close()
+    except Exception as e:
+        logger.error(f"音频流解码失败: {str(e)}")
+        pcm_buffer.close(error=e)
+        reader.cancel()
+
+
+def transcribe_stream(model_key, byte_source, options, chunk_seconds, duration=None, on_segment=None):
+    """边下载、边解码、边转写。
+
+    byte_source 是任意产出字节块的可迭代对象（HTTP 下载流或本地文件）。
+    解码后的 PCM 在窗口累积到 chunk_seconds 时，于窗口内最后一段静音处切分并送入模型，
+    剩余部分并入下一个窗口。返回与整段转写相同格式的片段列表。
+    """
+    chunk_samples = int(chunk_seconds * SAMPLING_RATE)
+    reader = ByteStreamReader()
+    pcm_buffer = PCMRingBuffer(capacity=2 * chunk_samples)
+    threads = [
+        Thread(target=_pump_bytes, args=(byte_source, reader), name='stream-download', daemon=True),
+        Thread(target=_decode_to_pcm, args=(reader, pcm_buffer), name='stream-decode', daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    min_silence = (options.get('vad_parameters') or {}).get('min_silence_duration_ms', 500)
+    merger = SegmentMerger(duration, on_segment)
+    window = np.zeros(0, dtype=np.float32)
+    offset = 0
+    finished = False
+    try:
+        with get_model_pool().checkout(model_key, timeout=get_model_checkout_timeout()) as model:
+            while not finished:
+                parts = [window]
+                filled = len(window)
+                while filled < chunk_samples:
+                    samples = pcm_buffer.read(chunk_samples - filled)
+                    if not len(samples):
+                        finished = True
+                        break
+                    parts.append(samples)
+                    filled += len(samples)
+                window = np.concatenate(parts)
+                if not len(window):
+                    break
+
+                # 不在窗口前半段切分，避免产生过短的分块
+                cut = len(window) if finished else find_last_silence(
+                    window, min_silence, min_keep=len(window) // 2)
+                segments, _ = model.transcribe(window[:cut], **options)
+                merger.add_chunk(
+                    offset / SAMPLING_RATE,
+                    (offset + cut) / SAMPLING_RATE,
+                    [{'start': s.start, 'end': s.end, 'text': s.text} for s in segments],
+                    final=finished and cut == len(window)
+                )
+                offset += cut
+                window = window[cut:]
+                logger.info(f"流式转写进度: 已处理 {offset / SAMPLING_RATE:.1f}s 音频")
+            # 最后一个窗口正好在末尾切分时，流结束后读到的是空窗口，没有带 final 的分块
+            merger.flush()
+    finally:
+        # 出错时让上游线程尽快退出
+        pcm_buffer.close()
+    return merger.segments
@@ -1,22 +1,124 @@
-import datetime
+import json
 
-def format_time(seconds):
-    """Convert seconds to SRT time format."""
-    return str(datetime.timedelta(seconds=seconds)).replace('.', ',')[:-3]
+# 格式 -> (MIME 类型, 扩展名)
+SUBTITLE_FORMATS = {
+    'srt': ('application/x-subrip', '.srt'),
+    'vtt': ('text/vtt', '.vtt'),
+    'ass': ('text/x-ssa', '.ass'),
+    'json': ('application/json', '.json'),
+}
 
-def generate_srt(transcript):
-    """Generate SRT formatted subtitles from transcript."""
-    srt_content = ""
+# 导出时带 BOM 的格式，部分 Windows 播放器依赖它识别 UTF-8
+BOM_FORMATS = {'srt'}
+
+# 流式输出时每次产出的片段数，减少小块写入的开销
+EXPORT_BATCH_SIZE = 256
+
+ASS_HEADER = (
+    "[Script Info]\n"
+    "ScriptType: v4.00+\n"
+    "WrapStyle: 0\n"
+    "ScaledBorderAndShadow: yes\n"
+    "PlayResX: 1920\n"
+    "PlayResY: 1080\n"
+    "\n"
+    "[V4+ Styles]\n"
+    "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+    "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+    "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+    "Style: Default,Microsoft YaHei,60,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,"
+    "0,0,0,0,100,100,0,0,1,2,1,2,20,20,40,1\n"
+    "\n"
+    "[Events]\n"
+    "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+)
+
+
+def _split_time(seconds, unit):
+    """把秒数按 unit（每秒的份数）取整后拆成 (时, 分, 秒, 余数)，全程整数运算。"""
+    total = max(0, int(round(seconds * unit)))
+    hours, total = divmod(total, 3600 * unit)
+    minutes, total = divmod(total, 60 * unit)
+    secs, fraction = divmod(total, unit)
+    return hours, minutes, secs, fraction
+
+
+def format_srt_time(seconds):
+    """HH:MM:SS,mmm"""
+    return '%02d:%02d:%02d,%03d' % _split_time(seconds, 1000)
+
+
+def format_vtt_time(seconds):
+    """HH:MM:SS.mmm"""
+    return '%02d:%02d:%02d.%03d' % _split_time(seconds, 1000)
+
+
+def format_ass_time(seconds):
+    """H:MM:SS.cc（ASS 精确到百分之一秒）"""
+    return '%d:%02d:%02d.%02d' % _split_time(seconds, 100)
+
+
+def iter_srt(transcript):
     for index, segment in enumerate(transcript, start=1):
-        start_time = format_time(segment['start'])
-        end_time = format_time(segment['end'])
-        text = segment['text'].strip()
-        
-        srt_content += f"{index}\n{start_time} --> {end_time}\n{text}\n\n"
-    
-    return srt_content.strip()
-
-def save_srt(content, filename):
-    """Save SRT content to a file."""
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(content)
\ No newline at end of file
+        yield (f"{index}\n{format_srt_time(segment['start'])} --> {format_srt_time(segment['end'])}\n"
+               f"{segment['text'].strip()}\n\n")
+
+
+def iter_vtt(transcript):
+    yield "WEBVTT\n\n"
+    for segment in transcript:
+        # 字幕文本中不允许出现 "-->"，& 与 < 需要转义
+        text = segment['text'].strip().replace('&', '&amp;').replace('<', '&lt;').replace('-->', '--&gt;')
+        yield f"{format_vtt_time(segment['start'])} --> {format_vtt_time(segment['end'])}\n{text}\n\n"
+
+
+def iter_ass(transcript):
+    yield ASS_HEADER
+    for segment in transcript:
+        # 花括号会被解析为特效标签，换行需要写成 \N
+        text = segment['text'].strip().replace('{', '(').replace('}', ')').replace('\n', '\\N')
+        yield f"Dialogue: 0,{format_ass_time(segment['start'])},{format_ass_time(segment['end'])},Default,,0,0,0,,{text}\n"
+
+
+def iter_json(transcript):
+    yield '['
+    for index, segment in enumerate(transcript):
+        item = json.dumps({
+            'index': index + 1,
+            'start': segment['start'],
+            'end': segment['end'],
+            'text': segment['text'].strip()
+        }, ensure_ascii=False)
+        yield ('\n' if index == 0 else ',\n') + item
+    yield '\n]\n'
+
+
+_WRITERS = {
+    'srt': iter_srt,
+    'vtt': iter_vtt,
+    'ass': iter_ass,
+    'json': iter_json,
+}
+
+
+def iter_subtitles(transcript, fmt='srt', batch_size=EXPORT_BATCH_SIZE, bom=False):
+    """按指定格式逐批产出字幕文本，可直接作为流式响应体，不在内存中拼出整个文件。
+
+    bom 为 True 时，BOM_FORMATS 中的格式在开头加上 BOM。
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"不支持的字幕格式: {fmt}")
+    batch = ['\ufeff'] if bom and fmt in BOM_FORMATS else []
+    for piece in _WRITERS[fmt](transcript):
+        batch.append(piece)
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def render_subtitles(transcript, fmt='srt'):
+    """渲染完整的字幕文件（UTF-8 字节，需要时带 BOM），用于缓存与压缩。"""
+    return ''.join(iter_subtitles(transcript, fmt, bom=True)).encode('utf-8')
+
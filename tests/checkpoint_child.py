@@ -0,0 +1,38 @@
+"""在子进程中运行一次转写任务，写到第 segments 个片段之后的那一行时只写一半，然后等待父进程用 SIGKILL 杀掉。
+
+    python -m <包名>.tests.checkpoint_child <临时目录> <片段数>
+"""
+import os
+import sys
+import json
+import time
+from pathlib import Path
+from ..checkpoint import CheckpointJournal
+from ..model_pool import get_model_pool
+from .test_checkpoint_resume import StubModel, run_job
+
+
+def main(directory, segments):
+    state = {'samples': 0, 'segments': 0, 'kill_after': None}
+    get_model_pool()._loader = lambda key: StubModel(state)
+    write = CheckpointJournal._write
+    records = []
+
+    def write_then_hang(journal, record):
+        records.append(record)
+        if len(records) <= segments + 1:  # 首行 + segments 个完整的片段
+            return write(journal, record)
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        journal._file.write(line[:len(line) // 2])
+        journal._file.flush()
+        os.fsync(journal._file.fileno())
+        print('ready', flush=True)
+        while True:
+            time.sleep(60)
+
+    CheckpointJournal._write = write_then_hang
+    run_job(Path(directory), 'killed')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], int(sys.argv[2]))
@@ -0,0 +1,5 @@
+import os
+
+# services 在导入时读取模型路径；测试用桩模型替换真实模型，只需要目录存在
+os.environ.setdefault('FASTER_WHISPER_MODEL_PATH', 'faster-whisper-base')
+os.environ.setdefault('STATE_BACKEND_URL', 'memory://')
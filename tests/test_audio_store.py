@@ -0,0 +1,117 @@
+"""音频存储：PCM 旁路文件按内容摘要保存在存储中，供同一音频的所有任务复用，随音频对象一起淘汰；
+其他进程正在使用的音频不会被淘汰。
+"""
+import os
+import wave
+import multiprocessing
+import numpy as np
+import pytest
+from .. import audio_store
+from ..audio_store import AUDIO_ORIGINAL, AudioStore, get_audio_store
+from ..pcm_audio import as_float32, open_pcm
+from ..services import prepare_audio, release_audio_file
+
+SOURCE_RATE = 44100
+
+
+def write_source(store, seconds=1.0, frequency=440):
+    """在存储的 tmp/ 下写一个 44.1kHz 的 WAV，不是 16kHz，需要解码才能使用。"""
+    path = store.temp_path('.wav')
+    t = np.arange(int(seconds * SOURCE_RATE)) / SOURCE_RATE
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SOURCE_RATE)
+        f.writeframes((np.sin(2 * np.pi * frequency * t) * 16000).astype(np.int16).tobytes())
+    return path
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setenv('ENABLE_AUDIO_STORE', 'true')
+    monkeypatch.setenv('AUDIO_STORE_PATH', str(tmp_path / 'audio'))
+    monkeypatch.setenv('ENABLE_PCM_SIDECAR', 'true')
+    monkeypatch.delenv('PCM_SAMPLE_FORMAT', raising=False)
+    monkeypatch.setattr(audio_store, '_audio_store', None)
+    yield get_audio_store()
+    monkeypatch.setattr(audio_store, '_audio_store', None)
+
+
+def test_sidecar_is_decoded_once_and_kept_with_the_object(store):
+    path = store.put_file('BV1xx411c7mD', 1, AUDIO_ORIGINAL, write_source(store))
+
+    sidecar = prepare_audio(path, 'faster_whisper')
+    assert store.owns(sidecar)
+    release_audio_file(path, sidecar)
+    # 任务结束后旁路文件保留，下一个任务（重试、续转或换一个转写服务）直接复用
+    assert os.path.exists(sidecar)
+    assert store.acquire('BV1xx411c7mD', 1)['path'] == path
+    assert prepare_audio(path, 'openai') == sidecar
+    release_audio_file(path, sidecar)
+    stats = store.stats()
+    assert (stats['sidecarBuilds'], stats['sidecarHits']) == (1, 1)
+    assert stats['bytes'] == os.path.getsize(path) + os.path.getsize(sidecar)
+
+
+def test_sidecar_is_not_decoded_for_cloud_transcriber(store):
+    path = store.put_file('BV1xx411c7mD', 1, AUDIO_ORIGINAL, write_source(store))
+    assert prepare_audio(path, 'cloud_faster_whisper') is None
+    assert store.stats()['sidecarBuilds'] == 0
+
+
+def test_float32_sidecar_is_passed_to_the_model_without_copy(store):
+    path = store.put_file('BV1xx411c7mD', 1, AUDIO_ORIGINAL, write_source(store))
+    pcm = open_pcm(prepare_audio(path, 'faster_whisper'))
+    assert pcm.dtype == np.float32
+    assert np.shares_memory(as_float32(pcm), pcm)
+
+
+def test_eviction_removes_the_sidecar(store):
+    path = store.put_file('BV1xx411c7mD', 1, AUDIO_ORIGINAL, write_source(store))
+    sidecar = prepare_audio(path, 'faster_whisper')
+    release_audio_file(path, sidecar)
+
+    store.max_bytes = os.path.getsize(path) + os.path.getsize(sidecar)
+    other = store.put_file('BV1yy411c7mE', 1, AUDIO_ORIGINAL, write_source(store, frequency=880))
+    release_audio_file(other)
+    assert not os.path.exists(path)
+    assert not os.path.exists(sidecar)
+    assert store.stats()['evictions'] == 1
+
+
+def hold_audio(root, bv_id, acquired, done):
+    """另一个 worker 进程：打开同一存储，占用音频直到 done。"""
+    store = AudioStore(root)
+    path = store.acquire(bv_id, 1)['path']
+    acquired.set()
+    done.wait(30)
+    store.release(path)
+
+
+@pytest.mark.skipif(audio_store.fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(),
+                    reason='需要 flock 与 fork')
+def test_audio_used_by_another_process_is_not_evicted(store):
+    path = store.put_file('BV1xx411c7mD', 1, AUDIO_ORIGINAL, write_source(store))
+    store.release(path)
+
+    context = multiprocessing.get_context('fork')
+    acquired, done = context.Event(), context.Event()
+    worker = context.Process(target=hold_audio, args=(store.root, 'BV1xx411c7mD', acquired, done))
+    worker.start()
+    try:
+        assert acquired.wait(30)
+        store.max_bytes = os.path.getsize(path)
+        other = store.put_file('BV1yy411c7mE', 1, AUDIO_ORIGINAL, write_source(store, frequency=880))
+        # 本进程没有占用，但另一个进程正在使用：不淘汰
+        assert os.path.exists(path)
+        assert store.stats()['evictions'] == 0
+    finally:
+        done.set()
+        worker.join(30)
+    assert worker.exitcode == 0
+    store.release(other)
+
+    # 另一个进程释放后，下一次淘汰时删除
+    store.release(store.put_file('BV1zz411c7mF', 1, AUDIO_ORIGINAL, write_source(store, frequency=660)))
+    assert not os.path.exists(path)
+    assert not os.path.exists(os.path.join(store.leases_dir, os.path.basename(path).split('.')[0] + '.lock'))
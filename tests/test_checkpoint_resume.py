@@ -0,0 +1,242 @@
+"""断点续转：转写中途被杀掉后，用断点日志继续转写，结果与一次转完相同。
+
+用桩模型代替 Faster Whisper（通过 get_model_pool()._loader 注入），音频为生成的短 WAV：
+每 BLOCK_SECONDS 秒一段正弦波，振幅编码段号，桩模型据此给每段输出一个片段，
+因此从任意位置开始转写都能得到与整段转写一致的文本与时间。
+大多数用例在本进程内抛出异常模拟中断；test_resume_after_process_killed_mid_write 在子进程
+（checkpoint_child.py）中写日志写到一半时用 SIGKILL 杀掉进程。
+"""
+import os
+import sys
+import json
+import wave
+import signal
+import subprocess
+import numpy as np
+import pytest
+from .. import checkpoint, jobs
+from ..checkpoint import CheckpointJournal
+from ..jobs import Job, JobManager
+from ..model_pool import get_model_pool
+from ..pcm_audio import SAMPLING_RATE
+from ..services import get_transcript_cache_key
+
+BV_ID = 'BV1xx411c7mD'
+BLOCK_SECONDS = 2
+BLOCKS = 10
+AMPLITUDE_STEP = 0.02
+
+
+class Killed(Exception):
+    """模拟进程在转写中途被杀掉。"""
+
+
+class StubSegment:
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+
+class StubInfo:
+    def __init__(self, duration):
+        self.duration = duration
+
+
+class StubModel:
+    """按 BLOCK_SECONDS 切分收到的音频，每段输出一个片段；state['kill_after'] 个片段之后抛出 Killed。"""
+
+    def __init__(self, state):
+        self.state = state
+
+    def transcribe(self, audio, **options):
+        self.state['samples'] += len(audio)
+        return self._segments(audio), StubInfo(len(audio) / SAMPLING_RATE)
+
+    def _segments(self, audio):
+        block = BLOCK_SECONDS * SAMPLING_RATE
+        for start in range(0, len(audio), block):
+            kill_after = self.state['kill_after']
+            if kill_after is not None and self.state['segments'] >= kill_after:
+                raise Killed()
+            self.state['segments'] += 1
+            chunk = audio[start:start + block]
+            index = int(round(float(np.abs(chunk).max()) / AMPLITUDE_STEP)) - 1
+            yield StubSegment(start / SAMPLING_RATE, (start + len(chunk)) / SAMPLING_RATE, f" 第{index}段")
+
+
+def write_wav(path):
+    t = np.arange(BLOCK_SECONDS * SAMPLING_RATE) / SAMPLING_RATE
+    tone = np.sin(2 * np.pi * 440 * t)
+    audio = np.concatenate([tone * AMPLITUDE_STEP * (index + 1) for index in range(BLOCKS)])
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLING_RATE)
+        f.writeframes((audio * 32767).astype(np.int16).tobytes())
+    return str(path)
+
+
+@pytest.fixture(params=['sequential', 'chunked'])
+def mode(request, monkeypatch, tmp_path):
+    monkeypatch.setenv('ENABLE_CHECKPOINTS', 'true')
+    monkeypatch.setenv('CHECKPOINT_PATH', str(tmp_path / 'checkpoints'))
+    monkeypatch.setenv('ENABLE_TRANSCRIPT_CACHE', 'false')
+    monkeypatch.setenv('ENABLE_SEARCH_INDEX', 'false')
+    monkeypatch.setenv('ENABLE_AUDIO_STORE', 'false')
+    monkeypatch.setenv('ENABLE_STREAMING_PIPELINE', 'false')
+    monkeypatch.setenv('FASTER_WHISPER_BATCH_SIZE', '0')
+    monkeypatch.setenv('ENABLE_CHUNKED_TRANSCRIPTION', 'true' if request.param == 'chunked' else 'false')
+    monkeypatch.setenv('CHUNK_SECONDS', str(2 * BLOCK_SECONDS))
+    monkeypatch.setenv('CHUNK_WORKERS', '1')
+    monkeypatch.setattr(checkpoint, '_checkpoint_store', None)
+    return request.param
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    state = {'samples': 0, 'segments': 0, 'kill_after': None}
+    pool = get_model_pool()
+    pool.clear()
+    monkeypatch.setattr(pool, '_loader', lambda key: StubModel(state))
+    yield state
+    pool.clear()
+
+
+def run_job(tmp_path, name):
+    """像转写 worker 一样执行一次任务，返回任务对象；任务失败时抛出异常。"""
+    job = Job(BV_ID, 'faster_whisper')
+    job.audio_filename = job.pcm_filename = write_wav(tmp_path / f'{name}.wav')
+    job.duration = BLOCKS * BLOCK_SECONDS
+    JobManager()._transcribe(job)
+    return job
+
+
+def reference_transcript(tmp_path, stub_model):
+    job = run_job(tmp_path, 'reference')
+    stub_model.update(samples=0, segments=0)
+    return job.result['transcript']
+
+
+def kill_after(tmp_path, stub_model, segments):
+    """转写到第 segments 个片段时“杀掉”任务，返回留下的断点日志。"""
+    stub_model.update(samples=0, segments=0, kill_after=segments)
+    with pytest.raises(Exception):
+        run_job(tmp_path, 'killed')
+    stub_model.update(samples=0, segments=0, kill_after=None)
+    path = checkpoint.get_checkpoint_store().path_for(get_transcript_cache_key(BV_ID, 1, 'faster_whisper'))
+    with open(path, 'rb') as f:
+        _, segments, _ = CheckpointJournal._read(f)
+    return path, segments
+
+
+def test_resume_after_kill_skips_finished_audio(mode, stub_model, tmp_path):
+    expected = reference_transcript(tmp_path, stub_model)
+
+    path, saved = kill_after(tmp_path, stub_model, 5)
+    assert saved, "被杀掉之前应已记录部分片段"
+    offset = saved[-1]['end']
+    assert 0 < offset < BLOCKS * BLOCK_SECONDS
+
+    job = run_job(tmp_path, 'resumed')
+    assert job.resumed_from == offset
+    # 只转写了断点之后的音频
+    assert stub_model['samples'] == int((BLOCKS * BLOCK_SECONDS - offset) * SAMPLING_RATE)
+    assert job.result['transcript'] == expected
+    assert job.segments == expected
+    # 完成后删除断点日志
+    assert not os.path.exists(path)
+
+
+def test_resumed_transcript_is_identical(mode, stub_model, tmp_path):
+    expected = reference_transcript(tmp_path, stub_model)
+    for segments in (1, 3, 7):
+        kill_after(tmp_path, stub_model, segments)
+        job = run_job(tmp_path, f'resumed-{segments}')
+        assert job.result['transcript'] == expected, f"在第 {segments} 个片段处中断后续转的结果不同"
+
+
+@pytest.mark.parametrize('tail', [b'{"start": 8.0, "end": 1', b'not json\n'])
+def test_truncated_or_corrupt_last_line_is_ignored(mode, stub_model, tmp_path, tail):
+    expected = reference_transcript(tmp_path, stub_model)
+    path, saved = kill_after(tmp_path, stub_model, 4)
+    with open(path, 'ab') as f:
+        f.write(tail)
+
+    job = run_job(tmp_path, 'resumed')
+    assert job.resumed_from == saved[-1]['end']
+    assert job.result['transcript'] == expected
+
+
+class RecordingJobManager:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, bv_id, transcriber_type, client=None, part=1):
+        self.submitted.append((bv_id, transcriber_type, part))
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGKILL') or checkpoint.fcntl is None, reason='需要 SIGKILL 与 flock')
+def test_resume_after_process_killed_mid_write(mode, stub_model, tmp_path, monkeypatch):
+    """真实的进程在写断点日志的一行写到一半时被 SIGKILL：锁随进程释放，重启扫描找到该任务，续转结果不变。"""
+    expected = reference_transcript(tmp_path, stub_model)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    child = subprocess.Popen(
+        [sys.executable, '-m', f'{__package__}.checkpoint_child', str(tmp_path), '4'],
+        cwd=root, env=dict(os.environ, PYTHONPATH=root), stdout=subprocess.PIPE, text=True
+    )
+    store = checkpoint.get_checkpoint_store()
+    cache_key = get_transcript_cache_key(BV_ID, 1, 'faster_whisper')
+    try:
+        assert child.stdout.readline().strip() == 'ready'
+        # 子进程持有日志的 flock：既不能同时写入，也不会被当作中断的任务
+        assert store.open(cache_key) is None
+        assert store.claim_interrupted() == []
+    finally:
+        child.kill()
+        child.wait()
+        child.stdout.close()
+    assert child.returncode == -signal.SIGKILL
+
+    path = store.path_for(cache_key)
+    with open(path, 'rb') as f:
+        assert not f.read().endswith(b'\n'), "日志末尾应留下写了一半的行"
+        f.seek(0)
+        _, saved, _ = CheckpointJournal._read(f)
+    assert len(saved) == 4
+
+    manager = RecordingJobManager()
+    monkeypatch.setattr(jobs, 'get_job_manager', lambda: manager)
+    assert jobs.resume_interrupted_jobs() == 1
+    assert manager.submitted == [(BV_ID, 'faster_whisper', 1)]
+
+    job = run_job(tmp_path, 'resumed')
+    assert job.resumed_from == saved[-1]['end']
+    assert job.result['transcript'] == expected
+    assert not os.path.exists(path)
+
+
+def test_journal_drops_partial_line_and_keeps_appending(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = CheckpointJournal(path, 'key', duration=20.0)
+    assert journal.open()
+    for index in range(3):
+        journal.append({'start': index * 2.0, 'end': index * 2.0 + 2, 'text': f'第{index}段'})
+    journal.close()
+    valid_size = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(json.dumps({'start': 6.0, 'end': 8.0, 'text': '写了一半'}, ensure_ascii=False).encode('utf-8')[:-5])
+
+    journal = CheckpointJournal(path, 'key', duration=20.0)
+    assert journal.open()
+    assert [segment['text'] for segment in journal.segments] == ['第0段', '第1段', '第2段']
+    assert journal.offset == 6.0
+    # 不完整的行被截掉，新记录从完整的行之后追加
+    assert os.path.getsize(path) == valid_size
+    journal.append({'start': 6.0, 'end': 8.0, 'text': '第3段'})
+    journal.close()
+
+    journal = CheckpointJournal(path, 'key', duration=20.0)
+    assert journal.open()
+    assert [segment['text'] for segment in journal.segments] == ['第0段', '第1段', '第2段', '第3段']
+    journal.close()
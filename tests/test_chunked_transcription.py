@@ -0,0 +1,70 @@
+"""分块转写：静音处切分不产生过短的分块；逐块增量合并与整体合并结果相同。"""
+import numpy as np
+import pytest
+from faster_whisper import vad
+from ..chunked_transcription import SegmentMerger, find_chunk_boundaries, merge_chunk_segments
+
+RATE = 100  # 每秒样本数，桩 VAD 只看振幅，用低采样率即可
+CHUNK_SECONDS = 10
+
+
+def amplitude_vad(audio, vad_options=None, sampling_rate=RATE, **kwargs):
+    """桩 VAD：非零样本为语音，返回连续语音段的 [{'start', 'end'}]。"""
+    voiced = np.concatenate([[0], (np.asarray(audio) != 0).astype(np.int8), [0]])
+    edges = np.flatnonzero(np.diff(voiced))
+    return [{'start': int(start), 'end': int(end)} for start, end in zip(edges[::2], edges[1::2])]
+
+
+@pytest.fixture(autouse=True)
+def stub_vad(monkeypatch):
+    monkeypatch.setattr(vad, 'get_speech_timestamps', amplitude_vad)
+
+
+def make_audio(seconds, silences):
+    """seconds 秒的“语音”，silences 为 [(起始秒, 结束秒)] 的静音段。"""
+    audio = np.ones(seconds * RATE, dtype=np.float32)
+    for start, end in silences:
+        audio[int(start * RATE):int(end * RATE)] = 0
+    return audio
+
+
+def boundaries_in_seconds(audio):
+    return [(start / RATE, end / RATE) for start, end in
+            find_chunk_boundaries(audio, CHUNK_SECONDS, min_silence_duration_ms=300, sampling_rate=RATE)]
+
+
+def test_early_silence_does_not_produce_a_tiny_chunk():
+    # 窗口开头不远处有一段静音，后半段没有：不在 1 秒处切出一个小分块，而是在窗口末尾硬切
+    audio = make_audio(25, [(0.5, 1.5)])
+    assert boundaries_in_seconds(audio) == [(0, 10), (10, 20), (20, 25)]
+
+
+def test_cut_at_the_last_silence_in_the_second_half():
+    audio = make_audio(25, [(0.5, 1.5), (7.0, 8.0), (15.0, 16.0)])
+    boundaries = boundaries_in_seconds(audio)
+    assert boundaries == [(0, 7.5), (7.5, 15.5), (15.5, 25)]
+    for start, end in boundaries[:-1]:
+        assert end - start >= CHUNK_SECONDS / 2
+
+
+def test_incremental_merge_matches_full_merge():
+    chunks = [
+        (0.0, 10.0, [{'start': 0.0, 'end': 4.0, 'text': '一'}, {'start': 4.0, 'end': 10.0, 'text': '二'}]),
+        # 与上一块末尾重复的片段被合并，时间延长
+        (10.0, 20.0, [{'start': 0.0, 'end': 2.0, 'text': '二'}, {'start': 2.0, 'end': 12.0, 'text': '三'}]),
+        (20.0, 25.0, []),
+        (25.0, 35.0, [{'start': 0.0, 'end': 5.0, 'text': '四'}]),
+    ]
+    emitted = []
+    merger = SegmentMerger(35.0, lambda segment, duration: emitted.append(dict(segment)))
+    for index, (offset, end_time, segments) in enumerate(chunks):
+        merger.add_chunk(offset, end_time, segments, final=index == len(chunks) - 1)
+    merger.flush()
+
+    expected = merge_chunk_segments(chunks)
+    assert merger.segments == expected
+    assert emitted == expected
+    assert [segment['text'] for segment in expected] == ['一', '二', '三', '四']
+    assert expected[1]['end'] == 12.0
+    # 超出分块范围的部分被截断
+    assert expected[2] == {'start': 12.0, 'end': 20.0, 'text': '三'}
@@ -0,0 +1,81 @@
+"""OpenAI 兼容接口的分块上传：对本地的模拟服务转写，检查只返回文本的接口也能得到带时间的片段。"""
+import json
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+import numpy as np
+import pytest
+from ..openai_transcriber import OpenAITranscriber
+from ..pcm_audio import SAMPLING_RATE
+
+
+class MockTranscriptionServer(ThreadingHTTPServer):
+    """模拟 /audio/transcriptions：按请求顺序返回 {'text': '第N块'}，不带 segments 与 duration。"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), MockTranscriptionHandler)
+        self.requests = 0
+        self.lock = Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class MockTranscriptionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            index = self.server.requests
+            self.server.requests += 1
+        body = json.dumps({'text': f' 第{index}块 '}, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = MockTranscriptionServer()
+    Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('OPENAI_API_BASE_URL', server.base_url)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('OPENAI_UPLOAD_CONCURRENCY', '1')
+    monkeypatch.setenv('OPENAI_MAX_RETRIES', '1')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def write_wav(path, seconds):
+    t = np.arange(int(seconds * SAMPLING_RATE)) / SAMPLING_RATE
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLING_RATE)
+        f.writeframes((np.sin(2 * np.pi * 440 * t) * 16000).astype(np.int16).tobytes())
+    return str(path)
+
+
+def test_text_only_response_covers_the_whole_file(server, tmp_path):
+    segments = OpenAITranscriber().transcribe(write_wav(tmp_path / 'short.wav', 3))
+    assert segments == [{'start': 0.0, 'end': 3.0, 'text': '第0块'}]
+
+
+def test_text_only_response_covers_each_chunk(server, tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENAI_CHUNK_SECONDS', '2')
+    received = []
+    segments = OpenAITranscriber().transcribe(
+        write_wav(tmp_path / 'long.wav', 5), on_segment=lambda segment, duration: received.append(segment))
+    assert [segment['text'] for segment in segments] == ['第0块', '第1块', '第2块']
+    assert segments[0]['start'] == 0.0
+    assert segments[-1]['end'] == 5.0
+    for previous, segment in zip(segments, segments[1:]):
+        assert previous['end'] == segment['start']
+    assert received == segments
+    assert server.requests == 3
@@ -0,0 +1,55 @@
+"""全文索引：候选数受限时标记 truncated，翻页超出候选范围时在全部匹配中排序；按视频查询只返回该视频的片段。"""
+import pytest
+from .. import search_index
+from ..search_index import SearchIndex
+
+CANDIDATES = 5
+
+
+@pytest.fixture
+def index(monkeypatch, tmp_path):
+    monkeypatch.setattr(search_index, 'RANK_CANDIDATES', CANDIDATES)
+    index = SearchIndex(str(tmp_path / 'search.sqlite3'))
+    # 先写入的视频片段短，相关度更高；后写入的片段长，相关度更低
+    for number in range(12):
+        filler = '' if number < 4 else '，这一段还有很多别的内容' * 5
+        index.add(f'BV{number:010d}', 1, {'title': f'视频{number}', 'transcript': [
+            {'start': 0.0, 'end': 2.0, 'text': f'语音模型{filler}'},
+        ]})
+    return index
+
+
+def bv_ids(results):
+    return [result['bvId'] for result in results]
+
+
+def test_few_matches_are_not_truncated(index):
+    index.add('BV1AAAAAAAAA', 1, {'title': '单独', 'transcript': [{'start': 0.0, 'end': 1.0, 'text': '独一无二'}]})
+    results, truncated = index.search('独一无二')
+    assert bv_ids(results) == ['BV1AAAAAAAAA']
+    assert not truncated
+
+
+def test_many_matches_rank_only_recent_candidates(index):
+    results, truncated = index.search('模型', limit=3)
+    assert truncated
+    # 最相关的前 4 个视频写入得最早，不在最近的 CANDIDATES 条匹配中
+    assert not set(bv_ids(results)) & {f'BV{number:010d}' for number in range(4)}
+
+
+def test_paging_past_candidates_ranks_all_matches(index):
+    results, truncated = index.search('模型', limit=4, offset=CANDIDATES)
+    assert not truncated
+    assert len(results) == 4
+    first_page, _ = index.search('模型', limit=CANDIDATES + 7, offset=0)
+    assert len(first_page) == 12
+    assert set(bv_ids(first_page[:4])) == {f'BV{number:010d}' for number in range(4)}
+
+
+def test_video_search_returns_all_parts_of_that_video_only(index):
+    index.add('BV1AAAAAAAAA', 1, {'title': 'P1', 'transcript': [{'start': 0.0, 'end': 1.0, 'text': '模型转写一'}]})
+    index.add('BV1BBBBBBBBB', 1, {'title': '其他', 'transcript': [{'start': 0.0, 'end': 1.0, 'text': '模型转写'}]})
+    index.add('BV1AAAAAAAAA', 2, {'title': 'P2', 'transcript': [{'start': 0.0, 'end': 1.0, 'text': '模型转写二'}]})
+    results, truncated = index.search('模型转写', bv_id='BV1AAAAAAAAA')
+    assert sorted((result['bvId'], result['part']) for result in results) == [('BV1AAAAAAAAA', 1), ('BV1AAAAAAAAA', 2)]
+    assert not truncated
@@ -0,0 +1,99 @@
+import time
+import logging
+import importlib
+from threading import Lock
+from .transcriber_router import AUTO_TRANSCRIBER
+from .utils import get_enabled_transcribers
+
+logger = logging.getLogger(__name__)
+
+# 转写服务 -> (模块, 类名, 需要一并导入的第三方库)。模块在第一次使用该服务时才导入，
+# 未启用的服务不会加载 faster_whisper / openai / gradio_client 等依赖。
+BACKENDS = {
+    'faster_whisper': ('.transcription_service', 'FasterWhisperTranscriber', ('faster_whisper',)),
+    'openai': ('.openai_transcriber', 'OpenAITranscriber', ()),
+    'cloud_faster_whisper': ('.cloud_faster_whisper', 'CloudFasterWhisperTranscriber', ()),
+}
+
+
+class TranscriberRegistry:
+    """按需导入并创建转写服务。
+
+    记录每个服务的导入耗时与首次初始化耗时，供启动报告使用。
+    """
+
+    def __init__(self, backends=BACKENDS):
+        self.backends = backends
+        self._classes = {}
+        self._timings = {}  # 服务名 -> {'importSeconds', 'initSeconds'}
+        self._lock = Lock()
+
+    def is_loaded(self, name):
+        return name in self._classes
+
+    def check_available(self, name):
+        """提交任务时调用：服务未知或未启用时抛出 ValueError，不导入模块。
+
+        auto 不对应具体的模块，启用后由 TranscriberRouter 在已启用的服务中选择。
+        """
+        if not isinstance(name, str) or (name not in self.backends and name != AUTO_TRANSCRIBER):
+            raise ValueError(f"Unsupported transcriber type: {name}")
+        if not get_enabled_transcribers().get(name):
+            raise ValueError(f"转写服务未启用: {name}")
+
+    def get_class(self, name):
+        if name not in self.backends:
+            raise ValueError(f"Unsupported transcriber type: {name}")
+        if not get_enabled_transcribers().get(name):
+            raise ValueError(f"转写服务未启用: {name}")
+        with self._lock:
+            cls = self._classes.get(name)
+            if cls is None:
+                module_name, class_name, dependencies = self.backends[name]
+                started = time.perf_counter()
+                for dependency in dependencies:
+                    importlib.import_module(dependency)
+                module = importlib.import_module(module_name, __package__)
+                cls = self._classes[name] = getattr(module, class_name)
+                seconds = time.perf_counter() - started
+                self._timings.setdefault(name, {})['importSeconds'] = seconds
+                logger.info(f"转写服务 {name} 已加载，导入耗时 {seconds:.2f}s")
+        return cls
+
+    def create(self, name, **kwargs):
+        cls = self.get_class(name)
+        started = time.perf_counter()
+        transcriber = cls(**kwargs)
+        timings = self._timings.setdefault(name, {})
+        if 'initSeconds' not in timings:
+            timings['initSeconds'] = time.perf_counter() - started
+        return transcriber
+
+    def warm_up(self, names=None):
+        """预先导入已启用的服务，失败只记录日志。"""
+        enabled = get_enabled_transcribers()
+        for name in names or self.backends:
+            if name in self.backends and enabled.get(name):
+                try:
+                    self.get_class(name)
+                except Exception as e:
+                    logger.error(f"预加载转写服务 {name} 失败: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: dict(self._timings.get(name, {}), loaded=name in self._classes)
+                for name in self.backends
+            }
+
+
+_registry = None
+_registry_lock = Lock()
+
+
+def get_transcriber_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TranscriberRegistry()
+        return _registry
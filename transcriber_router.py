@@ -0,0 +1,263 @@
+import time
+import logging
+from collections import deque
+from queue import Empty, Queue
+from threading import Event, Lock, Thread
+from .utils import (
+    get_enabled_transcribers,
+    get_model_pool_size,
+    get_cloud_client_pool_size,
+    get_router_window_size,
+    get_router_hedge_factor,
+)
+
+logger = logging.getLogger(__name__)
+
+AUTO_TRANSCRIBER = 'auto'
+
+# 还没有样本时使用的先验实时率（转写耗时 / 音频时长）
+DEFAULT_RTF = {
+    'faster_whisper': 0.3,
+    'openai': 0.1,
+    'cloud_faster_whisper': 0.2,
+}
+
+# 没有时长信息时按此时长估算
+DEFAULT_AUDIO_SECONDS = 300
+
+# 对冲前至少等待的秒数，避免短任务被频繁重复提交
+MIN_HEDGE_SECONDS = 10
+
+# 错误率上限，防止期望完成时间无穷大
+MAX_ERROR_RATE = 0.9
+
+
+class TranscriptionCancelled(Exception):
+    """对冲中落败的转写在下一次产出片段时抛出，使其尽快停止占用 CPU 或接口配额。"""
+
+
+class BackendStats:
+    """单个转写服务最近 window 次调用的耗时、实时率、成功率及当前并发数。"""
+
+    def __init__(self, name, capacity=1, window=20):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.latencies = deque(maxlen=window)
+        self.rtfs = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.in_flight = 0
+
+    @property
+    def rtf(self):
+        if self.rtfs:
+            return sum(self.rtfs) / len(self.rtfs)
+        return DEFAULT_RTF.get(self.name, 0.5)
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def expected_seconds(self, duration):
+        """在当前排队情况下，新任务预计多久完成。"""
+        if duration:
+            service = self.rtf * duration
+        elif self.latencies:
+            service = sum(self.latencies) / len(self.latencies)
+        else:
+            service = self.rtf * DEFAULT_AUDIO_SECONDS
+        # 并发已满时需要等前面的任务让出位置
+        waiting = max(0, self.in_flight + 1 - self.capacity) / self.capacity
+        # 失败需要换服务重来，按期望尝试次数放大
+        return service * (1 + waiting) / (1 - min(self.error_rate, MAX_ERROR_RATE))
+
+    def to_dict(self):
+        return {
+            'inFlight': self.in_flight,
+            'capacity': self.capacity,
+            'rtf': self.rtf,
+            'errorRate': self.error_rate,
+            'samples': len(self.outcomes),
+            'avgLatency': sum(self.latencies) / len(self.latencies) if self.latencies else None,
+        }
+
+
+class TranscriberRouter:
+    """为 auto 类型的任务挑选转写服务。
+
+    按期望完成时间从小到大尝试已启用的服务，失败时依次回退；
+    hedge_factor 大于 0 时，若首选服务耗时超过预期的 hedge_factor 倍，
+    同时向下一个服务提交一份，取先完成的结果。
+    """
+
+    def __init__(self, capacities=None, window=20, hedge_factor=0.0):
+        self.window = window
+        self.hedge_factor = hedge_factor
+        self._capacities = capacities or {}
+        self._stats = {}
+        self._lock = Lock()
+
+    def _get_stats(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = BackendStats(name, self._capacities.get(name, 1), self.window)
+        return stats
+
+    def begin(self, name):
+        with self._lock:
+            self._get_stats(name).in_flight += 1
+        return time.monotonic()
+
+    def end(self, name, started, duration=None, ok=True):
+        elapsed = time.monotonic() - started
+        with self._lock:
+            stats = self._get_stats(name)
+            stats.in_flight -= 1
+            stats.outcomes.append(ok)
+            if ok:
+                stats.latencies.append(elapsed)
+                if duration:
+                    stats.rtfs.append(elapsed / duration)
+
+    def abandon(self, name):
+        """被取消的调用只减少并发数，不计入耗时与成功率。"""
+        with self._lock:
+            self._get_stats(name).in_flight -= 1
+
+    def rank(self, duration=None):
+        """返回可用服务名，按期望完成时间排序。"""
+        enabled = [name for name, on in get_enabled_transcribers().items() if on and name != AUTO_TRANSCRIBER]
+        with self._lock:
+            estimates = {name: self._get_stats(name).expected_seconds(duration) for name in enabled}
+        return sorted(enabled, key=estimates.get), estimates
+
+    def service_seconds(self, name, duration):
+        """不计排队，按近期实时率估算转写 duration 秒音频的耗时。"""
+        with self._lock:
+            if name == AUTO_TRANSCRIBER:
+                rtfs = [self._get_stats(n).rtf for n, on in get_enabled_transcribers().items()
+                        if on and n != AUTO_TRANSCRIBER]
+                return min(rtfs, default=DEFAULT_RTF['faster_whisper']) * duration
+            return self._get_stats(name).rtf * duration
+
+    def transcribe(self, audio_filename, run, duration=None, on_segment=None, on_reset=None):
+        """run(name, audio_filename, on_segment) 执行一次具体服务的转写，失败时抛出异常。
+
+        返回 (转写结果, 实际使用的服务名)。同一时间只有一个服务的逐段结果转发给 on_segment：
+        首选服务失败后改为转发回退服务的结果；对冲期间继续转发首选服务的结果。
+        最终结果不是来自正在转发的服务时，先调用 on_reset()，调用方应丢弃已收到的片段，以最终结果为准。
+        得到结果后，仍在运行的服务在下一次产出片段时抛出 TranscriptionCancelled 而停止。
+        """
+        candidates, estimates = self.rank(duration)
+        if not candidates:
+            raise RuntimeError("没有可用的转写服务")
+        logger.info("转写服务预计耗时: " + ", ".join(f"{n} {estimates[n]:.0f}s" for n in candidates))
+
+        results = Queue()
+        state = {'forward': None, 'forwarded': 0, 'next': 0, 'pending': 0}
+        # 切换转发对象与转发片段互斥，重置之后不会再收到旧服务的片段
+        forward_lock = Lock()
+        cancelled = Event()
+
+        def reset():
+            with forward_lock:
+                state['forward'] = None
+                if state['forwarded'] and on_reset:
+                    on_reset()
+                state['forwarded'] = 0
+
+        def attempt(name):
+            def forward(segment, total):
+                if cancelled.is_set():
+                    raise TranscriptionCancelled(f"{name} 的结果已不再需要")
+                with forward_lock:
+                    if state['forward'] == name and on_segment:
+                        on_segment(segment, total)
+                        state['forwarded'] += 1
+            started = self.begin(name)
+            try:
+                transcript = run(name, audio_filename, forward)
+                if transcript is None:
+                    raise RuntimeError("转写结果为空")
+            except TranscriptionCancelled:
+                self.abandon(name)
+                logger.info(f"{name} 已取消")
+                return
+            except Exception as e:
+                if cancelled.is_set():
+                    self.abandon(name)
+                    return
+                self.end(name, started, duration, ok=False)
+                results.put((name, None, e))
+                return
+            self.end(name, started, duration, ok=True)
+            results.put((name, transcript, None))
+
+        def launch():
+            name = candidates[state['next']]
+            state['next'] += 1
+            with forward_lock:
+                if not state['pending']:
+                    # 没有其他服务在运行（首选或回退）：转发这个服务的逐段结果
+                    state['forward'] = name
+            state['pending'] += 1
+            Thread(target=attempt, args=(name,), name=f'transcribe-{name}', daemon=True).start()
+            return name
+
+        def hedge_deadline(name):
+            if self.hedge_factor <= 0 or state['next'] >= len(candidates):
+                return None
+            return time.monotonic() + max(MIN_HEDGE_SECONDS, estimates[name] * self.hedge_factor)
+
+        deadline = hedge_deadline(launch())
+        errors = []
+        while state['pending']:
+            try:
+                timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                name, transcript, error = results.get(timeout=timeout)
+            except Empty:
+                hedged = launch()
+                logger.warning(f"{candidates[state['next'] - 2]} 超过预期耗时，同时提交到 {hedged}")
+                deadline = None
+                continue
+            state['pending'] -= 1
+            if error is None:
+                cancelled.set()
+                if state['pending']:
+                    logger.info(f"{name} 先完成，停止其余服务")
+                if state['forward'] != name:
+                    reset()
+                return transcript, name
+            logger.warning(f"{name} 转写失败: {str(error)}")
+            errors.append(f"{name}: {str(error)}")
+            if state['forward'] == name:
+                reset()
+            if not state['pending'] and state['next'] < len(candidates):
+                deadline = hedge_deadline(launch())
+        raise RuntimeError("所有转写服务均失败: " + "; ".join(errors))
+
+    def stats(self):
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+
+_router = None
+_router_lock = Lock()
+
+
+def get_transcriber_router():
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = TranscriberRouter(
+                capacities={
+                    'faster_whisper': get_model_pool_size(),
+                    'cloud_faster_whisper': get_cloud_client_pool_size(),
+                    # 远程接口按请求计费，不存在本地排队
+                    'openai': 64,
+                },
+                window=get_router_window_size(),
+                hedge_factor=get_router_hedge_factor()
+            )
+        return _router
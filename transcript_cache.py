@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+from threading import Lock
+from .utils import (
+    get_transcript_cache_path,
+    get_transcript_cache_max_bytes,
+    get_transcript_cache_max_age,
+    is_transcript_cache_enabled,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(bv_id, part, transcriber_type, model_identity, options):
+    """由视频、分P、转写器及解码参数生成缓存键，任一项变化都对应不同的结果。"""
+    raw = json.dumps({
+        'bv_id': bv_id,
+        'part': part,
+        'transcriber_type': transcriber_type,
+        'model': model_identity,
+        'options': options
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TranscriptCache:
+    """基于 SQLite 的转写结果缓存。
+
+    结果以 zlib 压缩后的 JSON 存储；超过 max_age 秒的条目过期，
+    总大小超过 max_bytes 时按最近访问时间淘汰最旧的条目。
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS transcripts (
+                key TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts (last_access)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_transcripts_created ON transcripts (created_at, key)')
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, created_at FROM transcripts WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE transcripts SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def version(self, key):
+        """返回条目的写入时间，不存在或已过期时返回 None；不读取数据，也不计入命中率。"""
+        with self._lock:
+            row = self._conn.execute('SELECT created_at FROM transcripts WHERE key = ?', (key,)).fetchone()
+        if row is None or time.time() - row[0] > self.max_age:
+            return None
+        return row[0]
+
+    def iter_items(self, batch_size=200):
+        """按写入时间从新到旧遍历未过期的条目，产出 (key, value)；不计入命中率。
+
+        以 (created_at, key) 分页，写入时间相同的条目跨越两批时也不会遗漏。
+        """
+        cursor = (float('inf'), '')
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT key, data, created_at FROM transcripts WHERE created_at >= ? AND (created_at, key) < (?, ?) '
+                    'ORDER BY created_at DESC, key DESC LIMIT ?',
+                    (time.time() - self.max_age, cursor[0], cursor[1], batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for key, data, _ in rows:
+                yield key, json.loads(zlib.decompress(data).decode('utf-8'))
+            cursor = (rows[-1][2], rows[-1][0])
+
+    def put(self, key, value):
+        data = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO transcripts (key, data, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                (key, data, len(data), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        expired = self._conn.execute(
+            'DELETE FROM transcripts WHERE created_at < ?', (now - self.max_age,)
+        ).rowcount
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM transcripts').fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            for key, size in self._conn.execute(
+                    'SELECT key, size FROM transcripts ORDER BY last_access').fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute('DELETE FROM transcripts WHERE key = ?', (key,))
+                total -= size
+                evicted += 1
+        if expired or evicted:
+            logger.info(f"转写缓存清理: 过期 {expired} 条, 淘汰 {evicted} 条")
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts'
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'bytes': total,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRatio': self.hits / lookups if lookups else 0.0
+            }
+
+
+_transcript_cache = None
+_transcript_cache_lock = Lock()
+
+
+def get_transcript_cache():
+    """返回进程内共享的缓存实例，未启用缓存时返回 None。"""
+    global _transcript_cache
+    if not is_transcript_cache_enabled():
+        return None
+    with _transcript_cache_lock:
+        if _transcript_cache is None:
+            _transcript_cache = TranscriptCache(
+                get_transcript_cache_path(),
+                max_bytes=get_transcript_cache_max_bytes(),
+                max_age=get_transcript_cache_max_age()
+            )
+        return _transcript_cache
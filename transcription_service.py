@@ -1,99 +1,155 @@
 import os
-from faster_whisper import WhisperModel
-from openai import OpenAI
-import httpx
 import logging
-from gradio_client import Client
 import time
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from .cloud_faster_whisper import CloudFasterWhisperTranscriber
-from .utils import create_direct_connection
+from .chunked_transcription import transcribe_in_chunks
+from .model_pool import get_model_pool, make_model_key
+from .pcm_audio import SAMPLING_RATE, as_float32, load_audio, open_pcm
+from .streaming_pipeline import transcribe_stream
+from .utils import (
+    get_enabled_transcribers,
+    get_faster_whisper_device,
+    get_faster_whisper_compute_type,
+    get_faster_whisper_cpu_threads,
+    get_model_checkout_timeout,
+    is_chunked_transcription_enabled,
+    get_chunk_seconds,
+    get_chunk_workers,
+    get_decode_options,
+    get_stream_window_seconds,
+    get_faster_whisper_batch_size,
+    is_streaming_pipeline_enabled,
+)
 
-class ProxiedSession(requests.Session):
-    def __init__(self, proxies=None, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.proxies = proxies
+def get_faster_whisper_options():
+    options = get_decode_options()
+    return dict(
+        language=options['language'],
+        initial_prompt=options['initial_prompt'],
+        vad_filter=options['vad_filter'],
+        vad_parameters=dict(min_silence_duration_ms=options['min_silence_duration_ms'])
+    )
+
+def get_transcriber_identity(transcriber_type, model_path=None):
+    """标识转写结果来自哪个模型，用于区分缓存。"""
+    if transcriber_type == "faster_whisper":
+        return f"{os.path.basename(os.path.normpath(model_path))}:{get_faster_whisper_compute_type()}"
+    elif transcriber_type == "openai":
+        return f"{os.getenv('OPENAI_API_BASE_URL')}:whisper-1"
+    elif transcriber_type == "cloud_faster_whisper":
+        return os.getenv('HUGGINGFACE_SPACE', 'magicsif/fasterwhisper')
+    elif transcriber_type == "auto":
+        # 结果可能来自任一已启用的服务
+        return ",".join(sorted(
+            get_transcriber_identity(name, model_path)
+            for name, enabled in get_enabled_transcribers().items() if enabled and name != "auto"
+        ))
+    return transcriber_type
+
+def get_faster_whisper_mode():
+    """本地转写当前使用的推理方式，用于日志与性能对比。"""
+    if is_streaming_pipeline_enabled():
+        return "streaming"
+    if is_chunked_transcription_enabled():
+        return "chunked"
+    if get_faster_whisper_batch_size() > 0:
+        return f"batched:{get_faster_whisper_batch_size()}"
+    return "sequential"
 
 class FasterWhisperTranscriber:
-    def __init__(self, model_path, device="cpu", compute_type="int8"):
-        try:
-            logging.info(f"Initializing Faster Whisper model from path: {model_path}")
-            logging.info(f"Device: {device}, Compute type: {compute_type}")
-            if os.path.isdir(model_path):
-                self.model = WhisperModel(model_path, device=device, compute_type=compute_type, local_files_only=True)
-            else:
-                raise ValueError(f"Invalid model path: {model_path}")
-            logging.info("Faster Whisper model initialized successfully")
-        except Exception as e:
-            logging.error(f"Error initializing Faster Whisper model: {str(e)}")
-            logging.exception("Detailed error information:")
-            raise
+    def __init__(self, model_path, device=None, compute_type=None, cpu_threads=None):
+        if not os.path.isdir(model_path):
+            raise ValueError(f"Invalid model path: {model_path}")
+        self.model_key = make_model_key(
+            model_path,
+            device=device or get_faster_whisper_device(),
+            compute_type=compute_type or get_faster_whisper_compute_type(),
+            cpu_threads=get_faster_whisper_cpu_threads() if cpu_threads is None else cpu_threads
+        )
 
-    def transcribe(self, audio_path):
+    def transcribe(self, audio_path, on_segment=None, offset=0.0):
+        """转写音频文件。
+
+        on_segment(segment, duration) 会在每个片段解码完成时被调用，
+        可用于在整个文件转写结束前推送部分结果。
+        offset（秒）大于 0 时从该位置继续转写（断点续转），返回的片段时间仍相对于音频开头。
+        """
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
 
         try:
-            segments, _ = self.model.transcribe(
-                audio_path, 
-                language="zh", 
-                initial_prompt="以下是普通话的句子。",
-                vad_filter=True,
-                vad_parameters=dict(min_silence_duration_ms=500)
-            )
-            transcription = []
-            for segment in segments:
-                transcription.append({
-                    'start': segment.start,
-                    'end': segment.end,
-                    'text': segment.text
-                })
+            if is_chunked_transcription_enabled():
+                return transcribe_in_chunks(
+                    self.model_key,
+                    audio_path,
+                    get_faster_whisper_options(),
+                    chunk_seconds=get_chunk_seconds(),
+                    workers=get_chunk_workers(),
+                    on_segment=on_segment,
+                    offset=offset
+                )
+
+            # 预解码的 PCM 文件以内存映射读取，不再经过 FFmpeg 解码；模型需要整段音频，
+            # float32 文件直接传入映射，int16 文件（PCM_SAMPLE_FORMAT=int16）只能整段转换一次
+            pcm = open_pcm(audio_path)
+            if offset:
+                audio = as_float32((pcm if pcm is not None else load_audio(audio_path))[int(offset * SAMPLING_RATE):])
+            else:
+                audio = as_float32(pcm) if pcm is not None else audio_path
+            batch_size = get_faster_whisper_batch_size()
+            started = time.monotonic()
+            # segments 是惰性生成器，必须在归还模型之前消费完
+            with get_model_pool().checkout(self.model_key, timeout=get_model_checkout_timeout()) as model:
+                if batch_size > 0:
+                    from faster_whisper import BatchedInferencePipeline
+                    # 批量模式：把 VAD 切出的语音段按 batch_size 组成一批送入编码器/解码器
+                    segments, info = BatchedInferencePipeline(model=model).transcribe(
+                        audio, batch_size=batch_size, **get_faster_whisper_options()
+                    )
+                else:
+                    segments, info = model.transcribe(audio, **get_faster_whisper_options())
+                transcription = []
+                for segment in segments:
+                    item = {
+                        'start': segment.start + offset,
+                        'end': segment.end + offset,
+                        'text': segment.text
+                    }
+                    transcription.append(item)
+                    if on_segment:
+                        on_segment(item, info.duration + offset)
+            elapsed = time.monotonic() - started
+            if info.duration:
+                logging.info(
+                    f"Faster Whisper ({get_faster_whisper_mode()}) 转写完成: 音频 {info.duration:.1f}s, "
+                    f"耗时 {elapsed:.1f}s, RTF {elapsed / info.duration:.3f}"
+                )
             return transcription
         except Exception as e:
             logging.error(f"Error transcribing audio: {str(e)}")
             raise
 
-class OpenAITranscriber:
-    def __init__(self):
-        self.base_url = os.getenv("OPENAI_API_BASE_URL")
-        self.api_key = os.getenv("OPENAI_API_KEY")
-
-        if not self.base_url or not self.api_key:
-            raise ValueError("未设置 OPENAI_API_BASE_URL 或 OPENAI_API_KEY 环境变量")
-
-    def create_direct_connection(self):
-        return httpx.HTTPTransport(proxy=None)
-
-    def transcribe(self, audio_filename):
-        with httpx.Client(transport=self.create_direct_connection()) as http_client:
-            client = OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url,
-                http_client=http_client,
-                timeout=300.0
+    def transcribe_stream(self, byte_source, duration=None, on_segment=None):
+        """边下载边转写，byte_source 为产出压缩音频字节块的可迭代对象。"""
+        try:
+            return transcribe_stream(
+                self.model_key,
+                byte_source,
+                get_faster_whisper_options(),
+                chunk_seconds=get_stream_window_seconds(),
+                duration=duration,
+                on_segment=on_segment
             )
-
-            with open(audio_filename, "rb") as audio_file:
-                response = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
-                )
-
-                return str(response)
+        except Exception as e:
+            logging.error(f"Error transcribing audio stream: {str(e)}")
+            raise
 
 class TranscriptionFactory:
     @staticmethod
     def get_transcriber(transcriber_type, model_path=None):
+        """创建转写服务；对应模块由注册表在第一次使用时导入。"""
+        from .transcriber_registry import get_transcriber_registry
         if transcriber_type == "faster_whisper":
             if not model_path:
                 raise ValueError("Model path must be provided for Faster Whisper transcriber")
-            return FasterWhisperTranscriber(model_path=model_path)
-        elif transcriber_type == "openai":
-            return OpenAITranscriber()
-        elif transcriber_type == "cloud_faster_whisper":
-            return CloudFasterWhisperTranscriber()
-        else:
-            raise ValueError(f"Unsupported transcriber type: {transcriber_type}")
\ No newline at end of file
+            return get_transcriber_registry().create(transcriber_type, model_path=model_path)
+        return get_transcriber_registry().create(transcriber_type)
\ No newline at end of file
@@ -1,13 +1,7 @@
 import logging
-from threading import Lock, Timer
 import os
 import time
 
-# 全局变量
-TRANSCRIPTION_PROGRESS = {}
-PROGRESS_LOCK = Lock()
-cleanup_timer = None
-
 def setup_logging(app):
     log_level = os.environ.get('LOG_LEVEL', 'INFO')
     logging.basicConfig(level=getattr(logging, log_level))
@@ -15,41 +9,25 @@ def setup_logging(app):
     app.logger.handlers = logger.handlers
     app.logger.setLevel(logger.level)
 
-def update_progress(filename, status, details=None):
-    with PROGRESS_LOCK:
-        TRANSCRIPTION_PROGRESS[filename] = {
-            'status': status,
-            'details': details,
-            'timestamp': time.time()
-        }
-
-def get_progress_info(filename):
-    with PROGRESS_LOCK:
-        return TRANSCRIPTION_PROGRESS.get(filename, {})
-
-def cleanup_progress():
-    current_time = time.time()
-    with PROGRESS_LOCK:
-        for filename in list(TRANSCRIPTION_PROGRESS.keys()):
-            if current_time - TRANSCRIPTION_PROGRESS[filename].get('timestamp', 0) > 3600:  # 1 hour
-                del TRANSCRIPTION_PROGRESS[filename]
-    
-    global cleanup_timer
-    cleanup_timer = Timer(3600, cleanup_progress)
-    cleanup_timer.start()
-    logging.info("Cleanup complete. Next cleanup scheduled.")
-
-def start_cleanup_timer():
-    global cleanup_timer
-    cleanup_timer = Timer(3600, cleanup_progress)
-    cleanup_timer.start()
-    logging.info("Initial cleanup timer started.")
-
-def stop_cleanup_timer():
-    global cleanup_timer
-    if cleanup_timer:
-        cleanup_timer.cancel()
-        logging.info("Cleanup timer stopped.")
+def get_progress_key(name, part=1):
+    """进度按 (BV 号, 分P) 区分，同一视频的多个分P同时处理时互不覆盖；第 1P 沿用 BV 号本身。"""
+    return f"progress:{name}" if part == 1 else f"progress:{name}?p={part}"
+
+def update_progress(filename, status, details=None, percent=None, part=1):
+    from .state_backend import get_state_backend
+    progress = {
+        'status': status,
+        'details': details,
+        'timestamp': time.time()
+    }
+    if percent is not None:
+        progress['percent'] = percent
+    # 进度写入共享存储，多进程部署时任意 worker 都能查询；过期由存储自行处理
+    get_state_backend().set(get_progress_key(filename, part), progress, get_progress_ttl())
+
+def get_progress_info(filename, part=1):
+    from .state_backend import get_state_backend
+    return get_state_backend().get(get_progress_key(filename, part)) or {}
 
 def validate_bv_id(bv_id):
     import re
@@ -57,27 +35,25 @@ def validate_bv_id(bv_id):
         raise ValueError("无效的BV号")
     return bv_id
 
-def format_time(seconds):
-    """Convert seconds to SRT time format."""
-    import datetime
-    return str(datetime.timedelta(seconds=seconds)).replace('.', ',')[:-3]
-
-def generate_srt(transcript):
-    """Generate SRT formatted subtitles from transcript."""
-    srt_content = ""
-    for index, segment in enumerate(transcript, start=1):
-        start_time = format_time(segment['start'])
-        end_time = format_time(segment['end'])
-        text = segment['text'].strip()
-        
-        srt_content += f"{index}\n{start_time} --> {end_time}\n{text}\n\n"
-    
-    return srt_content.strip()
-
-def save_srt(content, filename):
-    """Save SRT content to a file."""
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(content)
+def validate_part(part):
+    """校验分P编号（从 1 开始）。"""
+    if isinstance(part, bool) or not isinstance(part, (int, str)) or not str(part).isdigit() or int(part) < 1:
+        raise ValueError("无效的分P编号")
+    return int(part)
+
+def parse_part_ranges(spec, limit=None):
+    """解析分P范围，如 "1-3,5"，返回去重后按升序排列的分P编号；超过 limit 个时报错。"""
+    parts = set()
+    for item in str(spec).split(','):
+        start, _, end = item.strip().partition('-')
+        start = validate_part(start.strip())
+        end = validate_part(end.strip()) if end else start
+        if end < start:
+            raise ValueError(f"无效的分P范围: {item.strip()}")
+        if limit is not None and end - start + 1 + len(parts) > limit:
+            raise ValueError(f"分P数量超过上限 ({limit})")
+        parts.update(range(start, end + 1))
+    return sorted(parts)
 
 def create_direct_connection():
     import httpx
@@ -87,11 +63,198 @@ def get_enabled_transcribers():
     return {
         'faster_whisper': os.getenv('ENABLE_LOCAL_FASTER_WHISPER', 'true').lower() == 'true',
         'openai': os.getenv('ENABLE_OPENAI_WHISPER', 'true').lower() == 'true',
-        'cloud_faster_whisper': os.getenv('ENABLE_CLOUD_FASTER_WHISPER', 'true').lower() == 'true'
+        'cloud_faster_whisper': os.getenv('ENABLE_CLOUD_FASTER_WHISPER', 'true').lower() == 'true',
+        'auto': os.getenv('ENABLE_AUTO_TRANSCRIBER', 'false').lower() == 'true'
     }
 
 def get_max_video_duration():
     return int(os.getenv('MAX_VIDEO_DURATION', 3600))  # 默认为1小时
 
 def get_rate_limit_seconds():
-    return os.getenv('RATE_LIMIT_SECONDS', '30')
\ No newline at end of file
+    return os.getenv('RATE_LIMIT_SECONDS', '30')
+
+def get_faster_whisper_device():
+    return os.getenv('FASTER_WHISPER_DEVICE', 'cpu')
+
+def get_faster_whisper_compute_type():
+    return os.getenv('FASTER_WHISPER_COMPUTE_TYPE', 'int8')
+
+def get_faster_whisper_cpu_threads():
+    return int(os.getenv('FASTER_WHISPER_CPU_THREADS', 0))  # 0 表示由 CTranslate2 自行决定
+
+def get_model_pool_size():
+    return int(os.getenv('MODEL_POOL_SIZE', 1))
+
+def get_model_pool_idle_seconds():
+    return int(os.getenv('MODEL_POOL_IDLE_SECONDS', 600))
+
+def get_model_checkout_timeout():
+    return int(os.getenv('MODEL_CHECKOUT_TIMEOUT', 600))
+
+def is_transcriber_preload_enabled():
+    return os.getenv('PRELOAD_TRANSCRIBERS', 'false').lower() == 'true'
+
+def is_model_warmup_enabled():
+    return os.getenv('MODEL_POOL_WARMUP', 'true').lower() == 'true'
+
+def get_download_workers():
+    return int(os.getenv('DOWNLOAD_WORKERS', 2))
+
+def get_transcribe_workers():
+    return int(os.getenv('TRANSCRIBE_WORKERS', get_model_pool_size()))
+
+def get_job_queue_size():
+    return int(os.getenv('JOB_QUEUE_SIZE', 20))
+
+def get_job_result_ttl():
+    return int(os.getenv('JOB_RESULT_TTL', 3600))
+
+def is_chunked_transcription_enabled():
+    return os.getenv('ENABLE_CHUNKED_TRANSCRIPTION', 'false').lower() == 'true'
+
+def get_chunk_seconds():
+    return int(os.getenv('CHUNK_SECONDS', 300))
+
+def get_chunk_workers():
+    return int(os.getenv('CHUNK_WORKERS', get_model_pool_size()))
+
+def get_decode_options():
+    """转写解码参数，同时作为转写缓存键的一部分。"""
+    return {
+        'language': os.getenv('TRANSCRIBE_LANGUAGE', 'zh'),
+        'initial_prompt': os.getenv('TRANSCRIBE_INITIAL_PROMPT', '以下是普通话的句子。'),
+        'vad_filter': os.getenv('VAD_FILTER', 'true').lower() == 'true',
+        'min_silence_duration_ms': int(os.getenv('VAD_MIN_SILENCE_DURATION_MS', 500))
+    }
+
+def is_transcript_cache_enabled():
+    return os.getenv('ENABLE_TRANSCRIPT_CACHE', 'true').lower() == 'true'
+
+def get_transcript_cache_path():
+    return os.getenv('TRANSCRIPT_CACHE_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'transcripts.sqlite3'))
+
+def get_transcript_cache_max_bytes():
+    return int(os.getenv('TRANSCRIPT_CACHE_MAX_MB', 512)) * 1024 * 1024
+
+def get_transcript_cache_max_age():
+    return int(os.getenv('TRANSCRIPT_CACHE_MAX_AGE_DAYS', 30)) * 24 * 3600
+
+def get_metadata_cache_ttl():
+    return int(os.getenv('METADATA_CACHE_TTL', 600))
+
+def get_metadata_cache_size():
+    return int(os.getenv('METADATA_CACHE_SIZE', 256))
+
+def is_streaming_pipeline_enabled():
+    return os.getenv('ENABLE_STREAMING_PIPELINE', 'false').lower() == 'true'
+
+def get_stream_window_seconds():
+    return int(os.getenv('STREAM_WINDOW_SECONDS', 60))
+
+def get_state_backend_url():
+    return os.getenv('STATE_BACKEND_URL', 'memory://')
+
+def get_progress_ttl():
+    return int(os.getenv('PROGRESS_TTL', 3600))
+
+def get_rate_limit_storage_uri():
+    return os.getenv('RATE_LIMIT_STORAGE_URI', 'memory://')
+
+def get_faster_whisper_batch_size():
+    return int(os.getenv('FASTER_WHISPER_BATCH_SIZE', 0))  # 0 表示逐窗口顺序解码
+
+def get_openai_chunk_seconds():
+    return int(os.getenv('OPENAI_CHUNK_SECONDS', 600))
+
+def get_openai_max_upload_bytes():
+    # 接口上限为 25MB，留出 multipart 表单的余量
+    return int(float(os.getenv('OPENAI_MAX_UPLOAD_MB', 24)) * 1024 * 1024)
+
+def get_openai_upload_concurrency():
+    return max(1, int(os.getenv('OPENAI_UPLOAD_CONCURRENCY', 4)))
+
+def get_openai_max_retries():
+    return max(1, int(os.getenv('OPENAI_MAX_RETRIES', 3)))
+
+def get_cloud_client_pool_size():
+    return max(1, int(os.getenv('CLOUD_CLIENT_POOL_SIZE', 2)))
+
+def get_cloud_circuit_failure_threshold():
+    return max(1, int(os.getenv('CLOUD_CIRCUIT_FAILURE_THRESHOLD', 3)))
+
+def get_cloud_circuit_reset_seconds():
+    return int(os.getenv('CLOUD_CIRCUIT_RESET_SECONDS', 60))
+
+def get_router_window_size():
+    return max(1, int(os.getenv('ROUTER_WINDOW_SIZE', 20)))
+
+def get_router_hedge_factor():
+    return float(os.getenv('ROUTER_HEDGE_FACTOR', 0))  # 0 表示不对冲
+
+def get_job_max_per_client():
+    return int(os.getenv('JOB_MAX_PER_CLIENT', 3))  # 0 表示不限制
+
+def get_scheduler_aging_rate():
+    # 任务每等待 1 秒，调度优先级提升相当于多少秒的估算耗时
+    return float(os.getenv('SCHEDULER_AGING_RATE', 1.0))
+
+def is_audio_store_enabled():
+    return os.getenv('ENABLE_AUDIO_STORE', 'true').lower() == 'true'
+
+def get_audio_store_path():
+    return os.getenv('AUDIO_STORE_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'audio'))
+
+def get_audio_store_max_bytes():
+    return int(os.getenv('AUDIO_STORE_MAX_MB', 2048)) * 1024 * 1024
+
+def get_audio_store_mode():
+    return os.getenv('AUDIO_STORE_MODE', 'original').lower()  # original 或 pcm
+
+def is_pcm_sidecar_enabled():
+    return os.getenv('ENABLE_PCM_SIDECAR', 'true').lower() == 'true'
+
+def get_pcm_sample_format():
+    sample_format = os.getenv('PCM_SAMPLE_FORMAT', 'float32').lower()
+    return sample_format if sample_format in ('int16', 'float32') else 'float32'
+
+def get_export_cache_max_bytes():
+    return int(os.getenv('EXPORT_CACHE_MAX_MB', 64)) * 1024 * 1024
+
+def get_compress_level():
+    return min(9, max(1, int(os.getenv('COMPRESS_LEVEL', 6))))
+
+def is_metrics_enabled():
+    return os.getenv('ENABLE_METRICS', 'true').lower() == 'true'
+
+def get_batch_max_items():
+    return int(os.getenv('BATCH_MAX_ITEMS', 50))
+
+def get_batch_concurrency():
+    return max(1, int(os.getenv('BATCH_CONCURRENCY', 3)))
+
+def is_checkpoint_enabled():
+    return os.getenv('ENABLE_CHECKPOINTS', 'true').lower() == 'true'
+
+def get_checkpoint_path():
+    return os.getenv('CHECKPOINT_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'checkpoints'))
+
+def is_interrupted_job_resume_enabled():
+    return os.getenv('RESUME_INTERRUPTED_JOBS', 'true').lower() == 'true'
+
+def get_checkpoint_max_age():
+    return float(os.getenv('CHECKPOINT_MAX_AGE_HOURS', 24)) * 3600
+
+def is_search_index_enabled():
+    return os.getenv('ENABLE_SEARCH_INDEX', 'true').lower() == 'true'
+
+def get_search_index_path():
+    return os.getenv('SEARCH_INDEX_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'search.sqlite3'))
+
+def get_search_max_results():
+    return int(os.getenv('SEARCH_MAX_RESULTS', 100))
+
+def is_autotune_profile_enabled():
+    return os.getenv('ENABLE_AUTOTUNE_PROFILE', 'true').lower() == 'true'
+
+def get_autotune_profile_path():
+    return os.getenv('AUTOTUNE_PROFILE_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'autotune.json'))
@@ -0,0 +1,69 @@
+import time
+import logging
+from collections import OrderedDict
+from threading import Lock
+from .utils import get_metadata_cache_ttl, get_metadata_cache_size
+
+logger = logging.getLogger(__name__)
+
+
+class VideoMetadataCache:
+    """yt-dlp 解析结果（时长、标题、格式列表等）的 TTL 缓存。
+
+    格式列表中的下载地址带有有效期，因此 TTL 不宜过长；
+    条目数超过 max_entries 时淘汰最早写入的条目。
+    """
+
+    def __init__(self, ttl=600, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, info)
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, info):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, info)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRatio': self.hits / lookups if lookups else 0.0
+            }
+
+
+_metadata_cache = None
+_metadata_cache_lock = Lock()
+
+
+def get_metadata_cache():
+    global _metadata_cache
+    with _metadata_cache_lock:
+        if _metadata_cache is None:
+            _metadata_cache = VideoMetadataCache(
+                ttl=get_metadata_cache_ttl(),
+                max_entries=get_metadata_cache_size()
+            )
+        return _metadata_cache